@@ -1,23 +1,55 @@
-from flask import Flask, render_template, request, redirect, url_for, session
-import pandas as pd
-import json
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, Response, stream_with_context, make_response
+from datetime import datetime
 from services.fund_service import FundService
-from services.calculator import InvestmentCalculator
+from services.portfolio_service import PortfolioService
+from services.analytics_service import AnalyticsService
+from services.import_service import ImportService
+from services.chart_service import ChartService, CHART_RANGES, DEFAULT_CHART_RANGE
+from services.comparison_service import ComparisonService, COMPARE_MODES, MAX_COMPARE_FUNDS
+from services.calculator import PERCENT_COLUMNS
+from services.formatters import analytics_items, format_multi, format_array, color_array, td_cells, iter_rows, page_bounds
 from models.fund import Fund
-from config import FLASK_HOST, FLASK_PORT, FLASK_DEBUG, DECIMAL_PRECISION
-from pyecharts.charts import Line
-from pyecharts import options as opts
-from datetime import datetime, timedelta
-from pyecharts.commons.utils import JsCode
+from models.db import Database, QueryProfiler
+from services.cache import all_stats
+from api import api
+from lazy import lazy_import
+from startup import bootstrap
+from conditional import make_etag, funds_version, parse_version, not_modified, with_validators
+import instrumentation
+from instrumentation import timed, timed_stream
+from config import FLASK_HOST, FLASK_PORT, FLASK_DEBUG, DECIMAL_PRECISION, TABLE_PAGE_SIZE, CHART_MAX_POINTS, CHART_DOWNSAMPLE, METRICS_ENABLED, METRICS_SERVER_TIMING
 
 # 初始化应用
 app = Flask(__name__)
 app.secret_key = 'fund_analysis_system'
+app.register_blueprint(api)
+# 各阶段耗时：Server-Timing 响应头及 /metrics 直方图
+instrumentation.init_app(app, METRICS_ENABLED, METRICS_SERVER_TIMING)
 
+# pandas/numpy 在首次使用时才导入，pyecharts 在生成图表时导入（加快启动）
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
 
-# 确保有默认基金
-if not FundService.get_fund_list():
-    FundService.create_fund('默认基金')
+def create_app():
+    """应用工厂：完成一次性初始化（数据库结构、默认基金）后返回应用"""
+    bootstrap()
+    return app
+
+@app.before_request
+def ensure_bootstrap():
+    """未经 create_app 直接部署 app 时，在首个请求前完成初始化"""
+    bootstrap()
+
+@app.before_request
+def begin_query_profile():
+    """启用SQL分析时收集本请求执行的语句"""
+    QueryProfiler.begin()
+
+@app.teardown_request
+def release_db_conn(exc):
+    """请求结束后释放线程复用的数据库连接，并按路由汇总本请求的语句"""
+    Database.release_thread_conn()
+    QueryProfiler.end(request.url_rule.rule if request.url_rule else 'unmatched')
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
@@ -70,144 +102,150 @@ def index():
                 fund.save_data(date, net_value, addition, shares)
         return redirect(url_for('index'))
 
+    # 图表时间范围（?range=3M 等，记录在会话中）
+    if 'range' in request.args:
+        session['chart_range'] = ChartService.normalize_range(request.args['range'])
+    chart_range = session.get('chart_range', DEFAULT_CHART_RANGE)
+
+    # 条件请求：基金列表及数据版本未变化时直接返回304，不查询数据、不计算
+    # （页面随会话中的当前基金变化，只比较ETag；有待显示的提示消息时页面不可复用，不设置验证器）
+    fund_parts, modified = funds_version(funds)
+    etag = None if session.get('_flashes') else make_etag(
+        'index', 'desktop', fund_parts, str(current_fund_id), chart_range, datetime.now().strftime('%Y-%m-%d'))
+    cached = not_modified(etag) if etag else None
+    if cached:
+        return cached
+
     # 获取计算结果
-    history_df, fund_name = FundService.get_fund_data(current_fund_id) if current_fund_id else (pd.DataFrame(), '')
-    result_df = InvestmentCalculator.calculate(history_df)
+    history_df, result_df, fund_name = FundService.get_fund_result(current_fund_id) if current_fund_id else (pd.DataFrame(), pd.DataFrame(), '')
 
     # 生成表格HTML
-    table_html = ""
-    if not result_df.empty:
-        # 确保列名完整
-        result_df = result_df.rename(columns={
-            '净值涨幅(%)': '净值涨幅(%)',
-            '总涨幅(%)': '总涨幅(%)',
-            '加额最新涨幅(%)': '加额最新涨幅(%)',
-            '到手增额': '到手增额',
-            '到手增幅': '到手增幅'
-        })
-
-        # 生成表格时强制设置列宽和表头样式
-        table_html = '''
-        <div class="table-responsive" style="overflow-x: auto; margin-top: 20px;">
-            <table class="table table-striped table-hover" style="min-width: 1300px; table-layout: fixed;">
-                <thead>
-                    <tr style="background-color: #f8f9fa;">
-                        <th style="width: 100px; text-align: center; vertical-align: middle;">日期</th>
-                        <th style="width: 80px; text-align: center; vertical-align: middle;">净值</th>
-                        <th style="width: 80px; text-align: center; vertical-align: middle;">加额</th>
-                        <th style="width: 80px; text-align: center; vertical-align: middle;">加份</th>
-                        <th style="width: 100px; text-align: center; vertical-align: middle;">总额</th>
-                        <th style="width: 80px; text-align: center; vertical-align: middle;">总份</th>
-                        <th style="width: 100px; text-align: center; vertical-align: middle;">净值涨幅(%)</th>
-                        <th style="width: 80px; text-align: center; vertical-align: middle;">总投入</th>
-                        <th style="width: 80px; text-align: center; vertical-align: middle;">总涨幅(%)</th>
-                        <th style="width: 120px; text-align: center; vertical-align: middle;">加额最新涨幅(%)</th>
-                        <th style="width: 120px; text-align: center; vertical-align: middle;">到手增额</th>
-                        <th style="width: 120px; text-align: center; vertical-align: middle;">到手增幅</th>
-                    </tr>
-                </thead>
-                <tbody>
-        '''
-        # 添加数据行
-        for _, row in result_df.iterrows():
-            table_html += '<tr>'
-            # 日期列
-            table_html += f'<td style="text-align: left;">{row["日期"]}</td>'
-            # 净值保留四位小数
-            table_html += f'<td style="text-align: right;">{float(row["净值"]):.4f}</td>'
-            # 其余数值保留两位小数
-            for col in ['加额', '加份', '总额', '总份', '净值涨幅(%)', '总投入', '总涨幅(%)']:
-                try:
-                    v = row[col]
-                    # 先处理数值转换
-                    if isinstance(v, str) and '%' in v:
-                        val = float(v.replace('%', ''))
-                    else:
-                        val = float(v)
-                    # 总额、总份、总投入恒为黑色
-                    if col in ['总额', '总份', '总投入']:
-                        color = 'black'
-                    else:
-                        color = 'red' if val > 0 else ('blue' if val < 0 else 'black')
-                    if '%' in str(v):
-                        table_html += f'<td style="text-align: right; color: {color};">{val:.2f}%</td>'
-                    else:
-                        table_html += f'<td style="text-align: right; color: {color};">{val:.2f}</td>'
-                except:
-                    table_html += f'<td style="text-align: right;">{row[col]}</td>'
-            # 加额最新涨幅
-            try:
-                val = float(row['加额最新涨幅(%)'].replace('%', ''))
-            except:
-                val = 0
-            color = 'red' if val != 0 else 'black'
-            table_html += f'<td style="text-align: right; color: {color};">{val:.2f}%</td>'
-            # 到手增额和增幅
-            def format_multi(val):
-                if isinstance(val, str) and ('，' in val or ',' in val):
-                    return '，'.join([
-                        f"{float(x.replace('%','')):.2f}%" if '%' in x else f"{float(x):.2f}"
-                        for x in val.replace('，', ',').split(',') if x
-                    ])
-                try:
-                    if isinstance(val, str) and '%' in val:
-                        return f"{float(val.replace('%','')):.2f}%"
-                    return f"{float(val):.2f}"
-                except:
-                    return val
-            table_html += f'<td style="text-align: right;">{format_multi(row["到手增额"])}</td>'
-            table_html += f'<td style="text-align: right;">{format_multi(row["到手增幅"])}</td>'
-            table_html += '</tr>'
-        table_html += '</tbody></table></div>'
-    else:
-        table_html = '<p class="text-muted text-center py-3">暂无数据，请添加记录</p>'
-
-    chart_html = generate_net_value_chart(history_df)
-
-    return render_template(
+    table_html = generate_table(result_df)
+    analytics = analytics_items(AnalyticsService.get_fund_analytics(current_fund_id)) if current_fund_id else []
+
+    chart_html = ChartService.render_cached(
+        current_fund_id, chart_range, 'desktop', lambda df: generate_net_value_chart(df, chart_range)
+    ) if current_fund_id else generate_net_value_chart(history_df, chart_range)
+
+    response = make_response(render_template(
         'index.html',
         funds=funds,
         current_fund_id=current_fund_id,
         current_fund_name=fund_name,
         table_html=table_html,
-        chart_html=chart_html
-    )
+        analytics=analytics,
+        chart_html=chart_html,
+        chart_range=chart_range,
+        chart_ranges=CHART_RANGES
+    ))
+    return with_validators(response, etag, modified) if etag else response
+
+@timed('table')
+def generate_table(result_df, page_size=TABLE_PAGE_SIZE):
+    """生成桌面端表格HTML（默认只含最新一页，更早的记录由 /table_rows 按需加载）"""
+    if result_df.empty:
+        return '<p class="text-muted text-center py-3">暂无数据，请添加记录</p>'
+
+    start, end = page_bounds(len(result_df), page_size=page_size)
+    # 更早的记录插入在表格顶部，加载按钮放在表格上方
+    table_html = load_more_button(start)
+    # 生成表格时强制设置列宽和表头样式
+    table_html += '''
+    <div class="table-responsive" style="overflow-x: auto; margin-top: 20px;">
+        <table class="table table-striped table-hover" style="min-width: 1300px; table-layout: fixed;">
+            <thead>
+                <tr style="background-color: #f8f9fa;">
+                    <th style="width: 100px; text-align: center; vertical-align: middle;">日期</th>
+                    <th style="width: 80px; text-align: center; vertical-align: middle;">净值</th>
+                    <th style="width: 80px; text-align: center; vertical-align: middle;">加额</th>
+                    <th style="width: 80px; text-align: center; vertical-align: middle;">加份</th>
+                    <th style="width: 100px; text-align: center; vertical-align: middle;">总额</th>
+                    <th style="width: 80px; text-align: center; vertical-align: middle;">总份</th>
+                    <th style="width: 100px; text-align: center; vertical-align: middle;">净值涨幅(%)</th>
+                    <th style="width: 80px; text-align: center; vertical-align: middle;">总投入</th>
+                    <th style="width: 80px; text-align: center; vertical-align: middle;">总涨幅(%)</th>
+                    <th style="width: 120px; text-align: center; vertical-align: middle;">加额最新涨幅(%)</th>
+                    <th style="width: 120px; text-align: center; vertical-align: middle;">到手增额</th>
+                    <th style="width: 120px; text-align: center; vertical-align: middle;">到手增幅</th>
+                </tr>
+            </thead>
+            <tbody id="resultRows">
+    '''
+    table_html += ''.join(generate_table_rows(result_df.iloc[start:end]))
+    table_html += '</tbody></table></div>'
+    return table_html
+
+def generate_table_rows(result_df):
+    """逐行产出桌面端表格行HTML（各列先批量格式化，结果均为数值）"""
+    columns = [
+        # 日期列
+        td_cells(result_df['日期'], align='left'),
+        # 净值保留四位小数
+        td_cells(format_array(result_df['净值'], decimals=4)),
+    ]
+    # 其余数值保留两位小数
+    for col in ['加额', '加份', '总额', '总份', '净值涨幅(%)', '总投入', '总涨幅(%)']:
+        values = result_df[col].to_numpy(dtype=float)
+        # 总额、总份、总投入恒为黑色
+        colors = ['black'] * len(values) if col in ['总额', '总份', '总投入'] else color_array(values)
+        columns.append(td_cells(format_array(values, percent=col in PERCENT_COLUMNS), colors=colors))
+    # 加额最新涨幅
+    values = result_df['加额最新涨幅(%)'].to_numpy(dtype=float)
+    columns.append(td_cells(format_array(values, percent=True), colors=np.where(values != 0, 'red', 'black')))
+    # 到手增额和增幅
+    columns.append(td_cells([format_multi(v) for v in result_df['到手增额']]))
+    columns.append(td_cells([format_multi(v, percent=True) for v in result_df['到手增幅']]))
+    return iter_rows(columns)
+
+def load_more_button(start):
+    """更早记录的加载按钮（start 为当前已显示的最早行位置，为0时不显示）"""
+    if start <= 0:
+        return ''
+    return (f'<div class="text-center my-2"><button type="button" id="loadMoreRows" '
+            f'class="btn btn-outline-secondary btn-sm" data-before="{start}">加载更早记录</button></div>')
+
+@timed('chart')
+def generate_net_value_chart(history_df, range_key=DEFAULT_CHART_RANGE):
+    """生成指定时间范围的日期-净值折线图（超过点数预算时降采样，加额日总会保留）"""
+    from pyecharts.charts import Line
+    from pyecharts import options as opts
+    from pyecharts.commons.utils import JsCode
 
-def generate_net_value_chart(history_df):
-    """生成最近一个月的日期-净值折线图"""
     if history_df is None or history_df.empty or 'date' not in history_df or 'net_value' not in history_df:
         return '<div class="text-center text-muted py-5">暂无净值数据</div>'
-    # 日期格式转换
-    history_df['date'] = pd.to_datetime(history_df['date'])
-    today = datetime.now()
-    one_month_ago = today - timedelta(days=30)
-    recent_df = history_df[history_df['date'] >= one_month_ago].sort_values('date').copy()
+    range_key = ChartService.normalize_range(range_key)
+    range_name = CHART_RANGES[range_key][0]
+    recent_df = ChartService.prepare_series(history_df, range_key, CHART_MAX_POINTS, CHART_DOWNSAMPLE)
     if recent_df.empty:
-        return '<div class="text-center text-muted py-5">近一个月无数据</div>'
-    # 横坐标格式如 7.1
-    recent_df['short_date'] = recent_df['date'].apply(lambda x: f"{x.month}.{x.day}")
+        return f'<div class="text-center text-muted py-5">{range_name}无数据</div>'
     line = Line(init_opts=opts.InitOpts(width="100%", height="400px"))
-    line.add_xaxis(recent_df['short_date'].tolist())
-    # 准备加额数据用于颜色映射
-    additions = recent_df['addition'].round(4).tolist()
-    additions_json = json.dumps(additions)
+    # 横坐标格式如 7.1（跨年时带年份）
+    line.add_xaxis(ChartService.axis_labels(recent_df['date']))
+    # 加额日按加额正负着色并放大，其余点为蓝色（颜色随数据点下发，不再内联整段加额数组）
+    dense = len(recent_df) > 60
+    points = []
+    for value, addition in zip(recent_df['net_value'].round(4), recent_df['addition']):
+        if addition != 0:
+            points.append(opts.LineItem(value=value, symbol_size=10,
+                                        itemstyle_opts=opts.ItemStyleOpts(color='red' if addition > 0 else 'black')))
+        else:
+            points.append(opts.LineItem(value=value, symbol_size=4 if dense else 10))
     line.add_yaxis(
         series_name="净值",
-        y_axis=recent_df['net_value'].round(4).tolist(),
+        y_axis=points,
         is_smooth=True,
         symbol="circle",
         symbol_size=10,
         label_opts=opts.LabelOpts(is_show=False),
-        linestyle_opts=opts.LineStyleOpts(width=3, color="#1890ff"),
-        itemstyle_opts=opts.ItemStyleOpts(color=JsCode(f"function(params) {{const additions = {additions_json};const value = additions[params.dataIndex];return value > 0 ? 'red' : value < 0 ? 'black' : 'blue';}}"))
+        linestyle_opts=opts.LineStyleOpts(width=2 if dense else 3, color="#1890ff"),
+        itemstyle_opts=opts.ItemStyleOpts(color='blue')
     )
     line.set_global_opts(
-        title_opts=opts.TitleOpts(title="近一个月净值趋势", pos_left="center"),
+        title_opts=opts.TitleOpts(title=f"{range_name}净值趋势", pos_left="center"),
         tooltip_opts=opts.TooltipOpts(trigger="axis"),
         xaxis_opts=opts.AxisOpts(
             name="日期",
-            axislabel_opts=opts.LabelOpts(rotate=30),
-            interval=0
+            axislabel_opts=opts.LabelOpts(rotate=30, interval='auto' if dense else 0)
         ),
         yaxis_opts=opts.AxisOpts(
             name="净值",
@@ -218,6 +256,127 @@ def generate_net_value_chart(history_df):
     )
     return line.render_embed()
 
+@timed('chart')
+def generate_compare_chart(wide_df, range_key, mode):
+    """生成多基金对比折线图（每只基金一条曲线，日期已对齐）"""
+    if wide_df is None or wide_df.empty:
+        return '<div class="text-center text-muted py-5">所选基金在该范围内无数据</div>'
+    from pyecharts.charts import Line
+    from pyecharts import options as opts
+    from pyecharts.commons.utils import JsCode
+
+    line = Line(init_opts=opts.InitOpts(width="100%", height="450px"))
+    line.add_xaxis(ChartService.axis_labels(wide_df.index.to_series()))
+    for name in wide_df.columns:
+        # 基金开始前的日期为空值，不画线
+        values = [None if pd.isna(v) else float(v) for v in wide_df[name]]
+        line.add_yaxis(
+            series_name=name,
+            y_axis=values,
+            is_symbol_show=False,
+            label_opts=opts.LabelOpts(is_show=False),
+            linestyle_opts=opts.LineStyleOpts(width=2)
+        )
+        # 各曲线共用横坐标，只下发数值（默认的 [日期, 值] 数据对会使多曲线图体积成倍增加）
+        line.options['series'][-1]['data'] = values
+    suffix = "+'%'" if mode == 'gain' else ''
+    line.set_global_opts(
+        title_opts=opts.TitleOpts(title=f"{CHART_RANGES[range_key][0]}{COMPARE_MODES[mode]}对比", pos_left="center"),
+        legend_opts=opts.LegendOpts(type_="scroll", pos_top="8%"),
+        tooltip_opts=opts.TooltipOpts(trigger="axis"),
+        xaxis_opts=opts.AxisOpts(name="日期", axislabel_opts=opts.LabelOpts(rotate=30)),
+        yaxis_opts=opts.AxisOpts(
+            axislabel_opts=opts.LabelOpts(formatter=JsCode(f"function(value){{return value.toFixed(2){suffix};}}")),
+            min_='dataMin',
+            max_='dataMax'
+        )
+    )
+    return line.render_embed()
+
+@app.route('/import', methods=['POST'])
+def import_csv():
+    """批量导入CSV历史数据到当前基金"""
+    fund_id = request.form.get('fund_id') or session.get('fund_id')
+    upload = request.files.get('csv_file')
+    if fund_id and upload:
+        success, msg, errors = ImportService.import_file(fund_id, upload.read())
+        flash(msg)
+        for error in errors:
+            flash(error)
+    return redirect(url_for('index'))
+
+@app.route('/table_rows')
+def table_rows():
+    """按需加载更早的表格行（流式输出 <tr>，响应头 X-Next-Before 为下一页的起点）"""
+    fund_id = request.args.get('fund_id') or session.get('fund_id')
+    before = request.args.get('before')
+    if before is not None:
+        # 非法起点不能退回最新一页（前端会把重复的行追加到表格末尾）
+        if not before.isdecimal():
+            return Response('before 须为非负整数', status=400, mimetype='text/plain')
+        before = int(before)
+    fund = Fund.get_by_id(fund_id) if fund_id else None
+    etag = make_etag('table_rows', 'desktop', fund_id, fund.last_update if fund else None, before)
+    modified = parse_version(fund.last_update) if fund else None
+    cached = not_modified(etag, modified)
+    if cached:
+        return cached
+    _, result_df, _ = FundService.get_fund_result(fund_id) if fund else (None, pd.DataFrame(), '')
+    start, end = page_bounds(len(result_df), before, TABLE_PAGE_SIZE)
+    rows = generate_table_rows(result_df.iloc[start:end]) if end > start else iter(())
+    # 表格行在响应头发出后才逐行生成，table 阶段在流结束时单独记入 /metrics（不在 Server-Timing 中）
+    rows = timed_stream('table', rows)
+    response = Response(stream_with_context(rows), mimetype='text/html')
+    response.headers['X-Next-Before'] = str(start)
+    return with_validators(response, etag, modified)
+
+@app.route('/compare')
+def compare():
+    """多基金对比图（?ids=1&ids=2&mode=base&range=1Y，未选基金时对比全部）"""
+    funds = FundService.get_fund_list()
+    fund_ids = ComparisonService.parse_ids(request.args.getlist('ids')) or \
+        [f.fund_id for f in funds][:MAX_COMPARE_FUNDS]
+    chart_range = ChartService.normalize_range(request.args.get('range', '1Y'))
+    mode = ComparisonService.normalize_mode(request.args.get('mode'))
+
+    fund_parts, modified = funds_version(funds)
+    etag = make_etag('compare', 'desktop', fund_parts, tuple(fund_ids), chart_range, mode,
+                     datetime.now().strftime('%Y-%m-%d'))
+    cached = not_modified(etag, modified)
+    if cached:
+        return cached
+
+    chart_html = ComparisonService.render_cached(
+        fund_ids, chart_range, mode, 'desktop', lambda df: generate_compare_chart(df, chart_range, mode), CHART_MAX_POINTS)
+    response = make_response(render_template(
+        'compare.html', funds=funds, selected=fund_ids, mode=mode, modes=COMPARE_MODES,
+        chart_range=chart_range, chart_ranges=CHART_RANGES, chart_html=chart_html))
+    return with_validators(response, etag, modified)
+
+@app.route('/portfolio')
+def portfolio():
+    """组合总览：所有基金的最新汇总"""
+    fund_parts, modified = funds_version(FundService.get_fund_list())
+    etag = make_etag('portfolio', fund_parts)
+    cached = not_modified(etag, modified)
+    if cached:
+        return cached
+    rows, totals = PortfolioService.get_summary()
+    return with_validators(make_response(render_template('portfolio.html', rows=rows, totals=totals)), etag, modified)
+
+@app.route('/cache_stats')
+def cache_stats():
+    """计算结果及图表缓存命中统计"""
+    return jsonify(all_stats())
+
+@app.route('/query_stats')
+def query_stats():
+    """SQL 分析汇总（需开启 DB_PROFILE_ENABLED；?reset=1 清空统计）"""
+    summary = QueryProfiler.summary(request.args.get('top', 20, type=int))
+    if request.args.get('reset'):
+        QueryProfiler.reset()
+    return jsonify(summary)
+
 @app.route('/delete_fund/<fund_id>', methods=['POST'])
 def delete_fund(fund_id):
     # 执行删除
@@ -235,4 +394,4 @@ def delete_fund(fund_id):
 
 
 if __name__ == '__main__':
-    app.run(host=FLASK_HOST, port=FLASK_PORT, debug=FLASK_DEBUG)
\ No newline at end of file
+    create_app().run(host=FLASK_HOST, port=FLASK_PORT, debug=FLASK_DEBUG)
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""JSON 接口（桌面端与移动端共用的蓝图）
+
+    GET /api/funds                              基金列表
+    GET /api/funds/<id>/rows?cursor=&limit=     计算结果分页（从新到旧，cursor 为上一页返回的 next_cursor）
+    GET /api/funds/<id>/summary                 最新一行汇总
+    GET /api/funds/<id>/analytics               收益风险指标（XIRR、时间加权收益、最大回撤、波动率、夏普比率）
+    GET /api/funds/<id>/rolling?windows=&limit= 滚动窗口统计（windows 为 7,30 等窗口行数，limit 为最新行数）
+    GET /api/funds/<id>/grid_sweep?steps=&amounts=&bands=&base=&sort=&limit=
+                                                网格参数寻优排名（取值为 1,2,3 或 起:止:步长）
+"""
+
+import math
+from flask import Blueprint, jsonify, request
+from conditional import make_etag, funds_version, parse_version, not_modified, with_validators
+from services.fund_service import FundService
+from services.sweep_service import SweepService
+from services.analytics_service import AnalyticsService
+from services.rolling_service import RollingService
+from models.fund import Fund
+from config import SWEEP_STEPS, SWEEP_AMOUNTS, SWEEP_BANDS
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+# 单页默认/最大行数
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+def to_records(df):
+    """结果表转为可JSON序列化的记录列表（NaN 转为 null）"""
+    def clean(value):
+        if isinstance(value, list):
+            return [clean(v) for v in value]
+        if isinstance(value, float) and not math.isfinite(value):
+            return None
+        return value.item() if hasattr(value, 'item') else value
+    return [{col: clean(val) for col, val in zip(df.columns, row)} for row in df.itertuples(index=False)]
+
+
+def not_found():
+    return jsonify({'error': '基金不存在'}), 404
+
+
+def bad_request(message):
+    return jsonify({'error': message}), 400
+
+
+def fund_validators(fund, *parts):
+    """单个基金接口的 (ETag, Last-Modified)，由基金数据版本及请求参数决定"""
+    return make_etag('api', fund.fund_id, fund.fund_name, fund.last_update, *parts), parse_version(fund.last_update)
+
+
+@api.route('/funds')
+def list_funds():
+    """基金列表"""
+    funds = FundService.get_fund_list()
+    fund_parts, modified = funds_version(funds)
+    etag = make_etag('api_funds', fund_parts)
+    cached = not_modified(etag, modified)
+    if cached:
+        return cached
+    return with_validators(jsonify([
+        {'fund_id': f.fund_id, 'fund_name': f.fund_name, 'last_update': f.last_update}
+        for f in funds
+    ]), etag, modified)
+
+
+@api.route('/funds/<int:fund_id>/rows')
+def fund_rows(fund_id):
+    """计算结果分页"""
+    limit = request.args.get('limit', DEFAULT_LIMIT, type=int)
+    limit = min(max(limit, 1), MAX_LIMIT)
+    cursor = request.args.get('cursor') or None
+    fund = Fund.get_by_id(fund_id)
+    if not fund:
+        return not_found()
+    etag, modified = fund_validators(fund, 'rows', cursor, limit)
+    cached = not_modified(etag, modified)
+    if cached:
+        return cached
+    page, next_cursor = FundService.get_result_page(fund_id, cursor, limit)
+    if page is None:
+        return not_found()
+    response = jsonify({'fund_id': fund_id, 'rows': to_records(page), 'next_cursor': next_cursor})
+    return with_validators(response, etag, modified)
+
+
+@api.route('/funds/<int:fund_id>/summary')
+def fund_summary(fund_id):
+    """最新一行汇总（含记录数与数据版本）"""
+    fund = Fund.get_by_id(fund_id)
+    if not fund:
+        return not_found()
+    etag, modified = fund_validators(fund, 'summary')
+    cached = not_modified(etag, modified)
+    if cached:
+        return cached
+    _, result_df, _ = FundService.get_fund_result(fund_id)
+    latest = to_records(result_df.iloc[-1:])[0] if not result_df.empty else None
+    return with_validators(jsonify({
+        'fund_id': fund.fund_id,
+        'fund_name': fund.fund_name,
+        'last_update': fund.last_update,
+        'rows': len(result_df),
+        'first_date': result_df['日期'].iloc[0] if latest else None,
+        'latest': latest,
+    }), etag, modified)
+
+
+@api.route('/funds/<int:fund_id>/analytics')
+def fund_analytics(fund_id):
+    """收益风险指标（无数据时 analytics 为 null）"""
+    fund = Fund.get_by_id(fund_id)
+    if not fund:
+        return not_found()
+    etag, modified = fund_validators(fund, 'analytics')
+    cached = not_modified(etag, modified)
+    if cached:
+        return cached
+    return with_validators(jsonify({
+        'fund_id': fund.fund_id,
+        'fund_name': fund.fund_name,
+        'analytics': AnalyticsService.get_fund_analytics(fund_id),
+    }), etag, modified)
+
+
+@api.route('/funds/<int:fund_id>/rolling')
+def fund_rolling(fund_id):
+    """滚动窗口统计（按日期从旧到新，只返回最新 limit 行）"""
+    args = request.args
+    limit = min(max(args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+    fund = Fund.get_by_id(fund_id)
+    if not fund:
+        return not_found()
+    try:
+        windows = [int(w) for w in args.get('windows', '').split(',') if w.strip()]
+    except ValueError:
+        return bad_request('窗口长度须为整数')
+    try:
+        etag, modified = fund_validators(fund, 'rolling', windows, limit)
+        cached = not_modified(etag, modified)
+        if cached:
+            return cached
+        table = RollingService.get_rolling(fund_id, windows)
+    except ValueError as e:
+        return bad_request(str(e))
+    if table is None:
+        return not_found()
+    return with_validators(jsonify({
+        'fund_id': fund_id,
+        'rows': len(table),
+        'data': to_records(table.tail(limit)),
+    }), etag, modified)
+
+
+@api.route('/funds/<int:fund_id>/grid_sweep')
+def fund_grid_sweep(fund_id):
+    """网格参数寻优：回测全部参数组合，按总涨幅（或 sort=到手总增额）排名"""
+    args = request.args
+    limit = min(max(args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+    fund = Fund.get_by_id(fund_id)
+    if not fund:
+        return not_found()
+    try:
+        steps = SweepService.parse_values(args.get('steps'), SWEEP_STEPS)
+        amounts = SweepService.parse_values(args.get('amounts'), SWEEP_AMOUNTS)
+        bands = SweepService.parse_values(args.get('bands'), SWEEP_BANDS)
+        base_price = args.get('base', type=float)
+        sort_by = args.get('sort')
+        etag, modified = fund_validators(fund, 'grid_sweep', steps, amounts, bands, base_price, sort_by, limit)
+        cached = not_modified(etag, modified)
+        if cached:
+            return cached
+        table = SweepService.run(fund_id, steps, amounts, bands, base_price, sort_by)
+    except ValueError as e:
+        return bad_request(str(e))
+    if table is None:
+        return not_found()
+    return with_validators(jsonify({
+        'fund_id': fund_id,
+        'combinations': len(table),
+        'rows': to_records(table.head(limit)),
+    }), etag, modified)
+
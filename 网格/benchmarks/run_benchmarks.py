@@ -0,0 +1,174 @@
+"""计算、存储与渲染热点路径的基准测试
+
+用法（在项目目录下执行）：
+    python -m benchmarks.run_benchmarks --sizes 1000 10000 100000 --output bench.json
+    python -m benchmarks.run_benchmarks --snapshot snapshot   # 使用导出的列式快照中的真实基金
+
+使用临时数据库，不影响正式数据。结果以JSON输出，便于不同版本之间对比。
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import config
+
+# 必须在导入模型之前替换数据库路径
+_tmp_dir = tempfile.mkdtemp(prefix='fund_bench_')
+config.DATABASE_PATH = os.path.join(_tmp_dir, 'bench.db')
+
+from models.db import Database  # noqa: E402
+from models.fund import Fund  # noqa: E402
+from models.fund_metrics import FundMetrics  # noqa: E402
+from services.calculator import InvestmentCalculator  # noqa: E402
+from services.fund_service import FundService  # noqa: E402
+from services.cache import result_cache  # noqa: E402
+from services.snapshot_service import SnapshotService  # noqa: E402
+from benchmarks.synthetic import generate_history  # noqa: E402
+
+
+def time_call(func, repeat):
+    """重复执行并返回耗时统计（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'repeat': repeat,
+    }
+
+
+def load_fund(fund_name, history_df):
+    """批量写入合成数据，返回基金对象"""
+    fund = Fund.create(fund_name)
+    conn = Database.get_conn()
+    conn.executemany('''INSERT INTO fund_data (fund_id, date, net_value, addition, shares)
+                        VALUES (?, ?, ?, ?, ?)''',
+                     [(fund.fund_id, *row) for row in history_df.itertuples(index=False)])
+    conn.commit()
+    conn.close()
+    return fund
+
+
+def synthetic_cases(sizes, buy_ratio, sell_ratio, shares_ratio, seed):
+    """合成数据用例：[(名称, 历史数据)]"""
+    return [(f'bench_{size}', generate_history(size, buy_ratio, sell_ratio, shares_ratio, seed))
+            for size in sizes]
+
+
+def snapshot_cases(path):
+    """列式快照中的基金用例（跳过无数据的基金）"""
+    snapshot = SnapshotService.load(path)
+    cases = []
+    for fund in snapshot.funds:
+        if fund['stop'] == fund['start']:
+            continue
+        history_df = snapshot.history_df(fund['fund_id'])
+        history_df['date'] = history_df['date'].dt.strftime('%Y-%m-%d')
+        cases.append((f"bench_{fund['fund_name']}", history_df))
+    return cases
+
+
+def run(cases, repeat):
+    """执行全部基准，返回结果列表"""
+    # 应用工厂会初始化数据库并创建默认基金
+    import APP
+    import APP_mobile
+    APP.create_app()
+    APP_mobile.create_app()
+
+    results = []
+    for fund_name, history_df in cases:
+        size = len(history_df)
+        fund = load_fund(fund_name, history_df)
+        stored_df = fund.get_history_data()
+        result_df = InvestmentCalculator.calculate(stored_df)
+        # 直接写入的数据尚无结果表，先物化（导出快照及页面读取均依赖 fund_metrics）
+        FundMetrics.rebuild(fund.fund_id)
+        snapshot_dir = os.path.join(_tmp_dir, f'snapshot_{fund.fund_id}')
+        SnapshotService.export(snapshot_dir, [fund.fund_id])
+
+        def cold_result():
+            result_cache.clear()
+            return FundService.get_fund_result(fund.fund_id)
+
+        phases = [
+            ('query_to_df', lambda: Database.query_to_df(
+                'SELECT date, net_value, addition, shares FROM fund_data WHERE fund_id=? ORDER BY date',
+                (fund.fund_id,))),
+            ('get_history_data', fund.get_history_data),
+            ('snapshot_history', lambda: SnapshotService.load(snapshot_dir).history_df(fund.fund_id)),
+            ('calculate', lambda: InvestmentCalculator.calculate(stored_df)),
+            # 页面实际使用的读取路径：fund_metrics 结果表（未命中缓存 / 命中缓存）
+            ('fund_metrics_load', lambda: FundMetrics.load(fund.fund_id)),
+            ('get_fund_result', cold_result),
+            ('get_fund_result_cached', lambda: FundService.get_fund_result(fund.fund_id)),
+            # 写入路径：丢弃 fund_state/fund_metrics 后从头重算
+            ('rebuild_metrics', lambda: FundMetrics.rebuild(fund.fund_id)),
+            ('generate_table', lambda: APP.generate_table(result_df)),
+            ('generate_mobile_table', lambda: APP_mobile.generate_mobile_table(result_df)),
+            ('generate_net_value_chart', lambda: APP.generate_net_value_chart(stored_df)),
+            ('generate_mobile_chart', lambda: APP_mobile.generate_mobile_chart(stored_df)),
+        ]
+        for phase, func in phases:
+            stats = time_call(func, repeat)
+            results.append({'size': size, 'phase': phase, **stats})
+            print(f"{size:>8} {phase:<26} median {stats['median'] * 1000:10.2f} ms", file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='基金分析系统基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='合成历史的行数')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数')
+    parser.add_argument('--buy-ratio', type=float, default=0.2, help='加仓日占比')
+    parser.add_argument('--sell-ratio', type=float, default=0.1, help='减仓日占比')
+    parser.add_argument('--shares-ratio', type=float, default=0.3, help='以加份录入的交易占比')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--snapshot', help='从列式快照目录读取基金历史代替合成数据（忽略合成参数）')
+    parser.add_argument('--output', help='结果JSON文件路径（默认输出到标准输出）')
+    args = parser.parse_args(argv)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {
+            'sizes': args.sizes,
+            'repeat': args.repeat,
+            'buy_ratio': args.buy_ratio,
+            'sell_ratio': args.sell_ratio,
+            'shares_ratio': args.shares_ratio,
+            'seed': args.seed,
+            'snapshot': args.snapshot,
+        },
+    }
+    try:
+        if args.snapshot:
+            cases = snapshot_cases(args.snapshot)
+        else:
+            cases = synthetic_cases(args.sizes, args.buy_ratio, args.sell_ratio, args.shares_ratio, args.seed)
+        report['results'] = run(cases, args.repeat)
+    finally:
+        Database.close_thread_conn()
+        shutil.rmtree(_tmp_dir, ignore_errors=True)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""合成基金历史数据（用于基准测试）"""
+import numpy as np
+import pandas as pd
+
+
+def generate_history(rows, buy_ratio=0.2, sell_ratio=0.1, shares_ratio=0.3, seed=0):
+    """生成指定行数的基金历史（列与 Fund.get_history_data 一致）
+
+    buy_ratio/sell_ratio 为加仓/减仓日占比，shares_ratio 为以加份而非加额录入的交易占比。
+    日期为截至今天的连续自然日，保证近一个月图表有数据。
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=pd.Timestamp.today().normalize(), periods=rows, freq='D')
+    # 净值：带漂移的随机游走，保持为正
+    net_value = np.round(np.abs(1 + np.cumsum(rng.normal(0, 0.01, rows))) + 0.1, 4)
+
+    u = rng.random(rows)
+    buys = u < buy_ratio
+    sells = (u >= buy_ratio) & (u < buy_ratio + sell_ratio)
+    addition = np.zeros(rows)
+    addition[buys] = np.round(rng.uniform(100, 1000, buys.sum()), 2)
+    addition[sells] = -np.round(rng.uniform(50, 600, sells.sum()), 2)
+    # 第一天建仓
+    addition[0] = 1000.0
+
+    shares = np.zeros(rows)
+    by_shares = (buys | sells) & (rng.random(rows) < shares_ratio)
+    by_shares[0] = False
+    shares[by_shares] = np.round(addition[by_shares] / net_value[by_shares], 2)
+    addition[by_shares] = 0.0
+
+    return pd.DataFrame({
+        'date': dates.strftime('%Y-%m-%d'),
+        'net_value': net_value,
+        'addition': addition,
+        'shares': shares,
+    })
@@ -0,0 +1,62 @@
+"""HTTP 条件请求（ETag / Last-Modified）
+
+验证器由基金数据版本（funds.last_update）计算，命中 If-None-Match 时在查询数据、
+计算和渲染之前直接返回 304。
+"""
+
+import hashlib
+import time
+from datetime import datetime
+from flask import Response, request
+
+# 进程启动标识：代码或模板更新后（重启）旧的 ETag 全部失效
+BUILD_TOKEN = str(time.time_ns())
+
+
+def make_etag(*parts):
+    """由任意可 repr 的部分生成 ETag"""
+    return hashlib.sha1(repr((BUILD_TOKEN,) + parts).encode('utf-8')).hexdigest()[:24]
+
+
+def parse_version(last_update):
+    """数据版本文本转为本地时间（无法解析返回None）"""
+    if not last_update:
+        return None
+    try:
+        return datetime.fromisoformat(str(last_update)).astimezone()
+    except ValueError:
+        return None
+
+
+def funds_version(funds):
+    """基金列表的版本：(各基金 ID/名称/数据版本, 最新修改时间)"""
+    parts = tuple((f.fund_id, f.fund_name, f.last_update) for f in funds)
+    modified = [m for m in (parse_version(f.last_update) for f in funds) if m]
+    return parts, max(modified) if modified else None
+
+
+def not_modified(etag, last_modified=None):
+    """请求的验证器仍有效时返回 304 响应，否则返回None
+
+    有 If-None-Match 时只比较 ETag；否则比较 If-Modified-Since（秒级精度）。
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    if request.if_none_match:
+        fresh = request.if_none_match.contains(etag)
+    elif request.if_modified_since and last_modified:
+        fresh = last_modified.replace(microsecond=0) <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    return with_validators(Response(status=304), etag, last_modified)
+
+
+def with_validators(response, etag, last_modified=None):
+    """为响应设置 ETag / Last-Modified，并要求客户端每次重新验证"""
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -1,11 +1,72 @@
 #1
 # 数据库配置
 DATABASE_PATH = 'fund_analysis.db'  # 主数据库（存储所有基金数据）
+DB_POOL_CONNECTIONS = True  # 每个线程复用一个连接
+DB_BUSY_TIMEOUT = 5.0  # 数据库被锁时的等待秒数
+DB_JOURNAL_MODE = 'WAL'  # 日志模式（WAL支持读写并发）
+DB_SYNCHRONOUS = 'NORMAL'  # WAL下NORMAL即可保证一致性
+DB_CACHE_SIZE_KB = 16384  # 页缓存大小（KB）
+DB_MMAP_SIZE = 64 * 1024 * 1024  # 内存映射读取大小（字节）
+
+# SQL 分析（models/db.py QueryProfiler，汇总见 /query_stats）
+DB_PROFILE_ENABLED = False  # 记录每条语句的耗时、行数及调用方（排查性能问题时开启）
+DB_SLOW_QUERY_MS = 50  # 慢查询阈值（毫秒），超过时写日志
+DB_EXPLAIN_SLOW = True  # 慢查询附带 EXPLAIN QUERY PLAN
+DB_SLOW_LOG_SIZE = 100  # 保留最近的慢查询条数
+DB_PROFILE_MAX_STATEMENTS = 500  # 分别统计的规范化语句数上限（超出的归入"其他语句"）
 
 # Flask应用配置
 FLASK_HOST = '127.0.0.1'
 FLASK_PORT = 5000
 FLASK_DEBUG = True
 
+# 生产服务配置（serve.py）
+SERVER_WORKERS = 1  # 工作进程数（Windows 下固定为1）
+SERVER_THREADS = 8  # 每个进程的线程数
+SERVER_WARM_FUNDS = 8  # 启动时预热计算结果的基金数
+
 # 计算常量
 DECIMAL_PRECISION = 4  # 数值精度（小数点后位数）
+
+# 页面展示
+TABLE_PAGE_SIZE = 200  # 结果表格每页行数（默认只显示最新一页，0为不分页）
+CHART_MAX_POINTS = 300  # 净值图最多点数（超出时降采样，加额日总会保留）
+CHART_DOWNSAMPLE = 'lttb'  # 降采样方式：lttb 或 minmax
+
+# 增量计算
+STATE_SNAPSHOT_INTERVAL = 128  # 未平仓批次快照的最小间隔行数（未平仓批次较多时按2的幂倍加大，另保留最后一行的快照）
+
+# 缓存配置
+RESULT_CACHE_SIZE = 32  # 计算结果缓存的基金数上限（LRU淘汰）
+CHART_CACHE_SIZE = 64  # 图表HTML缓存条数上限（每条约几十KB，LRU淘汰）
+SWEEP_CACHE_SIZE = 50000  # 网格寻优单个参数组合结果的缓存条数上限（每条为一个小字典）
+ANALYTICS_CACHE_SIZE = 64  # 收益风险分析结果的缓存条数上限
+ROLLING_CACHE_SIZE = 32  # 滚动统计状态的基金数上限（追加记录时增量续算）
+
+# 网格回测默认参数
+GRID_STEP_PCT = 5.0  # 格距（%）
+GRID_AMOUNT = 1000.0  # 每格买入金额
+GRID_MAX_GRIDS = 10  # 最大持仓格数
+
+# 网格参数寻优（取值为逗号分隔列表或 起:止:步长 区间）
+SWEEP_STEPS = '1:10:0.5'  # 格距（%）
+SWEEP_AMOUNTS = '1000'  # 每格金额
+SWEEP_BANDS = '10:60:5'  # 区间宽度（%），最大格数 = 区间宽度 / 格距
+SWEEP_MAX_COMBINATIONS = 20000  # 单次寻优的组合数上限
+SWEEP_WORKERS = 0  # 进程池大小（0表示使用CPU核数）
+SWEEP_PARALLEL_THRESHOLD = 500  # 组合数达到该值时才使用进程池
+
+# 收益风险分析
+ANALYTICS_RISK_FREE_PCT = 2.0  # 无风险年化收益率（%），用于夏普比率
+ANALYTICS_RATE_GRID = 400  # XIRR 求解时初始收益率网格的点数
+
+# 滚动窗口统计
+ROLLING_WINDOWS = (7, 30, 90, 250)  # 窗口长度（记录行数）
+
+# 列式快照（离线分析用，manage.py export-snapshot 导出）
+SNAPSHOT_PATH = 'snapshot'  # 默认导出目录（.npy 列文件 + manifest.json）
+
+# 请求耗时统计（instrumentation.py）
+METRICS_ENABLED = True  # 记录各路由/阶段耗时直方图，提供 /metrics
+METRICS_SERVER_TIMING = True  # 响应头输出 Server-Timing（浏览器开发者工具可查看）
+METRICS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)  # 直方图桶上限（秒）
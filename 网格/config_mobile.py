@@ -7,9 +7,23 @@ FLASK_HOST = '0.0.0.0'  # 允许外部访问，方便手机连接
 FLASK_PORT = 5001  # 使用不同端口避免冲突
 FLASK_DEBUG = True
 
+# 生产服务配置（serve.py）
+SERVER_WORKERS = 2  # 工作进程数（Windows 下固定为1）
+SERVER_THREADS = 8  # 每个进程的线程数
+SERVER_WARM_FUNDS = 8  # 启动时预热计算结果的基金数
+
 # 计算常量
 DECIMAL_PRECISION = 4  # 数值精度（小数点后位数）
 
+# 页面展示
+TABLE_PAGE_SIZE = 50  # 结果表格每页行数（移动端更少，0为不分页）
+CHART_MAX_POINTS = 120  # 净值图最多点数（手机屏幕窄，预算更小）
+CHART_DOWNSAMPLE = 'lttb'  # 降采样方式：lttb 或 minmax
+
+# 请求耗时统计（instrumentation.py，直方图桶见 config.py）
+METRICS_ENABLED = True  # 记录各路由/阶段耗时直方图，提供 /metrics
+METRICS_SERVER_TIMING = True  # 响应头输出 Server-Timing
+
 # 移动端特定配置
 MOBILE_OPTIMIZED = True
 TOUCH_FRIENDLY = True
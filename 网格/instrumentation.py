@@ -0,0 +1,186 @@
+"""请求耗时统计（各阶段耗时 -> Server-Timing 响应头 + 按路由/阶段的直方图 + /metrics）
+
+阶段用 timed(名称) 标记（上下文管理器或装饰器），只计自身耗时：嵌套阶段的耗时从外层扣除，
+各阶段之和加上 other 等于 total。不在请求内（命令行、进程池）或未启用时只有一次变量读取的开销。
+
+    db      SQLite 语句执行及取数（models/db.py 的连接/游标）
+    calc    InvestmentCalculator 计算
+    table   结果表格HTML生成
+    chart   pyecharts 图表生成（含 render_embed）
+
+流式响应体（如 /table_rows 的逐行输出）在 after_request 之后才生成，Server-Timing 已随响应头发出，
+无法包含这部分耗时；用 timed_stream() 包装后，迭代结束时单独记入该路由对应阶段的直方图（不计入 total）。
+
+直方图保存在进程内，多进程部署时 /metrics 只反映处理该请求的进程。
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+from config import METRICS_BUCKETS
+
+# 当前请求的阶段耗时（未启用或不在请求内时为None）
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """单个请求的阶段耗时（秒，自身耗时）"""
+    __slots__ = ('start', 'phases', 'stack')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.stack = []  # 进行中的阶段：[开始时间, 子阶段耗时]
+
+
+class timed(ContextDecorator):
+    """标记一个阶段（with timed('db'): ... 或 @timed('calc')），对象本身无状态，可在线程间共用"""
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        timings = _current.get()
+        if timings is not None:
+            timings.stack.append([time.perf_counter(), 0.0])
+        return self
+
+    def __exit__(self, *exc):
+        timings = _current.get()
+        if timings is None or not timings.stack:
+            return False
+        start, children = timings.stack.pop()
+        elapsed = time.perf_counter() - start
+        timings.phases[self.phase] = timings.phases.get(self.phase, 0.0) + elapsed - children
+        if timings.stack:
+            timings.stack[-1][1] += elapsed
+        return False
+
+
+def timed_stream(phase, iterable):
+    """包装流式响应体：记录迭代（生成各块）的耗时，迭代结束或中断时记入当前路由的 phase 直方图
+
+    需在请求内、构造 Response 之前调用；未启用统计时原样返回。
+    """
+    if _current.get() is None:
+        return iterable
+    from flask import request
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    return _timed_iter(route, phase, iterable)
+
+
+def _timed_iter(route, phase, iterable):
+    """逐块产出并累计生成耗时（不含客户端读取/网络发送的等待时间）"""
+    iterator = iter(iterable)
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - start
+            yield chunk
+    finally:
+        registry.observe(route, {phase: elapsed})
+
+
+class Histogram:
+    """累计直方图（桶上限为秒，与 Prometheus histogram 语义一致）"""
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class MetricsRegistry:
+    """按 (路由, 阶段) 汇总的耗时直方图"""
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, phases):
+        """记录一个请求的各阶段耗时"""
+        with self._lock:
+            for phase, seconds in phases.items():
+                histogram = self._histograms.get((route, phase))
+                if histogram is None:
+                    histogram = self._histograms[(route, phase)] = Histogram(self.buckets)
+                histogram.observe(seconds)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def render(self):
+        """Prometheus 文本格式"""
+        name = 'fund_request_phase_seconds'
+        lines = [f'# HELP {name} 请求各阶段耗时（秒，阶段只计自身耗时，total 为整个请求）',
+                 f'# TYPE {name} histogram']
+        with self._lock:
+            items = sorted(self._histograms.items())
+            for (route, phase), histogram in items:
+                labels = f'route="{_escape(route)}",phase="{_escape(phase)}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def init_app(app, enabled=True, server_timing=True):
+    """为应用启用耗时统计：记录每个请求的阶段耗时，输出 Server-Timing，并注册 /metrics"""
+    if not enabled:
+        return
+    from flask import Response, request
+
+    @app.before_request
+    def start_timing():
+        _current.set(RequestTimings())
+
+    @app.after_request
+    def finish_timing(response):
+        timings = _current.get()
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings.start
+        phases = dict(timings.phases)
+        phases['other'] = max(total - sum(phases.values()), 0.0)
+        phases['total'] = total
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        registry.observe(route, phases)
+        if server_timing:
+            response.headers['Server-Timing'] = ', '.join(
+                f'{phase};dur={seconds * 1000:.2f}' for phase, seconds in phases.items())
+        return response
+
+    @app.teardown_request
+    def clear_timing(exc):
+        _current.set(None)
+
+    def metrics():
+        """各路由、各阶段耗时直方图（Prometheus 文本格式）"""
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    app.add_url_rule('/metrics', 'metrics', metrics)
+
+
+def _escape(value):
+    """标签值转义（反斜杠、双引号、换行）"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
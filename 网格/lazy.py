@@ -0,0 +1,26 @@
+"""按需导入：pandas/numpy 等重型模块在首次访问属性时才真正导入，缩短应用启动时间"""
+
+import importlib
+import sys
+import threading
+import types
+
+
+class _LazyModule(types.ModuleType):
+    """模块代理：首次访问属性时导入真实模块，并把其属性复制到自身（之后的访问不再经过代理逻辑）"""
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_lock'] = threading.Lock()
+
+    def __getattr__(self, attr):
+        with self.__dict__['_lazy_lock']:
+            module = importlib.import_module(self.__name__)
+            self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name):
+    """返回模块 name；尚未导入时返回延迟导入的代理"""
+    if name in sys.modules:
+        return sys.modules[name]
+    return _LazyModule(name)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基金分析系统命令行工具
+
+用法：
+    python manage.py import-csv --fund 默认基金 history.csv
+    python manage.py rebuild-metrics [--fund 默认基金]
+    python manage.py export-snapshot [--fund 默认基金] [目录]
+    python manage.py grid-sweep --fund 默认基金 [--steps 1:10:0.5] [--amounts 1000] [--bands 10:60:5]
+"""
+
+import argparse
+import sys
+import time
+from models.db import Database
+from models.fund import Fund
+from config import SNAPSHOT_PATH
+
+
+def find_fund(value):
+    """按ID或名称查找基金"""
+    fund = Fund.get_by_id(int(value)) if value.isdigit() else None
+    return fund or Fund.get_by_name(value)
+
+
+def cmd_import_csv(args):
+    """导入CSV历史数据"""
+    from services.import_service import ImportService
+    fund = find_fund(args.fund)
+    if not fund:
+        print(f"❌ 基金不存在: {args.fund}")
+        return 1
+    with open(args.path, 'rb') as f:
+        success, msg, errors = ImportService.import_file(fund.fund_id, f.read())
+    print(('✅ ' if success else '❌ ') + msg)
+    for error in errors:
+        print(f"   {error}")
+    return 0 if success else 1
+
+
+def cmd_rebuild_metrics(args):
+    """重建计算结果表（不指定基金时重建全部）"""
+    from models.fund_metrics import FundMetrics
+    from services.cache import invalidate_fund
+    if args.fund:
+        fund = find_fund(args.fund)
+        if not fund:
+            print(f"❌ 基金不存在: {args.fund}")
+            return 1
+        funds = [fund]
+    else:
+        funds = Fund.get_all()
+    for fund in funds:
+        t0 = time.perf_counter()
+        FundMetrics.rebuild(fund.fund_id)
+        invalidate_fund(fund.fund_id)
+        print(f"✅ {fund.fund_name}: {(time.perf_counter() - t0) * 1000:.1f}ms")
+    return 0
+
+
+def cmd_export_snapshot(args):
+    """导出列式快照（不指定基金时导出全部）"""
+    from services.snapshot_service import SnapshotService
+    fund_ids = None
+    if args.fund:
+        funds = [find_fund(value) for value in args.fund]
+        missing = [value for value, fund in zip(args.fund, funds) if not fund]
+        if missing:
+            print(f"❌ 基金不存在: {', '.join(missing)}")
+            return 1
+        fund_ids = [fund.fund_id for fund in funds]
+    t0 = time.perf_counter()
+    manifest = SnapshotService.export(args.path, fund_ids)
+    print(f"✅ 已导出 {len(manifest['funds'])} 个基金、{manifest['rows']} 行到 {args.path}"
+          f"（{(time.perf_counter() - t0) * 1000:.1f}ms）")
+    return 0
+
+
+def cmd_grid_sweep(args):
+    """网格参数寻优，输出排名表"""
+    from services.sweep_service import SweepService
+    from config import SWEEP_STEPS, SWEEP_AMOUNTS, SWEEP_BANDS
+    fund = find_fund(args.fund)
+    if not fund:
+        print(f"❌ 基金不存在: {args.fund}")
+        return 1
+    try:
+        steps = SweepService.parse_values(args.steps, SWEEP_STEPS)
+        amounts = SweepService.parse_values(args.amounts, SWEEP_AMOUNTS)
+        bands = SweepService.parse_values(args.bands, SWEEP_BANDS)
+        t0 = time.perf_counter()
+        table = SweepService.run(fund.fund_id, steps, amounts, bands, args.base, args.sort, args.workers)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ {fund.fund_name}: {len(table)} 个参数组合（{(time.perf_counter() - t0) * 1000:.1f}ms）")
+    if args.csv:
+        table.to_csv(args.csv, index=False, encoding='utf-8-sig')
+        print(f"   已保存到 {args.csv}")
+    if not table.empty:
+        print(table.head(args.top).to_string(index=False))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='基金分析系统命令行工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    p = subparsers.add_parser('import-csv', help='批量导入CSV历史数据（date,net_value,addition,shares）')
+    p.add_argument('--fund', required=True, help='基金ID或名称')
+    p.add_argument('path', help='CSV文件路径')
+    p.set_defaults(func=cmd_import_csv)
+
+    p = subparsers.add_parser('rebuild-metrics', help='从头重算并写入计算结果表')
+    p.add_argument('--fund', help='基金ID或名称（默认全部基金）')
+    p.set_defaults(func=cmd_rebuild_metrics)
+
+    p = subparsers.add_parser('export-snapshot', help='导出列式快照（.npy + manifest.json，可内存映射加载）')
+    p.add_argument('--fund', action='append', help='基金ID或名称（可重复，默认全部基金）')
+    p.add_argument('path', nargs='?', default=SNAPSHOT_PATH, help=f'导出目录（默认 {SNAPSHOT_PATH}）')
+    p.set_defaults(func=cmd_export_snapshot)
+
+    p = subparsers.add_parser('grid-sweep', help='网格参数寻优（批量回测格距/每格金额/区间宽度组合）')
+    p.add_argument('--fund', required=True, help='基金ID或名称')
+    p.add_argument('--steps', help='格距（%%），如 1,2,3 或 1:10:0.5')
+    p.add_argument('--amounts', help='每格金额，如 500,1000')
+    p.add_argument('--bands', help='区间宽度（%%），最大格数 = 区间宽度 / 格距')
+    p.add_argument('--base', type=float, help='基准净值（默认取首日净值）')
+    p.add_argument('--sort', choices=['总涨幅(%)', '到手总增额'], help='排名依据（默认总涨幅）')
+    p.add_argument('--workers', type=int, help='进程数（默认按配置）')
+    p.add_argument('--top', type=int, default=20, help='显示前几名')
+    p.add_argument('--csv', help='完整排名表保存为CSV')
+    p.set_defaults(func=cmd_grid_sweep)
+
+    args = parser.parse_args(argv)
+    Database.init_db()
+    Fund.migrate()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,14 +1,402 @@
+import logging
+import os
+import re
 import sqlite3
-import pandas as pd
-from config import DATABASE_PATH
+import sys
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from lazy import lazy_import
+from instrumentation import timed
+from config import (DATABASE_PATH, DB_POOL_CONNECTIONS, DB_BUSY_TIMEOUT, DB_JOURNAL_MODE,
+                    DB_SYNCHRONOUS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE,
+                    DB_PROFILE_ENABLED, DB_SLOW_QUERY_MS, DB_EXPLAIN_SLOW, DB_SLOW_LOG_SIZE,
+                    DB_PROFILE_MAX_STATEMENTS)
+
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# 每个线程复用的连接
+_local = threading.local()
+
+# 语句执行、取数、提交计入请求的 db 阶段
+_db_phase = timed('db')
+
+
+class QueryRecord:
+    """一条语句的执行记录（耗时含执行及取数）"""
+    __slots__ = ('sql', 'params', 'caller', 'duration', 'rows', 'done')
+
+    def __init__(self, sql, params, caller, duration):
+        self.sql = sql
+        self.params = params
+        self.caller = caller
+        self.duration = duration
+        self.rows = 0
+        self.done = False
+
+
+class QueryProfiler:
+    """SQL 分析：记录每条语句的规范化SQL、耗时、行数及调用方（模型方法）
+
+    超过 DB_SLOW_QUERY_MS 的语句写入日志及最近慢查询列表（可附带 EXPLAIN QUERY PLAN）；
+    begin()/end() 之间（每个请求）执行的语句按路由汇总，得到各模型方法每个请求的调用次数。
+    未启用时游标只多一次属性判断。统计保存在进程内。
+    """
+    enabled = DB_PROFILE_ENABLED
+    _lock = threading.Lock()
+    _statements = {}  # 规范化SQL -> [次数, 总耗时, 最大耗时, 总行数]
+    _callers = {}  # 调用方 -> [次数, 总耗时, 总行数]
+    _routes = {}  # 路由 -> {'requests': 请求数, 'callers': {调用方: [次数, 总耗时]}}
+    _slow = deque(maxlen=DB_SLOW_LOG_SIZE)
+    _plans = {}  # 规范化SQL -> 查询计划（每条语句只分析一次）
+    _scope = ContextVar('query_scope', default=None)  # 当前请求已执行的语句
+
+    @staticmethod
+    def begin():
+        """开始收集当前请求（或任意代码段）执行的语句"""
+        if QueryProfiler.enabled:
+            QueryProfiler._scope.set([])
+
+    @staticmethod
+    def end(label):
+        """结束收集，按 label（路由）汇总各调用方的次数，返回本段的语句记录"""
+        records = QueryProfiler._scope.get()
+        if records is None:
+            return []
+        QueryProfiler._scope.set(None)
+        for record in records:
+            QueryProfiler.finish(record)
+        with QueryProfiler._lock:
+            route = QueryProfiler._routes.setdefault(label, {'requests': 0, 'callers': {}})
+            route['requests'] += 1
+            for record in records:
+                stat = route['callers'].setdefault(record.caller, [0, 0.0])
+                stat[0] += 1
+                stat[1] += record.duration
+        return records
+
+    @staticmethod
+    def start(sql, params, duration):
+        """登记一条已执行的语句（取数耗时及行数随后累加）"""
+        record = QueryRecord(sql, params, _caller(), duration)
+        records = QueryProfiler._scope.get()
+        if records is not None:
+            records.append(record)
+        return record
+
+    @staticmethod
+    def finish(record):
+        """语句结束（结果集取完、游标复用或释放）：计入统计，慢查询写日志"""
+        if record.done:
+            return
+        record.done = True
+        sql = normalize_sql(record.sql)
+        with QueryProfiler._lock:
+            stat = QueryProfiler._statements.get(sql)
+            if stat is None:
+                if len(QueryProfiler._statements) >= DB_PROFILE_MAX_STATEMENTS:
+                    sql = '（其他语句）'
+                stat = QueryProfiler._statements.setdefault(sql, [0, 0.0, 0.0, 0])
+            stat[0] += 1
+            stat[1] += record.duration
+            stat[2] = max(stat[2], record.duration)
+            stat[3] += record.rows
+            caller = QueryProfiler._callers.setdefault(record.caller, [0, 0.0, 0])
+            caller[0] += 1
+            caller[1] += record.duration
+            caller[2] += record.rows
+        if record.duration * 1000 >= DB_SLOW_QUERY_MS:
+            QueryProfiler._log_slow(sql, record)
+
+    @staticmethod
+    def explain(sql, params=()):
+        """EXPLAIN QUERY PLAN 文本行（单独的连接，不影响调用方事务），失败时返回错误说明
+
+        查询计划与参数值无关，缺少参数时以 NULL 代替。
+        """
+        conn = sqlite3.connect(DATABASE_PATH, timeout=DB_BUSY_TIMEOUT)
+        try:
+            rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, params or [None] * sql.count('?')).fetchall()
+        except sqlite3.Error as e:
+            return [f'无法分析：{e}']
+        finally:
+            conn.close()
+        # 每行为 (id, parent, notused, detail)，按父节点缩进
+        depth = {0: 0}
+        lines = []
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, 0) + 1
+            lines.append('  ' * (depth[node] - 1) + detail)
+        return lines
+
+    @staticmethod
+    def summary(top=20):
+        """分析汇总：耗时最多的语句、调用最多的调用方、各路由每个请求的调用次数、最近的慢查询"""
+        def ms(seconds):
+            return round(seconds * 1000, 3)
+
+        with QueryProfiler._lock:
+            statements = sorted(QueryProfiler._statements.items(), key=lambda item: -item[1][1])[:top]
+            callers = sorted(QueryProfiler._callers.items(), key=lambda item: -item[1][0])
+            routes = {
+                label: {
+                    'requests': route['requests'],
+                    'callers': [{'caller': caller, 'calls': calls, 'per_request': round(calls / route['requests'], 2),
+                                 'total_ms': ms(total)}
+                                for caller, (calls, total) in sorted(route['callers'].items(), key=lambda item: -item[1][0])],
+                }
+                for label, route in sorted(QueryProfiler._routes.items())
+            }
+            slow = list(QueryProfiler._slow)
+        return {
+            'enabled': QueryProfiler.enabled,
+            'slow_query_ms': DB_SLOW_QUERY_MS,
+            'statements': [{'sql': sql, 'calls': calls, 'total_ms': ms(total), 'avg_ms': ms(total / calls),
+                            'max_ms': ms(longest), 'rows': rows}
+                           for sql, (calls, total, longest, rows) in statements],
+            'callers': [{'caller': caller, 'calls': calls, 'total_ms': ms(total), 'rows': rows}
+                        for caller, (calls, total, rows) in callers],
+            'routes': routes,
+            'slow': slow,
+        }
+
+    @staticmethod
+    def reset():
+        """清空统计"""
+        with QueryProfiler._lock:
+            QueryProfiler._statements.clear()
+            QueryProfiler._callers.clear()
+            QueryProfiler._routes.clear()
+            QueryProfiler._slow.clear()
+            QueryProfiler._plans.clear()
+
+    @staticmethod
+    def _log_slow(sql, record):
+        """记录慢查询（查询计划按规范化SQL缓存）"""
+        plan = None
+        if DB_EXPLAIN_SLOW:
+            plan = QueryProfiler._plans.get(sql)
+            if plan is None:
+                plan = QueryProfiler._plans[sql] = QueryProfiler.explain(record.sql, record.params)
+        entry = {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'sql': sql,
+            'duration_ms': round(record.duration * 1000, 3),
+            'rows': record.rows,
+            'caller': record.caller,
+            'plan': plan,
+        }
+        with QueryProfiler._lock:
+            QueryProfiler._slow.append(entry)
+        logger.warning('慢查询 %.1fms rows=%d caller=%s: %s%s', entry['duration_ms'], record.rows, record.caller, sql,
+                       ''.join('\n    ' + line for line in plan or []))
+
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """规范化SQL：去掉注释、合并空白，字面量替换为 ?，连续的占位符合并为 ?, ..."""
+    sql = re.sub(r'--[^\n]*', ' ', sql)
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'(?<![\w.])-?\d+(?:\.\d+)?\b', '?', sql)
+    sql = ' '.join(sql.split())
+    return re.sub(r'\?(?:\s*,\s*\?)+', '?, ...', sql)
+
+
+# 调用方识别时跳过的模块（数据库层自身及第三方库）
+_SKIP_MODULES = (__name__, 'pandas', 'sqlite3', 'contextlib', 'instrumentation')
+
+
+def _caller():
+    """执行语句的业务代码位置，如 Fund.get_by_id（模块级函数带模块名）"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if not module.startswith(_SKIP_MODULES):
+            code = frame.f_code
+            # co_qualname 仅 Python 3.11+ 提供；更早版本按 self/cls 拼出类名（静态方法只能带模块名）
+            name = getattr(code, 'co_qualname', None)
+            if name is None:
+                name = code.co_name
+                owner = frame.f_locals.get('self', frame.f_locals.get('cls'))
+                if owner is not None:
+                    name = f'{(owner if isinstance(owner, type) else type(owner)).__name__}.{name}'
+            return name if '.' in name else f'{module}.{name}'
+        frame = frame.f_back
+    return '?'
+
+
+class TimedCursor(sqlite3.Cursor):
+    """计时游标（pandas.read_sql 及模型中的 cursor() 均使用该游标）
+
+    启用SQL分析时，每条语句从执行到结果集取完（或游标复用、释放）记为一条记录。
+    """
+    _query = None  # 分析中的语句
+
+    def execute(self, sql, *args):
+        if not QueryProfiler.enabled:
+            with _db_phase:
+                return super().execute(sql, *args)
+        self._finish_query()
+        start = time.perf_counter()
+        with _db_phase:
+            super().execute(sql, *args)
+        self._query = QueryProfiler.start(sql, args[0] if args else (), time.perf_counter() - start)
+        if self.description is None:
+            # 非查询语句：行数为受影响行数
+            self._query.rows = max(self.rowcount, 0)
+            self._finish_query()
+        return self
+
+    def executemany(self, sql, rows):
+        if not QueryProfiler.enabled:
+            with _db_phase:
+                return super().executemany(sql, rows)
+        self._finish_query()
+        start = time.perf_counter()
+        with _db_phase:
+            super().executemany(sql, rows)
+        # 以第一组参数作为分析查询计划时的参数（生成器已被消耗，不再读取）
+        params = rows[0] if isinstance(rows, (list, tuple)) and rows else ()
+        self._query = QueryProfiler.start(sql, params, time.perf_counter() - start)
+        self._query.rows = max(self.rowcount, 0)
+        self._finish_query()
+        return self
+
+    def fetchone(self):
+        query = self._query
+        start = time.perf_counter() if query is not None else 0.0
+        with _db_phase:
+            row = super().fetchone()
+        if query is not None:
+            query.duration += time.perf_counter() - start
+            if row is None:
+                self._finish_query()
+            else:
+                query.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        query = self._query
+        start = time.perf_counter() if query is not None else 0.0
+        with _db_phase:
+            rows = super().fetchmany(*args)
+        if query is not None:
+            query.duration += time.perf_counter() - start
+            query.rows += len(rows)
+            if not rows:
+                self._finish_query()
+        return rows
+
+    def fetchall(self):
+        query = self._query
+        start = time.perf_counter() if query is not None else 0.0
+        with _db_phase:
+            rows = super().fetchall()
+        if query is not None:
+            query.duration += time.perf_counter() - start
+            query.rows += len(rows)
+            self._finish_query()
+        return rows
+
+    def close(self):
+        self._finish_query()
+        super().close()
+
+    def __del__(self):
+        self._finish_query()
+
+    def _finish_query(self):
+        if self._query is not None:
+            QueryProfiler.finish(self._query)
+            self._query = None
+
+
+class TimedConnection(sqlite3.Connection):
+    """游标为 TimedCursor 的连接，提交也计入 db 阶段"""
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, *args):
+        return self.cursor().execute(*args)
+
+    def commit(self):
+        with _db_phase:
+            super().commit()
+
+
+class PooledConnection(TimedConnection):
+    """线程内复用的连接
+
+    close() 不真正关闭连接：最外层使用者释放时回滚未提交的事务（与关闭连接的效果一致），
+    连接留给同一线程的下一次 get_conn() 使用。
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.users = 0  # 当前持有该连接的调用层数
+
+    def close(self):
+        self.users = max(self.users - 1, 0)
+        if self.users == 0 and self.in_transaction:
+            self.rollback()
+
+    def close_now(self):
+        """真正关闭连接"""
+        super().close()
+
 
 class Database:
     """数据库连接管理类"""
+    # 重算结果的写事务在本进程内排队执行：SQLite 忙等待不保证先到先得，
+    # 多线程同时写入时个别线程可能等满超时仍拿不到写锁
+    write_lock = threading.RLock()
+
     @staticmethod
     def get_conn():
-        """获取数据库连接"""
-        conn = sqlite3.connect(DATABASE_PATH)
+        """获取数据库连接（默认每个线程复用同一连接，调用方仍按原方式 close()）"""
+        if not DB_POOL_CONNECTIONS:
+            return Database._connect(TimedConnection)
+
+        conn = getattr(_local, 'conn', None)
+        # 子进程（如进程池）不能沿用父进程的连接
+        if conn is None or _local.pid != os.getpid():
+            conn = Database._connect(PooledConnection)
+            _local.conn = conn
+            _local.pid = os.getpid()
+        conn.users += 1
+        return conn
+
+    @staticmethod
+    def release_thread_conn():
+        """请求结束时调用：回滚遗留的未提交事务并重置持有计数（防止异常路径未 close 而长期占用写锁）"""
+        conn = getattr(_local, 'conn', None)
+        if conn is not None and _local.pid == os.getpid():
+            conn.users = 0
+            if conn.in_transaction:
+                conn.rollback()
+
+    @staticmethod
+    def close_thread_conn():
+        """关闭当前线程复用的连接（线程结束或需要释放文件时调用）"""
+        conn = getattr(_local, 'conn', None)
+        if conn is not None and _local.pid == os.getpid():
+            conn.close_now()
+        _local.conn = None
+
+    @staticmethod
+    def _connect(factory):
+        """新建连接并设置 WAL 等参数"""
+        conn = sqlite3.connect(DATABASE_PATH, timeout=DB_BUSY_TIMEOUT, factory=factory)
         conn.row_factory = sqlite3.Row  # 支持按列名访问
+        # WAL：读写互不阻塞，手机与电脑同时写入时减少 "database is locked"
+        conn.execute(f'PRAGMA journal_mode={DB_JOURNAL_MODE}')
+        conn.execute(f'PRAGMA synchronous={DB_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA cache_size={-int(DB_CACHE_SIZE_KB)}')  # 负数表示KB
+        conn.execute(f'PRAGMA mmap_size={int(DB_MMAP_SIZE)}')
+        conn.execute(f'PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT * 1000)}')
         return conn
 
     @staticmethod
@@ -36,6 +424,43 @@ class Database:
                             FOREIGN KEY (fund_id) REFERENCES funds(fund_id),
                             UNIQUE(fund_id, date) -- 同一基金日期不可重复
                           )''')
+
+        # 3. 逐行运行状态表（增量重算检查点，随数据修改失效）
+        cursor.execute('''CREATE TABLE IF NOT EXISTS fund_state (
+                            fund_id INTEGER NOT NULL, -- 关联基金ID
+                            date TEXT NOT NULL, -- 该行日期
+                            total_shares REAL NOT NULL, -- 总份
+                            total_input REAL NOT NULL, -- 总投入
+                            sum_pos REAL NOT NULL, -- 正加额累计
+                            sum_neg REAL NOT NULL, -- 负加额累计（绝对值）
+                            total_gain REAL NOT NULL, -- 到手总增额
+                            gains TEXT, -- 到手增额列表（JSON）
+                            gain_pcts TEXT, -- 到手增幅列表（JSON）
+                            closed_lots TEXT, -- 本行取完的批次（JSON）
+                            open_lots TEXT, -- 本行后的未平仓批次快照（JSON，可为空）
+                            FOREIGN KEY (fund_id) REFERENCES funds(fund_id),
+                            PRIMARY KEY (fund_id, date)
+                          )''')
+
+        # 4. 逐行计算结果表（随 fund_data 在同一事务内更新，页面/接口直接读取）
+        cursor.execute('''CREATE TABLE IF NOT EXISTS fund_metrics (
+                            fund_id INTEGER NOT NULL, -- 关联基金ID
+                            date TEXT NOT NULL, -- 该行日期
+                            addition REAL NOT NULL, -- 加额（已与加份互算）
+                            shares REAL NOT NULL, -- 加份（已与加额互算）
+                            total_amount REAL NOT NULL, -- 总额
+                            total_shares REAL NOT NULL, -- 总份
+                            net_change_pct REAL NOT NULL, -- 净值涨幅(%)
+                            total_input REAL NOT NULL, -- 总投入
+                            total_return_pct REAL NOT NULL, -- 总涨幅(%)
+                            gains TEXT, -- 到手增额列表（JSON）
+                            gain_pcts TEXT, -- 到手增幅列表（JSON）
+                            total_gain REAL NOT NULL, -- 到手总增额
+                            buy_lot INTEGER NOT NULL, -- 本行是否买入批次（1/0）
+                            close_date TEXT, -- 本行买入批次被取完的日期（未取完为空）
+                            FOREIGN KEY (fund_id) REFERENCES funds(fund_id),
+                            PRIMARY KEY (fund_id, date)
+                          )''')
         
         conn.commit()
         conn.close()
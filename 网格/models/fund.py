@@ -1,12 +1,25 @@
+from lazy import lazy_import
 from models.db import Database
+from models.fund_state import FundState
+from models.fund_metrics import FundMetrics
+from services.cache import invalidate_fund
 from datetime import datetime
+import logging
 import sqlite3
 
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# 规范格式（YYYY-MM-DD）的日期，GLOB 匹配
+CANONICAL_DATE_GLOB = '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+
 class Fund:
     """基金模型类"""
-    def __init__(self, fund_id=None, fund_name=None):
+    def __init__(self, fund_id=None, fund_name=None, last_update=None):
         self.fund_id = fund_id
         self.fund_name = fund_name
+        self.last_update = last_update  # 数据版本（每次保存数据时更新）
 
     @classmethod
     def create(cls, fund_name):
@@ -28,8 +41,9 @@ class Fund:
         """获取所有基金"""
         conn = Database.get_conn()
         cursor = conn.cursor()
-        cursor.execute('SELECT fund_id, fund_name FROM funds ORDER BY create_time DESC')
-        funds = [cls(fund_id=row['fund_id'], fund_name=row['fund_name']) for row in cursor.fetchall()]
+        cursor.execute('SELECT fund_id, fund_name, last_update FROM funds ORDER BY create_time DESC')
+        funds = [cls(fund_id=row['fund_id'], fund_name=row['fund_name'], last_update=row['last_update'])
+                 for row in cursor.fetchall()]
         conn.close()
         return funds
 
@@ -38,25 +52,130 @@ class Fund:
         """通过ID获取基金"""
         conn = Database.get_conn()
         cursor = conn.cursor()
-        cursor.execute('SELECT fund_id, fund_name FROM funds WHERE fund_id=?', (fund_id,))
+        cursor.execute('SELECT fund_id, fund_name, last_update FROM funds WHERE fund_id=?', (fund_id,))
         row = cursor.fetchone()
         conn.close()
-        return cls(fund_id=row['fund_id'], fund_name=row['fund_name']) if row else None
+        return cls(fund_id=row['fund_id'], fund_name=row['fund_name'], last_update=row['last_update']) if row else None
 
-    def save_data(self, date, net_value, addition=None, shares=None):
-        """保存基金数据（支持更新）"""
+    @classmethod
+    def get_by_name(cls, fund_name):
+        """通过名称获取基金"""
         conn = Database.get_conn()
         cursor = conn.cursor()
-        # 更新最后修改时间
-        cursor.execute('UPDATE funds SET last_update=? WHERE fund_id=?', 
-                      (datetime.now(), self.fund_id))
-        # 保存/更新数据
-        cursor.execute('''INSERT OR REPLACE INTO fund_data 
-                         (fund_id, date, net_value, addition, shares) 
-                         VALUES (?, ?, ?, ?, ?)''', 
-                      (self.fund_id, date, net_value, addition, shares))
-        conn.commit()
+        cursor.execute('SELECT fund_id, fund_name, last_update FROM funds WHERE fund_name=?', (fund_name,))
+        row = cursor.fetchone()
         conn.close()
+        return cls(fund_id=row['fund_id'], fund_name=row['fund_name'], last_update=row['last_update']) if row else None
+
+    @staticmethod
+    def normalize_date(value):
+        """日期统一保存为 YYYY-MM-DD（与计算结果的日期一致，读取时可直接对应），无法解析时抛出ValueError"""
+        return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+    def save_data(self, date, net_value, addition=None, shares=None):
+        """保存基金数据（支持更新）"""
+        date = Fund.normalize_date(date)
+        with Database.write_lock:
+            conn = Database.get_conn()
+            cursor = conn.cursor()
+            try:
+                # 更新最后修改时间
+                cursor.execute('UPDATE funds SET last_update=? WHERE fund_id=?', 
+                              (datetime.now(), self.fund_id))
+                # 保存/更新数据
+                cursor.execute('''INSERT OR REPLACE INTO fund_data 
+                                 (fund_id, date, net_value, addition, shares) 
+                                 VALUES (?, ?, ?, ?, ?)''', 
+                              (self.fund_id, date, net_value, addition, shares))
+                # 该日期及之后的运行状态失效，从之前的检查点续算并写入结果表
+                FundState.invalidate_from(cursor, self.fund_id, date)
+                FundMetrics.refresh(cursor, self.fund_id)
+                conn.commit()
+            finally:
+                conn.close()
+        invalidate_fund(self.fund_id, date)
+
+    def save_data_bulk(self, rows):
+        """批量保存基金数据（单个事务），rows 为 (date, net_value, addition, shares) 列表"""
+        if not rows:
+            return 0
+        rows = [(Fund.normalize_date(date), *values) for date, *values in rows]
+        with Database.write_lock:
+            conn = Database.get_conn()
+            cursor = conn.cursor()
+            try:
+                cursor.execute('UPDATE funds SET last_update=? WHERE fund_id=?',
+                               (datetime.now(), self.fund_id))
+                cursor.executemany('''INSERT OR REPLACE INTO fund_data
+                                      (fund_id, date, net_value, addition, shares)
+                                      VALUES (?, ?, ?, ?, ?)''',
+                                   [(self.fund_id, *row) for row in rows])
+                # 从最早的导入日期起运行状态失效，续算并写入结果表
+                FundState.invalidate_from(cursor, self.fund_id, min(row[0] for row in rows))
+                FundMetrics.refresh(cursor, self.fund_id)
+                conn.commit()
+            finally:
+                conn.close()
+        invalidate_fund(self.fund_id, min(row[0] for row in rows))
+        return len(rows)
+
+    @classmethod
+    def migrate(cls):
+        """升级旧数据库（启动时执行一次）：规范历史日期格式，补齐尚未物化的结果
+
+        读取路径因此不再需要在写锁内补算。规范后与已有日期重复的行保留已有的一行。
+        """
+        conn = Database.get_conn()
+        try:
+            legacy = conn.execute(f'''SELECT fund_id, date FROM fund_data
+                                      WHERE date NOT GLOB '{CANONICAL_DATE_GLOB}' ''').fetchall()
+        finally:
+            conn.close()
+        if legacy:
+            cls._normalize_stored_dates([(row['fund_id'], row['date']) for row in legacy])
+
+        conn = Database.get_conn()
+        try:
+            pending = conn.execute('''SELECT DISTINCT d.fund_id FROM fund_data d
+                                      LEFT JOIN fund_metrics m ON m.fund_id = d.fund_id AND m.date = d.date
+                                      WHERE m.date IS NULL''').fetchall()
+        finally:
+            conn.close()
+        for row in pending:
+            try:
+                FundMetrics.ensure(row['fund_id'])
+            except ValueError as e:
+                logger.warning('基金%s的结果补算失败：%s', row['fund_id'], e)
+            invalidate_fund(row['fund_id'])
+
+    @staticmethod
+    def _normalize_stored_dates(legacy):
+        """把 (fund_id, 原日期) 改写为规范格式，受影响基金的运行状态和结果从头重算"""
+        updates = []
+        for fund_id, date in legacy:
+            try:
+                updates.append((Fund.normalize_date(date), fund_id, date))
+            except ValueError:
+                logger.warning('基金%s的日期无法解析，保持原样：%s', fund_id, date)
+        with Database.write_lock:
+            conn = Database.get_conn()
+            cursor = conn.cursor()
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.executemany('UPDATE OR IGNORE fund_data SET date=? WHERE fund_id=? AND date=?', updates)
+                for date, fund_id, old in updates:
+                    cursor.execute('DELETE FROM fund_data WHERE fund_id=? AND date=?', (fund_id, old))
+                    if cursor.rowcount:
+                        logger.warning('基金%s的日期%s与已有日期%s重复，已删除', fund_id, old, date)
+                for fund_id in sorted({fund_id for _, fund_id, _ in updates}):
+                    FundState.invalidate_from(cursor, fund_id)
+                    FundMetrics.invalidate_from(cursor, fund_id)
+                    FundMetrics.refresh(cursor, fund_id)
+                conn.commit()
+            finally:
+                conn.close()
+        for fund_id in {fund_id for _, fund_id, _ in updates}:
+            invalidate_fund(fund_id)
 
     def update_name(self, new_name):
         """修改基金名称"""
@@ -67,6 +186,7 @@ class Fund:
                           (new_name, self.fund_id))
             conn.commit()
             self.fund_name = new_name
+            invalidate_fund(self.fund_id)
             return True
         except sqlite3.IntegrityError:
             # 名称已存在
@@ -81,15 +201,30 @@ class Fund:
         try:
             # 先删除关联数据
             cursor.execute('DELETE FROM fund_data WHERE fund_id=?', (self.fund_id,))
+            FundState.invalidate_from(cursor, self.fund_id)
+            FundMetrics.invalidate_from(cursor, self.fund_id)
             # 再删除基金
             cursor.execute('DELETE FROM funds WHERE fund_id=?', (self.fund_id,))
             conn.commit()
+            invalidate_fund(self.fund_id)
             return True
         except Exception as e:
             return False
         finally:
             conn.close()
 
+    @classmethod
+    def get_history_for(cls, fund_ids):
+        """一次查询获取多个基金的历史数据（含 fund_id、fund_name 列，按基金、日期排序）"""
+        placeholders = ','.join('?' * len(fund_ids))
+        return Database.query_to_df(f'''
+            SELECT d.fund_id, f.fund_name, d.date, d.net_value, d.addition, d.shares
+            FROM fund_data d
+            JOIN funds f ON f.fund_id = d.fund_id
+            WHERE d.fund_id IN ({placeholders})
+            ORDER BY d.fund_id, d.date
+        ''', tuple(fund_ids))
+
     def get_history_data(self):
         """获取基金历史数据"""
         return Database.query_to_df('''
@@ -97,4 +232,23 @@ class Fund:
             FROM fund_data 
             WHERE fund_id=? 
             ORDER BY date
-        ''', (self.fund_id,))
\ No newline at end of file
+        ''', (self.fund_id,))
+
+    def get_history_since(self, date):
+        """获取指定日期（不含）之后的历史数据（增量计算用）"""
+        return Database.query_to_df('''
+            SELECT date, net_value, addition, shares
+            FROM fund_data
+            WHERE fund_id=? AND date>?
+            ORDER BY date
+        ''', (self.fund_id, date))
+
+    def get_history_totals(self, date):
+        """指定日期（含）及之前的记录数与净值合计，返回 (行数, 合计)（校验增量状态用）"""
+        conn = Database.get_conn()
+        cursor = conn.cursor()
+        cursor.execute('''SELECT COUNT(*) AS n, TOTAL(net_value) AS total
+                          FROM fund_data WHERE fund_id=? AND date<=?''', (self.fund_id, date))
+        row = cursor.fetchone()
+        conn.close()
+        return row['n'], row['total']
\ No newline at end of file
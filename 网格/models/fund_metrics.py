@@ -0,0 +1,194 @@
+import json
+from lazy import lazy_import
+from models.db import Database
+from models.fund_state import FundState
+from services.calculator import InvestmentCalculator, FLOAT_COLUMNS, PERCENT_COLUMNS, LIST_COLUMNS
+from config import DECIMAL_PRECISION, STATE_SNAPSHOT_INTERVAL
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# 结果列与 fund_metrics 表字段的对应关系（净值取自 fund_data，加额最新涨幅读取时计算）
+STORED_COLUMNS = {
+    '加额': 'addition',
+    '加份': 'shares',
+    '总额': 'total_amount',
+    '总份': 'total_shares',
+    '净值涨幅(%)': 'net_change_pct',
+    '总投入': 'total_input',
+    '总涨幅(%)': 'total_return_pct',
+    '到手增额': 'gains',
+    '到手增幅': 'gain_pcts',
+    '到手总增额': 'total_gain',
+}
+
+
+class FundMetrics:
+    """基金逐行计算结果（物化表，随 fund_data 在同一事务内更新）"""
+    @staticmethod
+    def load(fund_id):
+        """一次查询读取原始记录及计算结果，返回 (history_df, result_df)
+
+        存在尚未物化的行（旧数据库或数据被绕过模型修改）时返回None，由调用方刷新后重读。
+        """
+        df = Database.query_to_df('''
+            SELECT d.date, d.net_value, d.addition, d.shares,
+                   m.date AS m_date, m.addition AS m_addition, m.shares AS m_shares,
+                   m.total_amount, m.total_shares, m.net_change_pct, m.total_input,
+                   m.total_return_pct, m.gains, m.gain_pcts, m.total_gain,
+                   m.buy_lot, m.close_date
+            FROM fund_data d
+            LEFT JOIN fund_metrics m ON m.fund_id = d.fund_id AND m.date = d.date
+            WHERE d.fund_id=?
+            ORDER BY d.date
+        ''', (fund_id,))
+        history_df = df[['date', 'net_value', 'addition', 'shares']]
+        if df.empty:
+            return history_df, pd.DataFrame()
+        if df['m_date'].isna().any():
+            return None
+
+        def load_list(texts):
+            # 整列为空时 read_sql 返回 NaN
+            return pd.Series([json.loads(text) if isinstance(text, str) else [] for text in texts.tolist()], dtype=object)
+
+        dates = df['date'].to_numpy()
+        net = df['net_value'].to_numpy(dtype=float)
+        # ===== 加额最新涨幅 =====
+        # 依赖最新净值，不落库：已完全提取的使用提取时净值，否则使用最新净值
+        final_net = np.full(len(net), net[-1])
+        closed = df['close_date'].notna().to_numpy()
+        if closed.any():
+            final_net[closed] = net[pd.Index(dates).get_indexer(df['close_date'][closed])]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            最新涨幅 = np.where(df['buy_lot'].to_numpy() == 1, (final_net - net) / net * 100, 0.0)
+
+        result_df = pd.DataFrame({
+            '日期': dates,
+            '净值': df['net_value'].to_numpy(),
+            '加额': df['m_addition'].to_numpy(dtype=float),
+            '加份': df['m_shares'].to_numpy(dtype=float),
+            '总额': df['total_amount'].to_numpy(dtype=float),
+            '总份': df['total_shares'].to_numpy(dtype=float),
+            '净值涨幅(%)': df['net_change_pct'].to_numpy(dtype=float),
+            '总投入': df['total_input'].to_numpy(dtype=float),
+            '总涨幅(%)': df['total_return_pct'].to_numpy(dtype=float),
+            '加额最新涨幅(%)': 最新涨幅,
+            '到手增额': load_list(df['gains']),
+            '到手增幅': load_list(df['gain_pcts']),
+            '到手总增额': df['total_gain'].to_numpy(dtype=float),
+        })
+        # 落库的列已按精度保存，这里与计算器保持同样的取整
+        for col in FLOAT_COLUMNS + PERCENT_COLUMNS:
+            result_df[col] = result_df[col].round(DECIMAL_PRECISION)
+        return history_df, result_df
+
+    @staticmethod
+    def latest():
+        """一次查询读取各基金最新一行的结果及累计加额（组合汇总用，无数据的基金不返回）
+
+        最新一行尚未物化的基金 m_date 为空，由调用方刷新后重读。
+        """
+        return Database.query_to_df('''
+            SELECT f.fund_id, f.fund_name, d.date, d.net_value,
+                   m.date AS m_date, m.total_amount, m.total_input, m.total_return_pct, m.total_gain,
+                   s.sum_pos, s.sum_neg
+            FROM funds f
+            JOIN (SELECT fund_id, MAX(date) AS date FROM fund_data GROUP BY fund_id) last
+                 ON last.fund_id = f.fund_id
+            JOIN fund_data d ON d.fund_id = last.fund_id AND d.date = last.date
+            LEFT JOIN fund_metrics m ON m.fund_id = d.fund_id AND m.date = d.date
+            LEFT JOIN fund_state s ON s.fund_id = d.fund_id AND s.date = d.date
+            ORDER BY f.create_time DESC, f.fund_id
+        ''')
+
+    @staticmethod
+    def refresh(cursor, fund_id):
+        """在调用方事务内重算并写入失效部分的结果（从最后一个检查点续算，只读取其后的记录）"""
+        # 尚未物化的行（旧数据库）之后的运行状态一并重算
+        cursor.execute('''SELECT MIN(d.date) AS date FROM fund_data d
+                          LEFT JOIN fund_metrics m ON m.fund_id = d.fund_id AND m.date = d.date
+                          WHERE d.fund_id=? AND m.date IS NULL''', (fund_id,))
+        missing = cursor.fetchone()['date']
+        if missing is not None:
+            FundState.invalidate_from(cursor, fund_id, missing)
+
+        checkpoint = FundState.checkpoint(cursor, fund_id)
+        if checkpoint is not None:
+            cursor.execute('SELECT COUNT(*) AS n FROM fund_data WHERE fund_id=? AND date<=?',
+                           (fund_id, checkpoint['date']))
+            checkpoint['rows'] = cursor.fetchone()['n']
+        history_df = pd.read_sql('''SELECT date, net_value, addition, shares
+                                    FROM fund_data WHERE fund_id=? AND date>=? ORDER BY date''',
+                                 cursor.connection, params=(fund_id, checkpoint['date'] if checkpoint else ''))
+        if history_df.empty:
+            FundMetrics.invalidate_from(cursor, fund_id)
+            FundState.invalidate_from(cursor, fund_id)
+            return
+
+        df = InvestmentCalculator.prepare(history_df)
+        result_df, new_rows = InvestmentCalculator.resume(df, checkpoint, STATE_SNAPSHOT_INTERVAL)
+        if result_df.empty:
+            return
+        FundState.write(cursor, fund_id, new_rows)
+        if checkpoint is not None and not InvestmentCalculator.snapshot_due(
+                checkpoint['rows'], len(json.loads(checkpoint['lots'])), STATE_SNAPSHOT_INTERVAL):
+            # 续算起点是上次写入时最后一行的快照（非定期快照），新的最后一行已有快照，
+            # 清除旧快照，保证除定期快照外只保留一个，逐条追加时快照总量不随行数增长
+            FundState.drop_snapshot(cursor, fund_id, checkpoint['date'])
+
+        def dump_list(values):
+            return json.dumps(values) if values else None
+
+        # 买入批次标记按清洗后的加额判断（结果表中的加额已取整）
+        buy_lot = df['addition'].to_numpy()[len(df) - len(result_df):] > 0
+        columns = [[dump_list(values) for values in result_df[col]] if col in LIST_COLUMNS else result_df[col].tolist()
+                   for col in STORED_COLUMNS]
+        rows = [(fund_id, date, *values, int(flag))
+                for date, flag, *values in zip(result_df['日期'].tolist(), buy_lot, *columns)]
+        FundMetrics.invalidate_from(cursor, fund_id, new_rows['date'][0])
+        fields = ', '.join(STORED_COLUMNS.values())
+        cursor.executemany(f'''INSERT INTO fund_metrics (fund_id, date, {fields}, buy_lot)
+                               VALUES ({', '.join('?' * (len(STORED_COLUMNS) + 3))})''', rows)
+
+        # 批次提取日期（批次ID即买入日期，可能早于本次重算的起点）
+        closes = [(date, fund_id, lot) for date, lots in zip(new_rows['date'], new_rows['closed']) for lot in lots]
+        cursor.executemany('UPDATE fund_metrics SET close_date=? WHERE fund_id=? AND date=?', closes)
+
+    @staticmethod
+    def rebuild(fund_id):
+        """丢弃已保存的运行状态和结果，从头重算该基金"""
+        with Database.write_lock:
+            conn = Database.get_conn()
+            cursor = conn.cursor()
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                FundState.invalidate_from(cursor, fund_id)
+                FundMetrics.invalidate_from(cursor, fund_id)
+                FundMetrics.refresh(cursor, fund_id)
+                conn.commit()
+            finally:
+                conn.close()
+
+    @staticmethod
+    def ensure(fund_id):
+        """补齐尚未物化的结果（升级旧数据库时由 Fund.migrate 调用）"""
+        with Database.write_lock:
+            conn = Database.get_conn()
+            cursor = conn.cursor()
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                FundMetrics.refresh(cursor, fund_id)
+                conn.commit()
+            finally:
+                conn.close()
+
+    @staticmethod
+    def invalidate_from(cursor, fund_id, date=None):
+        """删除指定日期及之后的结果（不传日期则全部删除），并重新打开在此期间被取完的批次"""
+        if date is None:
+            cursor.execute('DELETE FROM fund_metrics WHERE fund_id=?', (fund_id,))
+            return
+        cursor.execute('DELETE FROM fund_metrics WHERE fund_id=? AND date>=?', (fund_id, date))
+        cursor.execute('UPDATE fund_metrics SET close_date=NULL WHERE fund_id=? AND close_date>=?',
+                       (fund_id, date))
@@ -0,0 +1,61 @@
+import json
+
+
+class FundState:
+    """基金逐行运行状态（增量重算检查点）"""
+    @staticmethod
+    def checkpoint(cursor, fund_id):
+        """在调用方事务内读取最后一个带批次快照的检查点（无记录返回None）"""
+        cursor.execute('''SELECT date, total_shares, total_input, sum_pos, sum_neg, total_gain, open_lots
+                          FROM fund_state
+                          WHERE fund_id=? AND open_lots IS NOT NULL
+                          ORDER BY date DESC LIMIT 1''', (fund_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return {
+            'date': row['date'],
+            '总份': row['total_shares'],
+            '总投入': row['total_input'],
+            'sum_pos': row['sum_pos'],
+            'sum_neg': row['sum_neg'],
+            '到手总增额': row['total_gain'],
+            'lots': row['open_lots'],
+        }
+
+    @staticmethod
+    def write(cursor, fund_id, metrics):
+        """在调用方事务内写入逐行指标（先删除该段起始日期及之后的旧检查点）"""
+        if not metrics or not metrics['date']:
+            return
+
+        def dump_list(values):
+            return json.dumps(values) if values else None
+
+        rows = [
+            (fund_id, metrics['date'][i],
+             float(metrics['总份'][i]), float(metrics['总投入'][i]),
+             float(metrics['sum_pos'][i]), float(metrics['sum_neg'][i]),
+             float(metrics['到手总增额'][i]),
+             dump_list(metrics['到手增额'][i]), dump_list(metrics['到手增幅'][i]),
+             dump_list(metrics['closed'][i]), metrics['lots'][i])
+            for i in range(len(metrics['date']))
+        ]
+        FundState.invalidate_from(cursor, fund_id, metrics['date'][0])
+        cursor.executemany('''INSERT OR REPLACE INTO fund_state
+                              (fund_id, date, total_shares, total_input, sum_pos, sum_neg, total_gain,
+                               gains, gain_pcts, closed_lots, open_lots)
+                              VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''', rows)
+
+    @staticmethod
+    def drop_snapshot(cursor, fund_id, date):
+        """清除某行的批次快照（保留该行的累计指标），在调用方事务内执行"""
+        cursor.execute('UPDATE fund_state SET open_lots=NULL WHERE fund_id=? AND date=?', (fund_id, date))
+
+    @staticmethod
+    def invalidate_from(cursor, fund_id, date=None):
+        """删除指定日期及之后的检查点（不传日期则全部删除），在调用方事务内执行"""
+        if date is None:
+            cursor.execute('DELETE FROM fund_state WHERE fund_id=?', (fund_id,))
+        else:
+            cursor.execute('DELETE FROM fund_state WHERE fund_id=? AND date>=?', (fund_id, date))
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生产环境启动脚本（waitress 多线程，支持 fork 的系统上可多进程）
+
+用法：
+    python serve.py                          # 移动端应用，配置见 config_mobile.py
+    python serve.py --app desktop            # 桌面端应用，配置见 config.py
+    python serve.py --workers 4 --threads 8 --bind 0.0.0.0:5001
+
+应用在主进程中预加载并预热计算结果缓存，随后 fork 出各工作进程共享同一监听端口。
+缓存键均带数据版本，各进程缓存独立也不会读到旧数据。
+收到 SIGTERM/Ctrl+C 时停止接受新连接，等待处理中的请求完成后退出。
+"""
+
+import argparse
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+from startup import phase, report
+
+# 应用名称 -> (应用模块, 配置模块)
+APPS = {
+    'mobile': ('APP_mobile', 'config_mobile'),
+    'desktop': ('APP', 'config'),
+}
+
+# 收到停止信号后等待工作进程退出的时间（秒），超时后强制结束
+SHUTDOWN_TIMEOUT = 10
+
+
+def load_app(name):
+    """导入应用并由应用工厂完成初始化，返回 (app, 配置模块)"""
+    app_module, config_module = APPS[name]
+    with phase('导入应用模块'):
+        module = importlib.import_module(app_module)
+    return module.create_app(), importlib.import_module(config_module)
+
+
+def warm_cache(limit):
+    """预先计算前 limit 个基金的结果，返回预热的基金数"""
+    from models.db import Database
+    from services.fund_service import FundService
+    funds = FundService.get_fund_list()[:limit]
+    for fund in funds:
+        FundService.get_fund_result(fund.fund_id)
+    # 连接不能跨进程使用，fork 前关闭
+    Database.close_thread_conn()
+    return len(funds)
+
+
+def bind_socket(host, port, backlog=1024):
+    """创建监听套接字（由各工作进程共享）"""
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    return sock
+
+
+def run_worker(app, sock, threads):
+    """在当前进程中运行 waitress，SIGTERM 时等待处理中的请求完成后退出"""
+    from waitress import create_server
+    server = create_server(app, sockets=[sock], threads=threads)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # run() 捕获 SystemExit/KeyboardInterrupt 后关闭任务线程池
+    server.run()
+
+
+def run_master(app, sock, workers, threads):
+    """fork 出 workers 个工作进程并守护：异常退出的进程会被重新拉起
+
+    停止时向各工作进程发送 SIGTERM，超过 SHUTDOWN_TIMEOUT 仍未退出的进程用 SIGKILL 强制结束。
+    """
+    children = {}
+    deadline = None  # 收到停止信号后的强制结束时间
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C 由主进程统一处理
+            try:
+                run_worker(app, sock, threads)
+            finally:
+                os._exit(0)
+        children[pid] = time.time()
+
+    def stop(signum, frame):
+        nonlocal deadline
+        if deadline is None:
+            deadline = time.time() + SHUTDOWN_TIMEOUT
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+
+    # 非阻塞轮询：停止后即使没有任何进程退出，也能在截止时间到达时强制结束
+    while children:
+        if deadline is not None and time.time() >= deadline:
+            for pid in list(children):
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                    os.waitpid(pid, 0)
+                except (ProcessLookupError, ChildProcessError):
+                    pass
+            children.clear()
+            break
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if not pid:
+            time.sleep(0.1)
+            continue
+        started = children.pop(pid, None)
+        if deadline is None and started is not None:
+            # 启动后立即退出的进程不再拉起，避免反复崩溃
+            if time.time() - started < 1:
+                print(f"❌ 工作进程 {pid} 启动失败")
+                stop(None, None)
+            else:
+                spawn()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='基金分析系统生产环境启动')
+    parser.add_argument('--app', choices=sorted(APPS), default='mobile', help='启动的应用')
+    parser.add_argument('--bind', help='监听地址 host:port（默认取配置中的 FLASK_HOST/FLASK_PORT）')
+    parser.add_argument('--workers', type=int, help='工作进程数（默认 SERVER_WORKERS）')
+    parser.add_argument('--threads', type=int, help='每个进程的线程数（默认 SERVER_THREADS）')
+    args = parser.parse_args(argv)
+
+    try:
+        import waitress  # noqa: F401
+    except ImportError:
+        print("❌ 未安装 waitress，请先执行：pip install waitress")
+        return 1
+
+    app, config = load_app(args.app)
+    host, port = config.FLASK_HOST, config.FLASK_PORT
+    if args.bind:
+        host, _, port = args.bind.rpartition(':')
+        host = host.strip('[]') or config.FLASK_HOST
+    workers = args.workers or config.SERVER_WORKERS
+    threads = args.threads or config.SERVER_THREADS
+    # 不支持 fork 的系统（Windows）只能单进程多线程
+    if not hasattr(os, 'fork'):
+        workers = 1
+
+    with phase('预热计算结果缓存'):
+        warmed = warm_cache(config.SERVER_WARM_FUNDS)
+    sock = bind_socket(host, int(port))
+    print(report())
+    print(f"🚀 {args.app} 服务已启动: http://{host}:{port}  进程 {workers} × 线程 {threads}，预热基金 {warmed} 个")
+
+    if workers > 1:
+        run_master(app, sock, workers, threads)
+    else:
+        run_worker(app, sock, threads)
+    sock.close()
+    print("👋 服务器已停止")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import math
+from lazy import lazy_import
+from models.fund import Fund
+from services.fund_service import FundService
+from services.cache import analytics_cache
+from config import ANALYTICS_RISK_FREE_PCT, ANALYTICS_RATE_GRID, DECIMAL_PRECISION
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# XIRR 求解区间（年化收益率），超出视为无解
+XIRR_MIN_RATE = -0.99
+XIRR_MAX_RATE = 100.0
+
+
+class AnalyticsService:
+    """收益与风险分析（资金加权收益XIRR、时间加权收益、最大回撤、年化波动率、夏普比率）"""
+    @staticmethod
+    def get_fund_analytics(fund_id):
+        """基金的分析指标（按数据版本缓存），基金不存在或无数据时返回None"""
+        fund = Fund.get_by_id(fund_id)
+        if not fund:
+            return None
+        key = (fund.fund_id, fund.last_update)
+        cached = analytics_cache.get(key)
+        if cached is not None:
+            return cached
+        _, result_df, _ = FundService.get_fund_result(fund.fund_id)
+        analytics = AnalyticsService.compute(result_df)
+        if analytics is not None:
+            analytics_cache.put(key, analytics)
+        return analytics
+
+    @staticmethod
+    def compute(result_df):
+        """由计算结果表计算分析指标，无数据返回None
+
+        分析区间从首次加额（无加额时从第一行）到最新一行：
+        XIRR 以每日加额为现金流（加额为投入、负加额为取回），期末持有市值（总份 * 最新净值）为最后一笔流入；
+        时间加权收益、最大回撤、波动率只取决于净值序列，不受加额时点影响。
+        记录间隔不固定（周末、节假日、漏录），波动率与夏普比率按区间内实际的每年记录数年化。
+        无法计算的指标为None。
+        """
+        if result_df.empty:
+            return None
+        dates = pd.to_datetime(result_df['日期']).to_numpy(dtype='datetime64[D]')
+        net = result_df['净值'].to_numpy(dtype=float)
+        add = np.nan_to_num(result_df['加额'].to_numpy(dtype=float))
+        buys = np.flatnonzero(add > 0)
+        start = int(buys[0]) if len(buys) else 0
+        days = int((dates[-1] - dates[start]).astype(int))
+
+        # ===== 资金加权收益（XIRR）=====
+        flows = np.flatnonzero(add[start:]) + start
+        final_value = float(result_df['总份'].iloc[-1]) * net[-1]
+        xirr = AnalyticsService.xirr(
+            np.append(-add[flows], final_value),
+            np.append((dates[flows] - dates[0]).astype(float), float((dates[-1] - dates[0]).astype(int))) / 365)
+
+        # ===== 时间加权收益 =====
+        nav = net[start:]
+        twr = float(nav[-1] / nav[0] - 1) if nav[0] > 0 else None
+        annual = (1 + twr) ** (365 / days) - 1 if twr is not None and twr > -1 and days > 0 else None
+
+        # ===== 最大回撤 =====
+        drawdown, peak, trough = AnalyticsService.max_drawdown(nav)
+
+        # ===== 波动率与夏普比率 =====
+        volatility = sharpe = None
+        if len(nav) > 2 and (nav > 0).all():
+            returns = nav[1:] / nav[:-1] - 1
+            # 每年记录数按实际日期跨度估算
+            periods = len(returns) * 365 / days if days > 0 else 0
+            if periods:
+                volatility = float(returns.std(ddof=1)) * math.sqrt(periods)
+                if volatility > 0:
+                    sharpe = (float(returns.mean()) * periods - ANALYTICS_RISK_FREE_PCT / 100) / volatility
+
+        def pct(value):
+            return round(value * 100, DECIMAL_PRECISION) if value is not None else None
+
+        return {
+            '起始日': str(dates[start]),
+            '截止日': str(dates[-1]),
+            '天数': days,
+            'XIRR(%)': pct(xirr),
+            '时间加权收益(%)': pct(twr),
+            '年化收益(%)': pct(annual),
+            '最大回撤(%)': pct(drawdown),
+            '回撤峰值日': str(dates[start + peak]) if drawdown else None,
+            '回撤谷底日': str(dates[start + trough]) if drawdown else None,
+            '年化波动率(%)': pct(volatility),
+            '夏普比率': round(sharpe, DECIMAL_PRECISION) if sharpe is not None else None,
+        }
+
+    @staticmethod
+    def xirr(cashflows, years):
+        """现金流的内部收益率（年化，小数），无解返回None
+
+        cashflows 为各笔现金流（流出为负），years 为距首笔现金流的年数。
+        先在对数收益率网格上一次矩阵运算求出全部网格点的净现值，取最接近0收益率的变号区间，
+        再在区间内用带二分保护的牛顿法收敛。
+        """
+        cashflows = np.asarray(cashflows, dtype=float)
+        years = np.asarray(years, dtype=float)
+        if not ((cashflows > 0).any() and (cashflows < 0).any()):
+            return None
+
+        # 以 x = ln(1 + r) 为变量：NPV(x) = Σ cf * e^(-t * x)，在 x 上单调性更好、不会越过 r = -1
+        grid = np.linspace(math.log1p(XIRR_MIN_RATE), math.log1p(XIRR_MAX_RATE), ANALYTICS_RATE_GRID)
+        with np.errstate(over='ignore', invalid='ignore'):
+            npv = np.exp(-np.outer(grid, years)) @ cashflows
+        signs = np.sign(npv)
+        brackets = np.flatnonzero(signs[:-1] * signs[1:] <= 0)
+        brackets = brackets[np.isfinite(npv[brackets]) & np.isfinite(npv[brackets + 1])]
+        if not len(brackets):
+            return None
+        i = int(brackets[np.argmin(np.abs(grid[brackets]))])
+        lo, hi = grid[i], grid[i + 1]
+        f_lo = npv[i]
+
+        x = (lo + hi) / 2
+        for _ in range(100):
+            discount = np.exp(-years * x)
+            f = float(cashflows @ discount)
+            if f == 0:
+                break
+            # 收窄区间
+            if (f > 0) == (f_lo > 0):
+                lo, f_lo = x, f
+            else:
+                hi = x
+            slope = -float((cashflows * years) @ discount)
+            step = x - f / slope if slope else None
+            # 牛顿步落在区间外时改用二分
+            new_x = step if step is not None and lo < step < hi else (lo + hi) / 2
+            if abs(new_x - x) < 1e-12:
+                x = new_x
+                break
+            x = new_x
+        return math.expm1(x)
+
+    @staticmethod
+    def max_drawdown(values):
+        """最大回撤（小数，非正）及其峰值、谷底位置，返回 (回撤, 峰值下标, 谷底下标)"""
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return None, None, None
+        peaks = np.maximum.accumulate(values)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drawdowns = np.where(peaks > 0, values / peaks - 1, 0.0)
+        trough = int(np.argmin(drawdowns))
+        peak = int(np.argmax(values[:trough + 1]))
+        return float(drawdowns[trough]), peak, trough
@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+from config import RESULT_CACHE_SIZE, CHART_CACHE_SIZE, SWEEP_CACHE_SIZE, ANALYTICS_CACHE_SIZE, ROLLING_CACHE_SIZE
+
+
+class LRUCache:
+    """进程内 LRU 缓存（线程安全，带命中统计）
+
+    键的第一个元素约定为基金ID，便于按基金整体失效。
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """读取缓存，未命中返回None"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """写入缓存，超出容量时淘汰最久未使用的项"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, fund_id, keep=None):
+        """删除某基金的全部缓存项（keep(值) 为真的项保留）"""
+        fund_id = int(fund_id)
+        with self._lock:
+            for key in [k for k in self._data if k[0] == fund_id]:
+                if keep is None or not keep(self._data[key]):
+                    del self._data[key]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """命中统计（用于评估缓存容量）"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+# 计算结果缓存：键为 (基金ID, 数据版本)
+result_cache = LRUCache(RESULT_CACHE_SIZE)
+# 图表HTML缓存：键为 (基金ID, 时间范围, 设备, 数据版本, 当天日期)
+chart_cache = LRUCache(CHART_CACHE_SIZE)
+# 网格寻优结果缓存：键为 (基金ID, 数据版本, 基准净值, 格距, 每格金额, 最大格数)
+sweep_cache = LRUCache(SWEEP_CACHE_SIZE)
+# 收益风险分析缓存：键为 (基金ID, 数据版本)
+analytics_cache = LRUCache(ANALYTICS_CACHE_SIZE)
+# 滚动统计状态：键为 (基金ID,)，不含数据版本，追加记录后增量续算
+rolling_cache = LRUCache(ROLLING_CACHE_SIZE)
+
+
+def invalidate_fund(fund_id, date=None):
+    """基金数据变更时失效其全部缓存
+
+    date 为本次修改的最早日期：晚于滚动统计已计算的最后日期时（追加新记录）保留滚动状态，
+    下次读取时只推入新增行；为空表示整体变更。
+    """
+    for cache in (result_cache, chart_cache, sweep_cache, analytics_cache):
+        cache.invalidate(fund_id)
+    rolling_cache.invalidate(fund_id, keep=lambda state: date is not None and state.last_date is not None
+                             and str(date) > state.last_date)
+
+
+def all_stats():
+    """各缓存的命中统计"""
+    return {'result_cache': result_cache.stats(), 'chart_cache': chart_cache.stats(),
+            'sweep_cache': sweep_cache.stats(), 'analytics_cache': analytics_cache.stats(),
+            'rolling_cache': rolling_cache.stats()}
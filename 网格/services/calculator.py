@@ -1,152 +1,285 @@
-import pandas as pd
+from lazy import lazy_import
+from instrumentation import timed
 from config import DECIMAL_PRECISION
+from services.lot_book import LotBook
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# 结果列类型：数值列、百分比列（数值，单位%）、列表列（每行为数值列表）
+FLOAT_COLUMNS = ['净值', '加额', '加份', '总额', '总份', '总投入', '到手总增额']
+PERCENT_COLUMNS = ['净值涨幅(%)', '总涨幅(%)', '加额最新涨幅(%)']
+LIST_COLUMNS = ['到手增额', '到手增幅']
+
+
+class RunningState:
+    """逐行累计状态（总份、总投入、正负加额和、到手总增额、未平仓批次），用于增量重算"""
+    def __init__(self, total_shares=0.0, total_input=0.0, sum_pos=0.0, sum_neg=0.0,
+                 total_gain=0.0, rows=0, lots=None):
+        self.total_shares = total_shares
+        self.total_input = total_input
+        self.sum_pos = sum_pos
+        self.sum_neg = sum_neg
+        self.total_gain = total_gain
+        self.rows = rows  # 已处理行数
+        self.lots = lots if lots is not None else LotBook()
+
 
 class InvestmentCalculator:
     """投资计算服务（实现核心指标计算）"""
     @staticmethod
+    @timed('calc')
     def calculate(history_df):
-        """计算所有指标"""
+        """计算所有指标
+
+        返回数值型结果表：百分比列为浮点数（单位%），到手增额/到手增幅为浮点数列表，
+        格式化仅在渲染时进行。
+        """
         if history_df is None or history_df.empty:
             return pd.DataFrame()
-        
-        df = history_df.copy()
+
+        df = InvestmentCalculator.prepare(history_df)
+        metrics = InvestmentCalculator.replay(df, RunningState())
+        return InvestmentCalculator.assemble(df, metrics)
+
+    @staticmethod
+    @timed('calc')
+    def summarize(history_df):
+        """只计算最新一行的汇总指标（组合汇总用），无数据返回None"""
+        if history_df is None or history_df.empty:
+            return None
+
+        df = InvestmentCalculator.prepare(history_df)
+        metrics = InvestmentCalculator.replay(df, RunningState())
+        net = float(df['net_value'].iloc[-1])
+        add = float(df['addition'].iloc[-1])
+        n = len(df)
+        # 总额 = 前一日总份 * 当日净值 + 当日加额
+        prev_shares = float(metrics['总份'][-2]) if n > 1 else 0.0
+        总额 = prev_shares * net + add
+        sum_pos = float(metrics['sum_pos'][-1])
+        sum_neg = float(metrics['sum_neg'][-1])
+        总涨幅 = ((sum_neg + 总额) / sum_pos - 1) * 100 if n > 1 and sum_pos != 0 else 0.0
+        return {
+            '日期': df['date'].iloc[-1],
+            '净值': net,
+            '总额': round(总额, DECIMAL_PRECISION),
+            '总投入': round(float(metrics['总投入'][-1]), DECIMAL_PRECISION),
+            '总涨幅(%)': round(总涨幅, DECIMAL_PRECISION),
+            '到手总增额': round(float(metrics['到手总增额'][-1]), DECIMAL_PRECISION),
+            'sum_pos': sum_pos,
+            'sum_neg': sum_neg,
+        }
+
+    @staticmethod
+    @timed('calc')
+    def resume(df, checkpoint, snapshot_every=1):
+        """从单个检查点续算
+
+        df 为 prepare() 清洗后的记录，有检查点时首行为检查点所在行；
+        checkpoint 为该行保存的运行状态（另含截至该行的行数 rows），为空时从头计算。
+        返回 (检查点之后各行的结果表, 这些行的逐行指标)；逐行指标需由调用方持久化。
+        """
+        if checkpoint is None:
+            metrics = InvestmentCalculator.replay(df, RunningState(), snapshot_every)
+            return InvestmentCalculator.assemble(df, metrics), metrics
+
+        state = RunningState(
+            total_shares=checkpoint['总份'],
+            total_input=checkpoint['总投入'],
+            sum_pos=checkpoint['sum_pos'],
+            sum_neg=checkpoint['sum_neg'],
+            total_gain=checkpoint['到手总增额'],
+            rows=checkpoint['rows'],
+            lots=LotBook.from_json(checkpoint['lots'])
+        )
+        tail = InvestmentCalculator.replay(df.iloc[1:], state, snapshot_every)
+        # 检查点所在行只为下一行的总额、净值涨幅提供前值，不输出
+        head = {key: [checkpoint[key]] for key in ('date', '总份', '总投入', 'sum_pos', 'sum_neg', '到手总增额')}
+        head.update({'到手增额': [[]], '到手增幅': [[]], 'closed': [[]], 'lots': [None]})
+        result_df = InvestmentCalculator.assemble(df, InvestmentCalculator._concat_metrics(head, tail))
+        return result_df.iloc[1:].reset_index(drop=True), tail
+
+    @staticmethod
+    def prepare(history_df):
+        """清洗原始记录：日期排序、空值补0、加额/加份互算"""
+        df = history_df[['date', 'net_value', 'addition', 'shares']].copy()
         # 处理日期格式和空值
         df['date'] = pd.to_datetime(df['date'])
         df['addition'] = pd.to_numeric(df['addition'], errors='coerce').fillna(0)
         df['shares'] = pd.to_numeric(df['shares'], errors='coerce').fillna(0)
-        df = df.sort_values('date').reset_index(drop=True)
+        df = df.sort_values('date', kind='stable').reset_index(drop=True)
+        df['date'] = df['date'].dt.strftime('%Y-%m-%d')
 
         # ===== 加额/加份互算 =====
-        for i in range(len(df)):
-            net = df.loc[i, 'net_value']
-            add = df.loc[i, 'addition']
-            shr = df.loc[i, 'shares']
-            
-            if net == 0:
-                continue  # 避免除零错误
-            
-            # 已知加额算加份
-            if add != 0 and shr == 0:
-                df.loc[i, 'shares'] = add / net
-            # 已知加份算加额
-            elif shr != 0 and add == 0:
-                df.loc[i, 'addition'] = shr * net
-
-        # ===== 初始化计算列 =====
-        df['总额'] = 0.0
-        df['总份'] = 0.0
-        df['净值涨幅(%)'] = 0.0
-        df['总投入'] = 0.0
-        df['总涨幅(%)'] = 0.0
-        df['加额最新涨幅(%)'] = 0.0
-        df['到手增额'] = ''
-        df['到手增幅'] = ''
-        df['到手总增额'] = 0.0
-
-        # ===== 第一天数据 =====
-        if len(df) > 0:
-            df.loc[0, '总份'] = df.loc[0, 'shares']
-            df.loc[0, '总额'] = df.loc[0, 'addition']
-            df.loc[0, '总投入'] = df.loc[0, 'addition']
-
-        # ===== 后续日期计算 =====
-        for i in range(1, len(df)):
-            prev_total_shares = df.loc[i-1, '总份']
-            current_net = df.loc[i, 'net_value']
-            current_add = df.loc[i, 'addition']
-            
-            # 基础指标
-            df.loc[i, '总份'] = prev_total_shares + df.loc[i, 'shares']
-            df.loc[i, '总额'] = prev_total_shares * current_net + current_add
-            df.loc[i, '总投入'] = df.loc[i-1, '总投入'] + current_add
-
-            # 净值涨幅
-            prev_net = df.loc[i-1, 'net_value']
-            if prev_net != 0:
-                df.loc[i, '净值涨幅(%)'] = (current_net - prev_net) / prev_net * 100
+        add, shr = InvestmentCalculator._convert_additions(
+            df['net_value'].to_numpy(dtype=float),
+            df['addition'].to_numpy(dtype=float),
+            df['shares'].to_numpy(dtype=float)
+        )
+        df['addition'] = add
+        df['shares'] = shr
+        return df
+
+    @staticmethod
+    def replay(df, state, snapshot_every=None):
+        """从给定状态起逐行推进，返回这些行的累计指标（state 会被更新到最后一行）
+
+        snapshot_every 非空时，按 snapshot_due() 的间隔（及最后一行）记录未平仓批次快照。
+        """
+        dates = df['date'].to_numpy()
+        net = df['net_value'].to_numpy(dtype=float)
+        add = df['addition'].to_numpy(dtype=float)
+        shr = df['shares'].to_numpy(dtype=float)
+        n = len(net)
+
+        # ===== 基础累计指标（以上一状态为起点的累计和）=====
+        def running(start, values):
+            return np.cumsum(np.concatenate(([start], values)))[1:]
+
+        总份 = running(state.total_shares, shr)
+        总投入 = running(state.total_input, add)
+        sum_pos = running(state.sum_pos, np.where(add > 0, add, 0.0))
+        sum_neg = running(state.sum_neg, np.where(add < 0, -add, 0.0))
+
+        # ===== 到手增额/增幅（减仓时按净值从低到高匹配买入批次）=====
+        book = state.lots
+        增额 = [[] for _ in range(n)]
+        增幅 = [[] for _ in range(n)]
+        closed = [[] for _ in range(n)]
+        lots = [None] * n
+        gain_sum = np.zeros(n)
+        for i in range(n):
+            if add[i] < 0 and state.rows + i > 0:
+                for match in book.consume(abs(shr[i]), net[i]):
+                    增额[i].append(float(match.gain))
+                    增幅[i].append(float(match.gain_pct))
+                    gain_sum[i] += match.gain
+                    # 记录完全提取的批次
+                    if match.closed:
+                        closed[i].append(match.lot_id)
+            elif add[i] > 0:
+                book.add_lot(dates[i], net[i], shr[i])
+            row = state.rows + i + 1
+            if snapshot_every and (i == n - 1 or (row % snapshot_every == 0 and
+                                                  InvestmentCalculator.snapshot_due(row, len(book), snapshot_every))):
+                lots[i] = book.to_json()
+        到手总增额 = running(state.total_gain, gain_sum)
+
+        if n:
+            state.total_shares = 总份[-1]
+            state.total_input = 总投入[-1]
+            state.sum_pos = sum_pos[-1]
+            state.sum_neg = sum_neg[-1]
+            state.total_gain = 到手总增额[-1]
+            state.rows += n
+
+        return {
+            'date': list(dates),
+            '总份': 总份,
+            '总投入': 总投入,
+            'sum_pos': sum_pos,
+            'sum_neg': sum_neg,
+            '到手总增额': 到手总增额,
+            '到手增额': 增额,
+            '到手增幅': 增幅,
+            'closed': closed,
+            'lots': lots,
+        }
+
+    @staticmethod
+    def snapshot_due(row, lot_count, every):
+        """第 row 行（从1计）是否为定期批次快照行
+
+        间隔为 every 的2的幂倍且不小于未平仓批次数：单个快照的大小与批次数成正比，
+        这样每行分摊的快照开销为常数，快照总量随行数线性增长（固定间隔时随行数平方增长）。
+        """
+        spacing = every
+        while spacing < lot_count:
+            spacing *= 2
+        return row % spacing == 0
+
+    @staticmethod
+    def assemble(df, metrics):
+        """由清洗后的记录和逐行累计指标生成结果表（全部为数组运算）"""
+        dates = df['date'].to_numpy()
+        net = df['net_value'].to_numpy(dtype=float)
+        add = df['addition'].to_numpy(dtype=float)
+        n = len(net)
+        总份 = np.asarray(metrics['总份'], dtype=float)
+
+        # 总额 = 前一日总份 * 当日净值 + 当日加额（第一天即为加额）
+        总额 = np.concatenate(([0.0], 总份[:-1])) * net + add
+        总额[0] = add[0]
+
+        净值涨幅 = np.zeros(n)
+        总涨幅 = np.zeros(n)
+        if n > 1:
+            prev_net = net[:-1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                净值涨幅[1:] = np.where(prev_net != 0, (net[1:] - prev_net) / prev_net * 100, 0.0)
 
             # 总涨幅（新公式：(负额和+总额)/加额和-1）
-            sum_pos = df.loc[:i, 'addition'][df.loc[:i, 'addition'] > 0].sum()
-            sum_neg = abs(df.loc[:i, 'addition'][df.loc[:i, 'addition'] < 0].sum())
-            if sum_pos != 0:
-                total_increase_rate = (sum_neg + df.loc[i, '总额']) / sum_pos - 1
-                df.loc[i, '总涨幅(%)'] = total_increase_rate * 100
-            else:
-                df.loc[i, '总涨幅(%)'] = 0  # 避免除零错误
-
-            # 到手增额/增幅（仅加额为负时）
-            if current_add < 0:
-                剩余加份 = abs(df.loc[i, 'shares'])
-                过往加额正 = df.loc[:i-1][df.loc[:i-1, 'addition'] > 0].sort_values('net_value')
-                # 初始化剩余份额列（如不存在）
-                if 'remaining_shares' not in df.columns:
-                    df['remaining_shares'] = df['shares'].copy()
-                
-                增额列表, 增幅列表 = [], []
-                过往加额正 = df.loc[:i-1][(df.loc[:i-1, 'addition'] > 0) & (df.loc[:i-1, 'remaining_shares'] > 1e-8)].sort_values('net_value')
-                
-                for idx, row in 过往加额正.iterrows():
-                    if 剩余加份 <= 1e-8:
-                        break
-                    可用加份 = row['remaining_shares']
-                    用份 = min(剩余加份, 可用加份)
-                    
-                    if 用份 > 0:
-                        增额 = 用份 * (current_net - row['net_value'])
-                        增幅 = (current_net - row['net_value']) / row['net_value'] * 100
-                        增额列表.append(f"{增额:.2f}")
-                        增幅列表.append(f"{增幅:.2f}%")
-                        # 更新剩余份额
-                        df.at[idx, 'remaining_shares'] -= 用份
-                    # 记录完全提取时的净值
-                    if df.at[idx, 'remaining_shares'] <= 1e-8:
-                        df.at[idx, 'final_net_value'] = current_net
-                    剩余加份 -= 用份
-                
-                df.loc[i, '到手增额'] = '，'.join(增额列表)
-                df.loc[i, '到手增幅'] = '，'.join([f"{float(x.replace('%','')):.2f}%" for x in 增幅列表])
+            sum_pos = np.asarray(metrics['sum_pos'], dtype=float)
+            sum_neg = np.asarray(metrics['sum_neg'], dtype=float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rate = np.where(sum_pos != 0, ((sum_neg + 总额) / sum_pos - 1) * 100, 0.0)
+            总涨幅[1:] = rate[1:]
 
         # ===== 加额最新涨幅 =====
-        最新净值 = df.iloc[-1]['net_value'] if not df.empty else 0
-        # 计算加额最新涨幅，已完全提取的使用提取时净值
-        df['加额最新涨幅(%)'] = df.apply(
-            lambda row: 0 if row['addition'] < 0 
-    else (row['final_net_value'] - row['net_value']) / row['net_value'] * 100 
-    if (row['addition'] != 0 and not pd.isna(row.get('final_net_value'))) 
-    else (最新净值 - row['net_value']) / row['net_value'] * 100 
-    if row['addition'] != 0 
-    else 0, 
-            axis=1
-        )
+        # 已完全提取的使用提取时净值，否则使用最新净值
+        final_net = np.full(n, net[-1])
+        closed_dates = [d for row in metrics['closed'] for d in row]
+        if closed_dates:
+            sell_net = np.repeat(net, [len(row) for row in metrics['closed']])
+            # 续算时批次可能买在检查点之前（不在本段记录内），跳过
+            positions = pd.Index(dates).get_indexer(closed_dates)
+            found = positions >= 0
+            final_net[positions[found]] = sell_net[found]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            最新涨幅 = np.where(add > 0, (final_net - net) / net * 100, 0.0)
 
-        # ===== 到手总增额（累加）=====
-        def sum_gain(row):
-            if row['到手增额']:
-                return sum(float(x) for x in row['到手增额'].split('，') if x)
-            return 0
-        df['到手增额_数值'] = df.apply(sum_gain, axis=1)
-        df['到手总增额'] = df['到手增额_数值'].cumsum()
-
-        # ===== 格式化输出 =====
-        df['date'] = df['date'].dt.strftime('%Y-%m-%d')
-        for col in ['净值涨幅(%)', '总涨幅(%)', '加额最新涨幅(%)']:
-            df[col] = df[col].round(2).astype(str) + '%'
-        
-        # 重命名列并保留需要的字段
-        result_df = df[[
-            'date', 'net_value', 'addition', 'shares', '总额', '总份', 
-            '净值涨幅(%)', '总投入', '总涨幅(%)', '加额最新涨幅(%)', 
-            '到手增额', '到手增幅', '到手总增额'
-        ]].rename(columns={
-            'date': '日期',
-            'net_value': '净值',
-            'addition': '加额',
-            'shares': '加份'
+        result_df = pd.DataFrame({
+            '日期': dates,
+            '净值': df['net_value'].to_numpy(),
+            '加额': add,
+            '加份': df['shares'].to_numpy(dtype=float),
+            '总额': 总额,
+            '总份': 总份,
+            '净值涨幅(%)': 净值涨幅,
+            '总投入': np.asarray(metrics['总投入'], dtype=float),
+            '总涨幅(%)': 总涨幅,
+            '加额最新涨幅(%)': 最新涨幅,
+            # 到手增额/到手增幅为每行的数值列表（无减仓匹配时为空列表）
+            '到手增额': pd.Series(metrics['到手增额'], dtype=object),
+            '到手增幅': pd.Series(metrics['到手增幅'], dtype=object),
+            '到手总增额': np.asarray(metrics['到手总增额'], dtype=float),
         })
 
         # 设置数值精度
-        float_cols = ['净值', '加额', '加份', '总额', '总份', '总投入', '到手总增额']
-        for col in float_cols:
+        for col in FLOAT_COLUMNS + PERCENT_COLUMNS:
             result_df[col] = result_df[col].round(DECIMAL_PRECISION)
 
-        return result_df
\ No newline at end of file
+        return result_df
+
+    @staticmethod
+    def _concat_metrics(head, tail):
+        """拼接已保存部分与新计算部分的逐行指标"""
+        if head is None:
+            return tail
+        return {key: list(head[key]) + list(tail[key]) for key in tail}
+
+    @staticmethod
+    def _convert_additions(net, add, shr):
+        """加额/加份互算：已知加额算加份，已知加份算加额（净值为0的行跳过）"""
+        add = add.copy()
+        shr = shr.copy()
+        valid = net != 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # 已知加额算加份
+            by_add = valid & (add != 0) & (shr == 0)
+            shr[by_add] = add[by_add] / net[by_add]
+            # 已知加份算加额
+            by_shr = valid & (shr != 0) & (add == 0)
+            add[by_shr] = shr[by_shr] * net[by_shr]
+        return add, shr
@@ -0,0 +1,83 @@
+from lazy import lazy_import
+from datetime import date, datetime, timedelta
+from models.fund import Fund
+from services.cache import chart_cache
+from services.downsample import downsample
+from services.fund_service import FundService
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# 图表时间范围：键 -> (显示名称, 天数；None 为全部)
+CHART_RANGES = {
+    '1M': ('近一个月', 30),
+    '3M': ('近三个月', 91),
+    '1Y': ('近一年', 365),
+    '5Y': ('近五年', 365 * 5),
+    'ALL': ('全部', None),
+}
+DEFAULT_CHART_RANGE = '1M'
+
+
+class ChartService:
+    """净值图表数据服务（按时间范围截取并降采样）"""
+    @staticmethod
+    def normalize_range(range_key):
+        """非法范围回退为默认范围"""
+        range_key = (range_key or '').upper()
+        return range_key if range_key in CHART_RANGES else DEFAULT_CHART_RANGE
+
+    @staticmethod
+    def prepare_series(history_df, range_key=DEFAULT_CHART_RANGE, max_points=300, method='lttb'):
+        """截取时间范围内的净值序列并降采样到 max_points 个点左右
+
+        有加额（非0）的日期总会保留，以便图上标注加减仓。
+        返回列 date(datetime)、net_value、addition 的新DataFrame（不修改传入的DataFrame）；
+        无数据返回空表。
+        """
+        if history_df is None or history_df.empty or 'date' not in history_df or 'net_value' not in history_df:
+            return pd.DataFrame()
+        df = pd.DataFrame({
+            'date': pd.to_datetime(history_df['date']),
+            'net_value': pd.to_numeric(history_df['net_value'], errors='coerce'),
+            'addition': pd.to_numeric(history_df['addition'], errors='coerce').fillna(0)
+                        if 'addition' in history_df else 0.0,
+        }).dropna(subset=['net_value'])
+
+        days = CHART_RANGES[ChartService.normalize_range(range_key)][1]
+        if days is not None:
+            df = df[df['date'] >= datetime.now() - timedelta(days=days)]
+        df = df.sort_values('date', kind='stable').reset_index(drop=True)
+        if df.empty:
+            return df
+
+        x = df['date'].to_numpy(dtype='datetime64[D]').astype(np.int64)
+        keep = downsample(x, df['net_value'].to_numpy(dtype=float), max_points,
+                          must_keep=df['addition'].to_numpy(dtype=float) != 0, method=method)
+        return df.iloc[keep].reset_index(drop=True)
+
+    @staticmethod
+    def render_cached(fund_id, range_key, device, render):
+        """返回图表HTML，按 (基金ID, 时间范围, 设备, 数据版本, 当天日期) 缓存
+
+        render(history_df) 在未命中时生成HTML。先读取数据版本再取数据，
+        保证缓存项不会比其键对应的版本更旧；范围以当天为终点，故键中带日期。
+        """
+        fund = Fund.get_by_id(fund_id)
+        if not fund:
+            return render(pd.DataFrame())
+        key = (fund.fund_id, ChartService.normalize_range(range_key), device,
+               fund.last_update, date.today().isoformat())
+        html = chart_cache.get(key)
+        if html is None:
+            history_df, _, _ = FundService.get_fund_result(fund.fund_id)
+            html = render(history_df)
+            chart_cache.put(key, html)
+        return html
+
+    @staticmethod
+    def axis_labels(dates):
+        """横坐标文本：一年以内如 7.1，跨年如 2024.7.1"""
+        if len(dates) and (dates.iloc[-1] - dates.iloc[0]).days > 365:
+            return [f"{d.year}.{d.month}.{d.day}" for d in dates]
+        return [f"{d.month}.{d.day}" for d in dates]
@@ -0,0 +1,118 @@
+from lazy import lazy_import
+from datetime import date, datetime, timedelta
+from models.fund import Fund
+from services.cache import chart_cache
+from services.chart_service import ChartService, CHART_RANGES
+from services.downsample import downsample
+from services.fund_service import FundService
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# 对比方式：键 -> 显示名称
+COMPARE_MODES = {
+    'base': '净值归一（起点为1）',
+    'gain': '总涨幅(%)',
+}
+DEFAULT_COMPARE_MODE = 'base'
+# 单次对比的基金数上限
+MAX_COMPARE_FUNDS = 50
+# 每条曲线至少保留的点数（基金较多时总点数可超出预算）
+MIN_POINTS_PER_SERIES = 16
+
+
+class ComparisonService:
+    """多基金对比服务（一次查询加载，按日期对齐、归一化并降采样）"""
+    @staticmethod
+    def parse_ids(values):
+        """解析基金ID（支持多个参数或逗号分隔），去重并限制数量"""
+        ids = []
+        for value in values:
+            for part in str(value).split(','):
+                part = part.strip()
+                if part.isdigit() and int(part) not in ids:
+                    ids.append(int(part))
+        return ids[:MAX_COMPARE_FUNDS]
+
+    @staticmethod
+    def normalize_mode(mode):
+        """非法对比方式回退为默认方式"""
+        return mode if mode in COMPARE_MODES else DEFAULT_COMPARE_MODE
+
+    @staticmethod
+    def build(fund_ids, range_key, mode=DEFAULT_COMPARE_MODE, max_points=300):
+        """生成对齐后的对比序列
+
+        返回以日期为索引、基金名称为列的DataFrame（按 fund_ids 顺序）：
+        各基金按全部日期的并集对齐，缺失日期沿用前值；base 方式以范围内首个净值归一为1，
+        gain 方式为各基金的总涨幅(%)（取自 FundService.get_fund_result 的缓存结果，不重算）。
+        超过点数预算时按各曲线的 LTTB 结果的并集降采样。
+        """
+        if not fund_ids:
+            return pd.DataFrame()
+        if mode == 'gain':
+            series, names = {}, {}
+            for fund_id in fund_ids:
+                _, result_df, fund_name = FundService.get_fund_result(fund_id)
+                if result_df.empty:
+                    continue
+                names[fund_id] = fund_name
+                series[fund_id] = pd.Series(result_df['总涨幅(%)'].to_numpy(),
+                                            index=pd.to_datetime(result_df['日期']))
+            if not series:
+                return pd.DataFrame()
+            wide = pd.concat(series, axis=1)
+        else:
+            df = Fund.get_history_for(fund_ids)
+            if df.empty:
+                return pd.DataFrame()
+            df['date'] = pd.to_datetime(df['date'])
+            names = df.drop_duplicates('fund_id').set_index('fund_id')['fund_name']
+            wide = df.pivot(index='date', columns='fund_id', values='net_value').astype(float)
+        # 先对齐并沿用前值，再截取范围，使范围起点也有值
+        wide = wide.sort_index().ffill()
+
+        days = CHART_RANGES[ChartService.normalize_range(range_key)][1]
+        if days is not None:
+            wide = wide[wide.index >= datetime.now() - timedelta(days=days)]
+        wide = wide.dropna(axis=1, how='all')
+        if wide.empty:
+            return pd.DataFrame()
+
+        if mode != 'gain':
+            # 每列除以范围内首个有效净值
+            base = wide.bfill().iloc[0].replace(0, np.nan)
+            wide = wide / base
+
+        wide = wide[[fund_id for fund_id in fund_ids if fund_id in wide.columns]]
+        wide.columns = [names[fund_id] for fund_id in wide.columns]
+        return ComparisonService._downsample(wide, max_points).round(4)
+
+    @staticmethod
+    def _downsample(wide, max_points):
+        """各曲线分别 LTTB 降采样，保留下标取并集"""
+        if not max_points or len(wide) <= max_points:
+            return wide
+        x = wide.index.to_numpy(dtype='datetime64[D]').astype(np.int64)
+        budget = max(max_points // len(wide.columns), MIN_POINTS_PER_SERIES)
+        keep = np.array([], dtype=int)
+        for column in wide.columns:
+            # 曲线开始前的空值用首个值补齐，仅用于挑选保留点
+            y = wide[column].bfill().to_numpy(dtype=float)
+            keep = np.union1d(keep, downsample(x, y, budget))
+        return wide.iloc[keep]
+
+    @staticmethod
+    def render_cached(fund_ids, range_key, mode, device, render, max_points=300):
+        """返回对比图HTML，按 (基金ID及其数据版本, 范围, 方式, 设备, 当天日期) 缓存
+
+        render(wide_df) 在未命中时生成HTML。
+        """
+        versions = {f.fund_id: f.last_update for f in Fund.get_all()}
+        key = ('compare', tuple((fund_id, versions.get(fund_id)) for fund_id in fund_ids),
+               ChartService.normalize_range(range_key), mode, device, date.today().isoformat())
+        html = chart_cache.get(key)
+        if html is None:
+            html = render(ComparisonService.build(fund_ids, range_key, mode, max_points))
+            chart_cache.put(key, html)
+        return html
@@ -0,0 +1,71 @@
+"""时间序列降采样（图表用）：在固定点数预算内保留曲线形状"""
+
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets 降采样，返回保留点的下标（含首尾）
+
+    每个桶中选取与上一已选点、下一桶均值构成三角形面积最大的点，O(n)。
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # 中间 n-2 个点均分为 threshold-2 个桶
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # 下一桶均值（最后一个桶以末点为准）
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, threshold):
+    """按桶保留最小值和最大值点，返回保留点的下标（含首尾）"""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+
+    buckets = max(1, (threshold - 2) // 2)
+    edges = np.linspace(1, n - 1, buckets + 1).astype(int)
+    keep = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            segment = y[start:end]
+            keep.append(start + int(np.argmin(segment)))
+            keep.append(start + int(np.argmax(segment)))
+    return np.unique(keep)
+
+
+def downsample(x, y, threshold, must_keep=None, method='lttb'):
+    """降采样到约 threshold 个点，must_keep（布尔数组）标记的点总会保留
+
+    返回升序的保留点下标。必须保留的点超出预算时全部保留。
+    """
+    n = len(y)
+    if not threshold or n <= threshold:
+        return np.arange(n)
+
+    forced = np.flatnonzero(must_keep) if must_keep is not None else np.array([], dtype=int)
+    # 为必须保留的点预留预算，剩余预算用于描绘曲线形状
+    budget = max(threshold - len(forced), min(threshold, 3))
+    if method == 'minmax':
+        shape = minmax_indices(y, budget)
+    else:
+        shape = lttb_indices(x, y, budget)
+    return np.union1d(shape, forced)
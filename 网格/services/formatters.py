@@ -0,0 +1,84 @@
+"""渲染层格式化工具（计算结果均为数值，仅在此处转为显示文本）"""
+
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+
+
+def value_color(value):
+    """正数红色、负数蓝色、零黑色"""
+    return 'red' if value > 0 else ('blue' if value < 0 else 'black')
+
+
+def format_percent(value):
+    """百分比数值格式化为 'x.xx%'"""
+    return f"{value:.2f}%"
+
+
+def analytics_items(analytics):
+    """收益风险分析指标转为显示项列表 [(名称, 文本, 颜色, 说明)]，无数据返回空列表"""
+    if not analytics:
+        return []
+
+    def item(label, key, note, percent=True):
+        value = analytics[key]
+        if value is None:
+            return label, '—', 'black', note
+        return label, format_percent(value) if percent else f"{value:.2f}", value_color(value), note
+
+    drawdown_note = '净值从峰值到谷底的最大跌幅'
+    if analytics['回撤峰值日']:
+        drawdown_note += f"（{analytics['回撤峰值日']} 至 {analytics['回撤谷底日']}）"
+    return [
+        item('XIRR', 'XIRR(%)', '按加额现金流计算的年化资金加权收益'),
+        item('时间加权', '时间加权收益(%)', f"{analytics['起始日']} 起的净值收益，不受加额时点影响"),
+        item('年化', '年化收益(%)', '时间加权收益按天数年化'),
+        item('最大回撤', '最大回撤(%)', drawdown_note),
+        item('年化波动率', '年化波动率(%)', '净值涨幅的年化标准差'),
+        item('夏普比率', '夏普比率', '（年化平均收益 - 无风险收益）/ 年化波动率', percent=False),
+    ]
+
+
+def format_multi(values, percent=False):
+    """到手增额/到手增幅列表格式化为'，'分隔文本"""
+    if not values:
+        return ''
+    if percent:
+        return '，'.join(f"{x:.2f}%" for x in values)
+    return '，'.join(f"{x:.2f}" for x in values)
+
+
+# ===== 按列批量格式化（表格渲染用）=====
+def color_array(values):
+    """数值列对应的颜色数组（规则同 value_color）"""
+    values = np.asarray(values, dtype=float)
+    return np.where(values > 0, 'red', np.where(values < 0, 'blue', 'black'))
+
+
+def format_array(values, decimals=2, percent=False):
+    """数值列批量格式化为文本数组"""
+    fmt = f'%.{decimals}f' + ('%%' if percent else '')
+    return np.char.mod(fmt, np.asarray(values, dtype=float))
+
+
+def td_cells(texts, align='right', colors=None):
+    """由文本列（及颜色列）生成单元格HTML列表"""
+    if colors is None:
+        return [f'<td style="text-align: {align};">{t}</td>' for t in texts]
+    return [f'<td style="text-align: {align}; color: {c};">{t}</td>' for t, c in zip(texts, colors)]
+
+
+def iter_rows(columns):
+    """按行拼接各列单元格，逐行产出 <tr> HTML"""
+    for cells in zip(*columns):
+        yield '<tr>' + ''.join(cells) + '</tr>'
+
+
+def page_bounds(total, before=None, page_size=0):
+    """分页范围：取 before（不含）之前最新的 page_size 行，返回 (start, end)
+
+    page_size 为0时不分页。
+    """
+    end = total if before is None else max(0, min(int(before), total))
+    start = max(0, end - page_size) if page_size else 0
+    return start, end
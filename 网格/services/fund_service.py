@@ -1,4 +1,11 @@
+from lazy import lazy_import
 from models.fund import Fund
+from models.fund_metrics import FundMetrics
+from services.calculator import InvestmentCalculator
+from services.cache import result_cache
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
 
 class FundService:
     """基金管理服务"""
@@ -46,4 +53,48 @@ class FundService:
         if not fund:
             return None, "基金不存在"
         history_df = fund.get_history_data()
-        return history_df, fund.fund_name
\ No newline at end of file
+        return history_df, fund.fund_name
+
+    @staticmethod
+    def get_fund_result(fund_id):
+        """获取基金数据及计算结果（按数据版本缓存，未命中时读取 fund_metrics 结果表）
+
+        返回的DataFrame为缓存共享对象，调用方不可原地修改。
+        """
+        fund = Fund.get_by_id(fund_id)
+        if not fund:
+            return pd.DataFrame(), pd.DataFrame(), ''
+        key = (fund.fund_id, fund.last_update)
+        cached = result_cache.get(key)
+        if cached is not None:
+            history_df, result_df = cached
+            return history_df, result_df, fund.fund_name
+
+        loaded = FundMetrics.load(fund.fund_id)
+        if loaded is None:
+            # 结果表尚未物化（启动迁移 Fund.migrate 之前或数据被绕过模型修改），
+            # 直接计算，读取路径不获取写锁
+            history_df = fund.get_history_data()
+            loaded = history_df, InvestmentCalculator.calculate(history_df)
+        history_df, result_df = loaded
+        result_cache.put(key, (history_df, result_df))
+        return history_df, result_df, fund.fund_name
+
+    @staticmethod
+    def get_result_page(fund_id, cursor=None, limit=100):
+        """按日期游标分页获取计算结果（从新到旧）
+
+        cursor 为上一页最后一行的日期（不含），为空时从最新一行开始。
+        返回 (结果子表, 下一页游标)，没有更早记录时游标为None；基金不存在返回 (None, None)。
+        """
+        _, result_df, fund_name = FundService.get_fund_result(fund_id)
+        if not fund_name:
+            return None, None
+        if result_df.empty:
+            return result_df, None
+        # 日期为 YYYY-MM-DD 文本且已排序，可直接二分定位
+        end = len(result_df) if not cursor else int(np.searchsorted(result_df['日期'].to_numpy(), cursor, side='left'))
+        start = max(0, end - limit)
+        page = result_df.iloc[start:end].iloc[::-1]
+        next_cursor = result_df['日期'].iloc[start] if start > 0 else None
+        return page, next_cursor
\ No newline at end of file
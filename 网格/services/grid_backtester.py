@@ -0,0 +1,202 @@
+from lazy import lazy_import
+from services.calculator import InvestmentCalculator
+from services.lot_book import LotBook
+from config import GRID_STEP_PCT, GRID_AMOUNT, GRID_MAX_GRIDS, DECIMAL_PRECISION
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+
+class GridParams:
+    """网格参数
+
+    base_price：基准净值（为空时取回测首日净值）
+    step_pct：格距（%），第k格买入价 = 基准净值 * (1 - k * 格距)，k从0开始
+    amount：每格买入金额
+    max_grids：最大持仓格数（最大持仓金额约为 amount * max_grids）
+    """
+    def __init__(self, base_price=None, step_pct=GRID_STEP_PCT, amount=GRID_AMOUNT, max_grids=GRID_MAX_GRIDS):
+        self.base_price = base_price
+        self.step_pct = step_pct
+        self.amount = amount
+        self.max_grids = max_grids
+
+    def validate(self):
+        """参数不合法时抛出ValueError"""
+        if self.base_price is not None and not self.base_price > 0:
+            raise ValueError('基准净值必须大于0')
+        if not 0 < self.step_pct < 100:
+            raise ValueError('格距必须在0到100%之间')
+        if not self.amount > 0:
+            raise ValueError('每格金额必须大于0')
+        if int(self.max_grids) != self.max_grids or self.max_grids < 1:
+            raise ValueError('最大持仓格数必须为正整数')
+
+    def to_dict(self):
+        """参数字典（用于接口输出及缓存键）"""
+        return {
+            'base_price': self.base_price,
+            'step_pct': self.step_pct,
+            'amount': self.amount,
+            'max_grids': self.max_grids,
+        }
+
+
+class GridBacktester:
+    """网格交易回测（按已保存的净值序列模拟买卖，输出与 InvestmentCalculator 相同的结果表）
+
+    规则：净值跌到第k格买入价且该格未持有时买入一格（跳空跌过多格则同日买入多格）；
+    第k格在净值涨回上一格买入价（基准净值 * (1 - (k-1) * 格距)）时卖出该格全部份额。
+    先卖最低一格，与计算器按净值从低到高匹配批次一致。
+    """
+    @staticmethod
+    def check_prices(net, dates=None):
+        """净值须全部为正的有限数值，否则抛出ValueError（录入时空白净值会保存为0）"""
+        net = np.asarray(net, dtype=float)
+        bad = np.flatnonzero(~(np.isfinite(net) & (net > 0)))
+        if len(bad):
+            where = dates[bad[0]] if dates is not None else f'第{bad[0] + 1}行'
+            raise ValueError(f'净值必须大于0：{where}（共{len(bad)}行），请修正后再回测')
+
+    @staticmethod
+    def positions(net, base_price, step_pct, max_grids):
+        """逐日持仓格数（整数数组）
+
+        每日可持有格数的下限（已跌破的格）和上限（尚未回到卖出价的格）可整体向量化求出，
+        当日持仓 = 把前一日持仓夹在 [下限, 上限] 之间。上下限不变的日子持仓也不变，
+        只需在上下限变化的日子逐个推进。
+        """
+        # 净值低于基准的格数（以格距为单位）
+        depth = (1 - np.asarray(net, dtype=float) / base_price) / (step_pct / 100)
+        lower = np.clip(np.floor(depth) + 1, 0, max_grids).astype(np.int64)
+        upper = np.clip(np.ceil(depth + 1), 0, max_grids).astype(np.int64)
+        if len(lower) == 0:
+            return lower
+
+        steps = np.flatnonzero((np.diff(lower, prepend=-1) != 0) | (np.diff(upper, prepend=-1) != 0))
+        held = []
+        h = 0
+        for lo, hi in zip(lower[steps].tolist(), upper[steps].tolist()):
+            if h < lo:
+                h = lo
+            elif h > hi:
+                h = hi
+            held.append(h)
+        return np.repeat(np.asarray(held, dtype=np.int64), np.diff(steps, append=len(lower)))
+
+    @staticmethod
+    def trades(history_df, params):
+        """生成模拟交易记录（列与 Fund.get_history_data 一致：date, net_value, addition, shares）
+
+        买入日记加额（格数 * 每格金额），卖出日记负的加份（所卖各格买入时的份额之和）。
+        """
+        trades_df, _ = GridBacktester._simulate(history_df, params)
+        return trades_df
+
+    @staticmethod
+    def run(history_df, params):
+        """回测并计算指标，返回 (结果表, 统计)，无数据时返回 (空表, None)
+
+        参数不合法或净值不为正时抛出ValueError。
+
+        结果表的列与 InvestmentCalculator.calculate 一致；统计含买卖次数、持仓格数及期末汇总。
+        """
+        trades_df, held = GridBacktester._simulate(history_df, params)
+        result_df = InvestmentCalculator.calculate(trades_df)
+        if result_df.empty:
+            return result_df, None
+        last = result_df.iloc[-1]
+        stats = {
+            '买入次数': int((trades_df['addition'].to_numpy() > 0).sum()),
+            '卖出次数': int((trades_df['shares'].to_numpy() < 0).sum()),
+            '最高持仓格数': int(held.max()),
+            '期末持仓格数': int(held[-1]),
+            '总额': float(last['总额']),
+            '总投入': float(last['总投入']),
+            '总涨幅(%)': float(last['总涨幅(%)']),
+            '到手总增额': float(last['到手总增额']),
+        }
+        return result_df, stats
+
+    @staticmethod
+    def summarize(net, params):
+        """只计算期末汇总（参数寻优用，不生成结果表），无数据返回None
+
+        net 为按日期排序的净值数组；结果与 run() 的统计一致（期末总额 = 期末总份 * 最新净值）。
+        参数不合法或净值不为正时抛出ValueError。
+        """
+        params.validate()
+        net = np.asarray(net, dtype=float)
+        n = len(net)
+        if n == 0:
+            return None
+        GridBacktester.check_prices(net)
+        amount = params.amount
+        held = GridBacktester.positions(net, params.base_price or float(net[0]),
+                                        params.step_pct, int(params.max_grids))
+        change = np.diff(held, prepend=0)
+
+        # 卖出份额按网格持仓栈（栈顶为最低一格）确定；到手增额与计算器一致，
+        # 每个买入日作为一个批次，卖出时按净值从低到高匹配
+        stack = []
+        book = LotBook()
+        buys = sells = 0
+        sum_pos = sum_neg = gain = 0.0
+        for i in np.flatnonzero(change).tolist():
+            k = int(change[i])
+            price = float(net[i])
+            if k > 0:
+                buys += 1
+                sum_pos += k * amount
+                stack.extend([amount / price] * k)
+                book.add_lot(i, price, k * amount / price)
+            else:
+                sells += 1
+                shares = sum(stack[k:])
+                del stack[k:]
+                sum_neg += shares * price
+                gain += sum(match.gain for match in book.consume(shares, price))
+        总额 = sum(stack) * float(net[-1])
+        总涨幅 = ((sum_neg + 总额) / sum_pos - 1) * 100 if n > 1 and sum_pos else 0.0
+        return {
+            '买入次数': buys,
+            '卖出次数': sells,
+            '最高持仓格数': int(held.max()),
+            '期末持仓格数': int(held[-1]),
+            '总额': round(总额, DECIMAL_PRECISION),
+            '总投入': round(sum_pos - sum_neg, DECIMAL_PRECISION),
+            '总涨幅(%)': round(总涨幅, DECIMAL_PRECISION),
+            '到手总增额': round(gain, DECIMAL_PRECISION),
+        }
+
+    @staticmethod
+    def _simulate(history_df, params):
+        """按净值序列模拟交易，返回 (交易记录, 逐日持仓格数)"""
+        params.validate()
+        df = history_df[['date', 'net_value']].copy()
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.sort_values('date', kind='stable').reset_index(drop=True)
+        df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+        net = df['net_value'].to_numpy(dtype=float)
+        GridBacktester.check_prices(net, df['date'].tolist())
+        n = len(net)
+        addition = np.zeros(n)
+        shares = np.zeros(n)
+        held = np.zeros(n, dtype=np.int64)
+        if n:
+            base = params.base_price or float(net[0])
+            held = GridBacktester.positions(net, base, params.step_pct, int(params.max_grids))
+            change = np.diff(held, prepend=0)
+            # 只在交易日推进持仓栈（每格买入份额，栈顶为最低一格）
+            stack = []
+            for i in np.flatnonzero(change).tolist():
+                k = int(change[i])
+                if k > 0:
+                    addition[i] = k * params.amount
+                    stack.extend([params.amount / net[i]] * k)
+                else:
+                    shares[i] = -sum(stack[k:])
+                    del stack[k:]
+        df['addition'] = addition
+        df['shares'] = shares
+        return df, held
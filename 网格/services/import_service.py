@@ -0,0 +1,129 @@
+import csv
+import io
+import math
+from datetime import datetime
+from models.fund import Fund
+from services.fund_service import FundService
+
+# 支持的表头（英文列名或中文列名）
+HEADER_ALIASES = {
+    'date': 'date', '日期': 'date',
+    'net_value': 'net_value', '净值': 'net_value',
+    'addition': 'addition', '加额': 'addition',
+    'shares': 'shares', '加份': 'shares',
+}
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%Y%m%d')
+MAX_REPORTED_ERRORS = 20  # 最多返回的错误行数
+ENCODINGS = ('utf-8-sig', 'gb18030')  # 依次尝试的文件编码（中文版 Excel 导出的CSV多为GBK）
+
+
+class ImportService:
+    """历史净值批量导入服务"""
+    @staticmethod
+    def parse_csv(text_stream):
+        """逐行读取CSV并校验，返回 (按日期排序的有效行, 错误信息列表)
+
+        同一日期出现多次时以最后一行为准。
+        """
+        reader = csv.reader(text_stream)
+        header = next(reader, None)
+        if header is None:
+            return [], ['文件为空']
+        columns = [HEADER_ALIASES.get(h.strip().lower(), HEADER_ALIASES.get(h.strip())) for h in header]
+        if 'date' not in columns or 'net_value' not in columns:
+            return [], ['缺少必需的列：date/日期、net_value/净值']
+        index = {name: columns.index(name) for name in HEADER_ALIASES.values() if name in columns}
+
+        rows, errors = {}, []
+        for line_no, record in enumerate(reader, start=2):
+            if not any(cell.strip() for cell in record):
+                continue
+            try:
+                row = ImportService._parse_row(record, index)
+            except ValueError as e:
+                errors.append(f'第{line_no}行：{e}')
+                continue
+            rows[row[0]] = row
+        return [rows[date] for date in sorted(rows)], errors
+
+    @staticmethod
+    def decode(data):
+        """按 ENCODINGS 依次尝试解码文件内容，均失败时抛出ValueError"""
+        for encoding in ENCODINGS:
+            try:
+                return data.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+        raise ValueError('无法识别文件编码，请另存为 UTF-8 或 GBK 编码的CSV')
+
+    @staticmethod
+    def import_file(fund_id, data):
+        """导入CSV文件内容（bytes，自动识别 UTF-8/GBK 编码），返回值同 import_csv"""
+        try:
+            text = ImportService.decode(data)
+        except ValueError as e:
+            return False, str(e), []
+        return ImportService.import_csv(fund_id, io.StringIO(text, newline=''))
+
+    @staticmethod
+    def import_csv(fund_id, text_stream):
+        """导入CSV到指定基金（单个事务写入），完成后触发一次重算
+
+        返回 (成功与否, 提示信息, 错误明细)
+        """
+        fund = Fund.get_by_id(fund_id)
+        if not fund:
+            return False, '基金不存在', []
+        try:
+            rows, errors = ImportService.parse_csv(text_stream)
+        except UnicodeDecodeError:
+            return False, '无法识别文件编码，请另存为 UTF-8 或 GBK 编码的CSV', []
+        except csv.Error as e:
+            return False, f'CSV格式错误：{e}', []
+        if not rows:
+            return False, '没有可导入的有效数据', errors[:MAX_REPORTED_ERRORS]
+
+        count = fund.save_data_bulk(rows)
+        # 导入完成后只重算一次（同时预热结果缓存）
+        FundService.get_fund_result(fund.fund_id)
+        msg = f'成功导入{count}条记录'
+        if errors:
+            msg += f'，跳过{len(errors)}行无效数据'
+        return True, msg, errors[:MAX_REPORTED_ERRORS]
+
+    @staticmethod
+    def _parse_row(record, index):
+        """解析单行，返回 (date, net_value, addition, shares)，不合法时抛出ValueError"""
+        def cell(name):
+            i = index.get(name)
+            return record[i].strip() if i is not None and i < len(record) else ''
+
+        date_text = cell('date')
+        for fmt in DATE_FORMATS:
+            try:
+                date = datetime.strptime(date_text, fmt).strftime('%Y-%m-%d')
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f'日期格式不正确：{date_text!r}')
+
+        def number(name, required=False):
+            text = cell(name).replace(',', '')
+            if not text:
+                if required:
+                    raise ValueError(f'{name} 不能为空')
+                return 0.0
+            try:
+                value = float(text)
+            except ValueError:
+                raise ValueError(f'{name} 不是数字：{text!r}')
+            # float() 也接受 nan/inf，写入后会污染所有累计指标
+            if not math.isfinite(value):
+                raise ValueError(f'{name} 不是有限数值：{text!r}')
+            return value
+
+        net_value = number('net_value', required=True)
+        if net_value <= 0:
+            raise ValueError(f'净值必须大于0：{net_value}')
+        return date, net_value, number('addition'), number('shares')
@@ -0,0 +1,71 @@
+import heapq
+import json
+from collections import namedtuple
+
+# 份额小于该值视为已取完
+SHARE_EPSILON = 1e-8
+
+# 一次减仓匹配到的买入批次：批次标识、买入净值、卖出净值、使用份额、到手增额、到手增幅(%)、是否取完
+LotMatch = namedtuple('LotMatch', [
+    'lot_id', 'buy_net', 'sell_net', 'shares', 'gain', 'gain_pct', 'closed'
+])
+
+
+class LotBook:
+    """未平仓买入批次账本（按净值从低到高排序的小顶堆）
+
+    每次加额为正的记录作为一个批次入账（批次标识为买入日期）；减仓时从净值最低的
+    批次开始消耗份额，净值相同按批次标识先后。单次减仓耗时 O(k log n)，k 为涉及的批次数。
+    """
+    def __init__(self):
+        # 堆元素：[买入净值, 批次标识, 剩余份额]
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add_lot(self, lot_id, net_value, shares):
+        """登记一个买入批次（份额过小的批次忽略）"""
+        if shares > SHARE_EPSILON:
+            heapq.heappush(self._heap, [net_value, lot_id, shares])
+
+    def consume(self, shares, sell_net):
+        """按净值从低到高卖出指定份额，返回匹配明细列表"""
+        matches = []
+        剩余加份 = shares
+        heap = self._heap
+        while heap and 剩余加份 > SHARE_EPSILON:
+            lot = heap[0]
+            buy_net, lot_id, 可用加份 = lot
+            用份 = min(剩余加份, 可用加份)
+            lot[2] = 可用加份 - 用份
+            closed = lot[2] <= SHARE_EPSILON
+            if closed:
+                heapq.heappop(heap)
+            matches.append(LotMatch(
+                lot_id=lot_id,
+                buy_net=buy_net,
+                sell_net=sell_net,
+                shares=用份,
+                gain=用份 * (sell_net - buy_net),
+                gain_pct=(sell_net - buy_net) / buy_net * 100 if buy_net else float('nan'),
+                closed=closed,
+            ))
+            剩余加份 -= 用份
+        return matches
+
+    def open_lots(self):
+        """返回当前未平仓批次 [(批次标识, 买入净值, 剩余份额)]，按净值排序"""
+        return [(lot_id, net, remaining) for net, lot_id, remaining in sorted(self._heap)]
+
+    def to_json(self):
+        """导出为 JSON 文本（用于持久化运行状态）"""
+        return json.dumps([[float(net), lot_id, float(remaining)] for net, lot_id, remaining in self._heap])
+
+    @classmethod
+    def from_json(cls, text):
+        """由 to_json 的结果恢复账本"""
+        book = cls()
+        # 按堆顺序导出，直接恢复即满足堆性质
+        book._heap = json.loads(text)
+        return book
@@ -0,0 +1,77 @@
+from lazy import lazy_import
+from models.fund import Fund
+from models.fund_metrics import FundMetrics
+from services.calculator import InvestmentCalculator
+from config import DECIMAL_PRECISION
+
+pd = lazy_import('pandas')
+
+
+class PortfolioService:
+    """组合汇总服务（所有基金的最新汇总及合计）"""
+    @staticmethod
+    def get_summary(snapshot=None):
+        """读取每只基金的最新总额、总投入、总涨幅、到手总增额
+
+        默认一次查询读取 fund_metrics 各基金的最新一行（结果随数据写入时物化，不重算历史）；
+        传入 snapshot（SnapshotService.load 的结果）时从列式快照的原始记录计算，不访问数据库。
+        返回 (各基金汇总列表, 组合合计)。
+        """
+        if snapshot is not None:
+            rows = [PortfolioService._summarize(fund['fund_id'], fund['fund_name'],
+                                                snapshot.history_df(fund['fund_id']))
+                    for fund in snapshot.funds]
+        else:
+            rows = PortfolioService._load_rows()
+        rows = [row for row in rows if row is not None]
+        return rows, PortfolioService._totals(rows)
+
+    @staticmethod
+    def _load_rows():
+        """各基金最新一行的汇总（读取物化结果，尚未物化的基金直接计算，不获取写锁）"""
+        latest = FundMetrics.latest()
+        pending = latest['m_date'].isna() | latest['sum_pos'].isna()
+
+        rows = []
+        for row, unmatched in zip(latest.itertuples(index=False), pending.tolist()):
+            fund_id = int(row.fund_id)
+            if unmatched:
+                # 结果表尚未物化（启动迁移之前），直接计算
+                rows.append(PortfolioService._summarize(
+                    fund_id, row.fund_name, Fund(fund_id=fund_id).get_history_data()))
+                continue
+            rows.append({
+                '基金ID': fund_id,
+                '基金名称': row.fund_name,
+                '日期': row.date,
+                '净值': float(row.net_value),
+                '总额': float(row.total_amount),
+                '总投入': float(row.total_input),
+                '总涨幅(%)': float(row.total_return_pct),
+                '到手总增额': float(row.total_gain),
+                'sum_pos': float(row.sum_pos),
+                'sum_neg': float(row.sum_neg),
+            })
+        return rows
+
+    @staticmethod
+    def _summarize(fund_id, fund_name, history_df):
+        """由原始记录计算单只基金的最新汇总，无数据返回None"""
+        summary = InvestmentCalculator.summarize(history_df)
+        if summary is None:
+            return None
+        return {'基金ID': fund_id, '基金名称': fund_name, **summary}
+
+    @staticmethod
+    def _totals(rows):
+        """组合合计（总涨幅按全部基金的正负加额和计算，与单基金公式一致）"""
+        总额 = sum(r['总额'] for r in rows)
+        sum_pos = sum(r['sum_pos'] for r in rows)
+        sum_neg = sum(r['sum_neg'] for r in rows)
+        return {
+            '基金数': len(rows),
+            '总额': round(总额, DECIMAL_PRECISION),
+            '总投入': round(sum(r['总投入'] for r in rows), DECIMAL_PRECISION),
+            '总涨幅(%)': round(((sum_neg + 总额) / sum_pos - 1) * 100, DECIMAL_PRECISION) if sum_pos else 0.0,
+            '到手总增额': round(sum(r['到手总增额'] for r in rows), DECIMAL_PRECISION),
+        }
@@ -0,0 +1,118 @@
+import math
+import threading
+from lazy import lazy_import
+from models.fund import Fund
+from services.cache import rolling_cache
+from services.rolling_window import RollingWindow
+from config import ROLLING_WINDOWS, DECIMAL_PRECISION
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# 前缀校验时净值合计允许的误差（净值保留4位小数，任一行修改都会超出）
+CHECKSUM_TOLERANCE = 1e-7
+
+
+def rolling_columns(window):
+    """某窗口长度的结果列名：(涨幅, 最大回撤, 波动率)"""
+    return f'{window}日涨幅(%)', f'{window}日最大回撤(%)', f'{window}日波动率(%)'
+
+
+class RollingState:
+    """基金的滚动统计状态（各窗口的滑动队列及已输出的结果列），新记录到达时只推入新增行"""
+    def __init__(self, windows):
+        self.lock = threading.Lock()
+        self.windows = list(windows)
+        self.reset()
+
+    def reset(self):
+        """清空状态（历史记录被修改时从头重算）"""
+        self._trackers = [RollingWindow(w) for w in self.windows]
+        self.dates = []
+        self.columns = {col: [] for w in self.windows for col in rolling_columns(w)}
+        self.last_date = None
+        self.net_total = 0.0  # 已推入净值的合计（校验历史前缀是否被修改）
+        self.version = None  # 已同步的基金数据版本
+        self._frame = None
+
+    @property
+    def rows(self):
+        return len(self.dates)
+
+    def extend(self, dates, values):
+        """按日期顺序推入新增记录"""
+        if not dates:
+            return
+        outputs = [[self.columns[col] for col in rolling_columns(w)] for w in self.windows]
+        for value in values:
+            for tracker, (changes, drawdowns, volatilities) in zip(self._trackers, outputs):
+                change, drawdown, volatility = tracker.push(value)
+                changes.append(change)
+                drawdowns.append(drawdown)
+                volatilities.append(volatility)
+        self.dates.extend(dates)
+        self.net_total += math.fsum(values)
+        self.last_date = self.dates[-1]
+        self._frame = None
+
+    def frame(self):
+        """结果表（日期 + 各窗口的涨幅/最大回撤/波动率，单位%），推入新记录前复用
+
+        记录间隔不固定，波动率按各窗口实际的日期跨度年化（每年记录数 = 窗口行数 * 365 / 跨度天数）。
+        """
+        if self._frame is None:
+            days = pd.to_datetime(pd.Series(self.dates)).to_numpy(dtype='datetime64[D]').astype(np.int64)
+            data = {'日期': self.dates}
+            for w in self.windows:
+                change, drawdown, volatility = rolling_columns(w)
+                span = np.full(len(days), np.nan)
+                span[w:] = days[w:] - days[:-w]
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    scale = np.where(span > 0, np.sqrt(w * 365 / span), np.nan)
+                data[change] = np.round(np.asarray(self.columns[change]) * 100, DECIMAL_PRECISION)
+                data[drawdown] = np.round(np.asarray(self.columns[drawdown]) * 100, DECIMAL_PRECISION)
+                data[volatility] = np.round(np.asarray(self.columns[volatility]) * 100 * scale, DECIMAL_PRECISION)
+            self._frame = pd.DataFrame(data)
+        return self._frame
+
+
+class RollingService:
+    """滚动窗口统计服务（各窗口涨幅、最大回撤、年化波动率，供图表和提醒使用）"""
+    @staticmethod
+    def get_rolling(fund_id, windows=None):
+        """基金的滚动统计表，基金不存在返回None
+
+        windows 为窗口长度（记录行数）列表，须在 ROLLING_WINDOWS 之内，为空时返回全部窗口；
+        不合法时抛出ValueError。数据版本变化时只读取并推入上次之后新增的记录，
+        历史记录被修改（行数或净值合计不符）时从头重算。返回的DataFrame为共享对象，调用方不可原地修改。
+        """
+        windows = list(windows) if windows else list(ROLLING_WINDOWS)
+        unknown = [w for w in windows if w not in ROLLING_WINDOWS]
+        if unknown:
+            raise ValueError(f"窗口长度须为 {', '.join(map(str, ROLLING_WINDOWS))} 之一")
+        fund = Fund.get_by_id(fund_id)
+        if not fund:
+            return None
+
+        key = (fund.fund_id,)
+        state = rolling_cache.get(key)
+        if state is None:
+            state = RollingState(ROLLING_WINDOWS)
+            rolling_cache.put(key, state)
+        with state.lock:
+            if state.version != fund.last_update:
+                RollingService._sync(fund, state)
+            frame = state.frame()
+        return frame[['日期'] + [col for w in windows for col in rolling_columns(w)]]
+
+    @staticmethod
+    def _sync(fund, state):
+        """把状态同步到基金最新数据（只读取已推入的最后日期之后的记录）"""
+        if state.rows:
+            rows, total = fund.get_history_totals(state.last_date)
+            if rows != state.rows or abs(total - state.net_total) > CHECKSUM_TOLERANCE:
+                state.reset()
+        version = fund.last_update
+        new_df = fund.get_history_since(state.last_date) if state.rows else fund.get_history_data()
+        state.extend(new_df['date'].tolist(), pd.to_numeric(new_df['net_value']).astype(float).tolist())
+        state.version = version
@@ -0,0 +1,83 @@
+"""滑动窗口统计（逐行推入，每行均摊 O(1)，可随新记录增量续算）"""
+
+import math
+from collections import deque
+
+NAN = float('nan')
+
+
+class RollingWindow:
+    """单个窗口长度的滚动涨幅、窗口回撤、滚动波动率
+
+    窗口覆盖最近 window+1 个净值（即 window 个涨幅）：
+    - 涨幅：当前净值相对 window 行之前净值的涨幅
+    - 最大回撤：窗口内各行相对窗口内此前最高净值的跌幅的最小值（峰值和谷值都须在窗口内）。
+      用双栈队列维护区间聚合 (最高, 最低, 最大回撤)：相邻区间合并时最大回撤取
+      min(前段回撤, 后段回撤, 后段最低/前段最高-1)，出队时若前栈为空则把后栈整体倒入前栈
+    - 波动率：窗口内逐行涨幅的样本标准差（滚动累加和与平方和）
+    窗口未满时输出NaN。
+    """
+    def __init__(self, window):
+        self.window = window
+        self.count = 0
+        self._values = deque(maxlen=window + 1)
+        self._front = []  # 前栈：栈顶为窗口最早一行，各项为该行至前栈底（较新）的聚合
+        self._back = []  # 后栈：较新的净值，栈顶为最新一行
+        self._back_agg = None  # 后栈全部净值的聚合
+        self._returns = deque()
+        self._sum = 0.0
+        self._sumsq = 0.0
+
+    @staticmethod
+    def _combine(older, newer):
+        """合并相邻两段的聚合 (最高, 最低, 最大回撤)，任一段为空时返回另一段"""
+        if older is None:
+            return newer
+        if newer is None:
+            return older
+        peak, low, drawdown = older
+        cross = newer[1] / peak - 1 if peak > 0 else 0.0
+        return max(peak, newer[0]), min(low, newer[1]), min(drawdown, newer[2], cross)
+
+    def push(self, value):
+        """推入一行净值，返回 (涨幅, 最大回撤, 波动率)，均为小数"""
+        i = self.count
+        self.count += 1
+        oldest = i - self.window
+        prev = self._values[-1] if self._values else None
+        self._values.append(value)
+
+        # ===== 窗口最大回撤（双栈队列） =====
+        self._back.append(value)
+        self._back_agg = self._combine(self._back_agg, (value, value, 0.0))
+        if oldest > 0:
+            front = self._front
+            if not front:
+                # 后栈从新到旧倒入前栈，每项聚合该行及其后（较新）的各行
+                agg = None
+                while self._back:
+                    v = self._back.pop()
+                    agg = self._combine((v, v, 0.0), agg)
+                    front.append(agg)
+                self._back_agg = None
+            front.pop()
+
+        # ===== 涨幅累加和 =====
+        if prev is not None:
+            r = value / prev - 1 if prev else 0.0
+            self._returns.append(r)
+            self._sum += r
+            self._sumsq += r * r
+            if len(self._returns) > self.window:
+                old = self._returns.popleft()
+                self._sum -= old
+                self._sumsq -= old * old
+
+        if oldest < 0:
+            return NAN, NAN, NAN
+        first = self._values[0]
+        change = value / first - 1 if first else NAN
+        n = self.window
+        variance = (self._sumsq - self._sum * self._sum / n) / (n - 1) if n > 1 else 0.0
+        window_agg = self._combine(self._front[-1] if self._front else None, self._back_agg)
+        return change, window_agg[2], math.sqrt(max(variance, 0.0))
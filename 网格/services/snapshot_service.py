@@ -0,0 +1,152 @@
+import json
+import os
+from datetime import datetime
+from lazy import lazy_import
+from models.fund import Fund
+from models.fund_metrics import STORED_COLUMNS
+from services.fund_service import FundService
+from services.calculator import LIST_COLUMNS
+from config import DECIMAL_PRECISION
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+SNAPSHOT_FORMAT = 1  # 快照格式版本（列或布局变化时递增）
+MANIFEST_NAME = 'manifest.json'
+
+# 原始记录列（加额/加份为空时保存为 NaN）
+HISTORY_COLUMNS = ['date', 'net_value', 'addition', 'shares']
+# 计算结果的数值列及文件名（净值由原始净值取整得到，不单独保存）
+RESULT_FILES = {col: 'm_' + name for col, name in STORED_COLUMNS.items() if col not in LIST_COLUMNS}
+RESULT_FILES['加额最新涨幅(%)'] = 'm_latest_gain_pct'
+# 列表列按 "全部值 + 每行起止偏移" 保存，两列的每行长度相同，共用偏移
+LIST_FILES = {col: 'm_' + STORED_COLUMNS[col] for col in LIST_COLUMNS}
+LIST_OFFSETS_FILE = 'm_list_offsets'
+# 结果表的列顺序（与 InvestmentCalculator.assemble 一致）
+RESULT_ORDER = ['日期', '净值', '加额', '加份', '总额', '总份', '净值涨幅(%)', '总投入',
+                '总涨幅(%)', '加额最新涨幅(%)', '到手增额', '到手增幅', '到手总增额']
+
+
+class FundSnapshot:
+    """已加载的列式快照
+
+    各列为只读内存映射数组，全部基金首尾相接保存；按基金取列只是切片，不复制数据。
+    """
+    def __init__(self, path, manifest, arrays):
+        self.path = path
+        self.manifest = manifest
+        self.arrays = arrays
+        self._funds = {fund['fund_id']: fund for fund in manifest['funds']}
+
+    @property
+    def funds(self):
+        """快照内的基金列表（含 fund_id、fund_name、last_update、行范围 start/stop）"""
+        return self.manifest['funds']
+
+    def columns(self, fund_id):
+        """该基金全部列的数组视图（不复制），基金不存在时抛出KeyError"""
+        fund = self._funds[fund_id]
+        start, stop = fund['start'], fund['stop']
+        views = {name: self.arrays[name][start:stop] for name in HISTORY_COLUMNS + list(RESULT_FILES.values())}
+        # 列表值按该基金的偏移范围切片，偏移改为相对该基金
+        offsets = self.arrays[LIST_OFFSETS_FILE][start:stop + 1]
+        for name in LIST_FILES.values():
+            views[name] = self.arrays[name][offsets[0]:offsets[-1]]
+        views[LIST_OFFSETS_FILE] = offsets - offsets[0]
+        return views
+
+    def history_df(self, fund_id):
+        """原始记录（列与 Fund.get_history_data 一致，日期为 datetime64，数值列不复制）"""
+        views = self.columns(fund_id)
+        return pd.DataFrame({col: views[col] for col in HISTORY_COLUMNS}, copy=False)
+
+    def result_df(self, fund_id):
+        """计算结果表（列与 FundService.get_fund_result 一致）"""
+        views = self.columns(fund_id)
+        offsets = views[LIST_OFFSETS_FILE]
+        data = {
+            '日期': np.datetime_as_string(views['date'], unit='D').astype(object),
+            '净值': np.round(views['net_value'], DECIMAL_PRECISION),
+        }
+        for col, name in RESULT_FILES.items():
+            data[col] = views[name]
+        for col, name in LIST_FILES.items():
+            values = views[name].tolist()
+            data[col] = pd.Series([values[a:b] for a, b in zip(offsets[:-1], offsets[1:])], dtype=object)
+        return pd.DataFrame({col: data[col] for col in RESULT_ORDER})
+
+
+class SnapshotService:
+    """列式快照导出/加载（.npy 列文件 + 清单，供离线分析及基准测试绕过SQLite读取）"""
+    @staticmethod
+    def export(path, fund_ids=None):
+        """导出基金原始记录及计算结果到快照目录，返回清单
+
+        fund_ids 为空时导出全部基金。清单最后写入，导出中途失败的目录不会被当作完整快照加载。
+        """
+        funds = Fund.get_all() if fund_ids is None else [
+            fund for fund in (Fund.get_by_id(fund_id) for fund_id in fund_ids) if fund]
+        os.makedirs(path, exist_ok=True)
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+        parts = {name: [] for name in HISTORY_COLUMNS + list(RESULT_FILES.values()) + list(LIST_FILES.values())}
+        lengths = []
+        entries = []
+        rows = 0
+        for fund in funds:
+            history_df, result_df, _ = FundService.get_fund_result(fund.fund_id)
+            n = len(history_df)
+            parts['date'].append(np.asarray(history_df['date'], dtype='datetime64[D]'))
+            for col in HISTORY_COLUMNS[1:]:
+                parts[col].append(pd.to_numeric(history_df[col], errors='coerce').to_numpy(dtype=float))
+            if n:
+                for col, name in RESULT_FILES.items():
+                    parts[name].append(result_df[col].to_numpy(dtype=float))
+                for col, name in LIST_FILES.items():
+                    parts[name].extend(result_df[col].tolist())
+                lengths.extend(len(values) for values in result_df[LIST_COLUMNS[0]])
+            entries.append({'fund_id': fund.fund_id, 'fund_name': fund.fund_name,
+                            'last_update': str(fund.last_update), 'start': rows, 'stop': rows + n})
+            rows += n
+
+        files = {}
+
+        def save(name, array):
+            np.save(os.path.join(path, name + '.npy'), array)
+            files[name] = {'file': name + '.npy', 'dtype': str(array.dtype), 'length': len(array)}
+
+        save('date', np.concatenate(parts['date']) if parts['date'] else np.array([], dtype='datetime64[D]'))
+        for name in HISTORY_COLUMNS[1:] + list(RESULT_FILES.values()):
+            save(name, np.concatenate(parts[name]) if parts[name] else np.array([], dtype=float))
+        for name in LIST_FILES.values():
+            # 每行的数值列表展开为一维
+            save(name, np.fromiter((v for values in parts[name] for v in values), dtype=float))
+        save(LIST_OFFSETS_FILE, np.concatenate(([0], np.cumsum(lengths, dtype=np.int64))).astype(np.int64))
+
+        manifest = {
+            'format': SNAPSHOT_FORMAT,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'rows': rows,
+            'columns': files,
+            'funds': entries,
+        }
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return manifest
+
+    @staticmethod
+    def load(path):
+        """以内存映射方式加载快照（只读，不把列数据读入内存）"""
+        with open(os.path.join(path, MANIFEST_NAME), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('format') != SNAPSHOT_FORMAT:
+            raise ValueError(f"不支持的快照格式：{manifest.get('format')}")
+        arrays = {}
+        for name, info in manifest['columns'].items():
+            array = np.load(os.path.join(path, info['file']), mmap_mode='r')
+            if len(array) != info['length']:
+                raise ValueError(f"快照列长度不符：{info['file']}")
+            arrays[name] = array
+        return FundSnapshot(path, manifest, arrays)
@@ -0,0 +1,156 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from lazy import lazy_import
+from models.fund import Fund
+from services.cache import sweep_cache
+from services.grid_backtester import GridBacktester, GridParams
+from config import (SWEEP_WORKERS, SWEEP_PARALLEL_THRESHOLD, SWEEP_MAX_COMBINATIONS,
+                    SWEEP_STEPS, SWEEP_AMOUNTS, SWEEP_BANDS)
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# 排名可选的指标列
+SWEEP_SORT_COLUMNS = ['总涨幅(%)', '到手总增额']
+
+# 工作进程内的净值序列（只读，映射到父进程创建的共享内存，不随任务传递）
+_shared_net = None
+_shared_block = None
+
+
+def _attach_history(name, length):
+    """进程池初始化：映射共享内存中的净值序列"""
+    global _shared_net, _shared_block
+    _shared_block = shared_memory.SharedMemory(name=name)
+    _shared_net = np.ndarray((length,), dtype=np.float64, buffer=_shared_block.buf)
+    _shared_net.flags.writeable = False
+
+
+def _sweep_chunk(combos):
+    """计算一批参数组合的期末汇总（进程池任务，需为模块级函数）"""
+    return [GridBacktester.summarize(_shared_net, GridParams(*combo)) for combo in combos]
+
+
+class SweepService:
+    """网格参数寻优（批量回测参数组合，按总涨幅/到手总增额排名）"""
+    @staticmethod
+    def parse_values(text, default):
+        """解析取值列表："1,2,3" 或区间 "起:止:步长"（含终点），可混用；为空时使用默认值
+
+        不合法时抛出ValueError。
+        """
+        text = (text or default).strip()
+        values = []
+        for part in text.split(','):
+            part = part.strip()
+            if not part:
+                continue
+            if ':' in part:
+                pieces = part.split(':')
+                if len(pieces) != 3:
+                    raise ValueError(f'区间格式应为 起:止:步长：{part!r}')
+                start, stop, step = (SweepService._number(p) for p in pieces)
+                if step <= 0 or stop < start:
+                    raise ValueError(f'区间不合法：{part!r}')
+                count = int(math.floor((stop - start) / step + 1e-9)) + 1
+                values.extend(round(start + i * step, 10) for i in range(count))
+            else:
+                values.append(SweepService._number(part))
+        if not values:
+            raise ValueError('取值不能为空')
+        return sorted(set(values))
+
+    @staticmethod
+    def combinations(steps, amounts, bands, base_price=None):
+        """参数组合列表 [(基准净值, 格距%, 每格金额, 最大格数)]
+
+        区间宽度（%）换算为最大格数 = 宽度 / 格距（四舍五入，至少1格），换算后重复的组合只保留一个。
+        """
+        if any(not 0 < step < 100 for step in steps):
+            raise ValueError('格距必须在0到100%之间')
+        combos = []
+        seen = set()
+        for step in steps:
+            for band in bands:
+                max_grids = max(1, int(round(band / step)))
+                for amount in amounts:
+                    combo = (base_price, step, amount, max_grids)
+                    if combo not in seen:
+                        seen.add(combo)
+                        combos.append(combo)
+        for combo in combos:
+            GridParams(*combo).validate()
+        if len(combos) > SWEEP_MAX_COMBINATIONS:
+            raise ValueError(f'参数组合过多（{len(combos)}），上限为 {SWEEP_MAX_COMBINATIONS}')
+        return combos
+
+    @staticmethod
+    def run(fund_id, steps=None, amounts=None, bands=None, base_price=None, sort_by=None, workers=None):
+        """对基金历史回测全部参数组合，返回排名表（基金不存在返回None）
+
+        steps/amounts/bands 为取值列表，为空时使用配置的默认取值；参数不合法或净值不为正时抛出ValueError。
+        每个组合的结果按 (基金ID, 数据版本, 参数) 缓存，只计算未命中的组合。
+        """
+        fund = Fund.get_by_id(fund_id)
+        if not fund:
+            return None
+        sort_by = sort_by if sort_by in SWEEP_SORT_COLUMNS else SWEEP_SORT_COLUMNS[0]
+        combos = SweepService.combinations(
+            steps or SweepService.parse_values(None, SWEEP_STEPS),
+            amounts or SweepService.parse_values(None, SWEEP_AMOUNTS),
+            bands or SweepService.parse_values(None, SWEEP_BANDS),
+            base_price)
+
+        keys = [(fund.fund_id, fund.last_update, *combo) for combo in combos]
+        summaries = [sweep_cache.get(key) for key in keys]
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+        if missing:
+            history_df = fund.get_history_data()
+            net = history_df['net_value'].to_numpy(dtype=float)
+            # 先整体校验（报出日期），避免分发到进程池后才在各组合中失败
+            GridBacktester.check_prices(net, history_df['date'].tolist())
+            computed = SweepService._simulate(net, [combos[i] for i in missing], workers)
+            for i, summary in zip(missing, computed):
+                summaries[i] = summary
+                sweep_cache.put(keys[i], summary)
+
+        rows = [{'格距(%)': step, '每格金额': amount, '区间宽度(%)': round(step * max_grids, 10),
+                 '最大格数': max_grids, **summary}
+                for (_, step, amount, max_grids), summary in zip(combos, summaries) if summary is not None]
+        table = pd.DataFrame(rows)
+        if table.empty:
+            return table
+        other = SWEEP_SORT_COLUMNS[1 - SWEEP_SORT_COLUMNS.index(sort_by)]
+        table = table.sort_values([sort_by, other], ascending=False, kind='stable').reset_index(drop=True)
+        table.insert(0, '排名', np.arange(1, len(table) + 1))
+        return table
+
+    @staticmethod
+    def _simulate(net, combos, workers=None):
+        """计算参数组合的期末汇总；组合较多时分发到进程池，净值序列经共享内存只读共享"""
+        workers = SWEEP_WORKERS if workers is None else workers
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(combos) < SWEEP_PARALLEL_THRESHOLD or len(net) == 0:
+            return [GridBacktester.summarize(net, GridParams(*combo)) for combo in combos]
+
+        block = shared_memory.SharedMemory(create=True, size=net.nbytes)
+        try:
+            np.ndarray(net.shape, dtype=np.float64, buffer=block.buf)[:] = net
+            chunksize = max(1, len(combos) // (workers * 4))
+            chunks = [combos[i:i + chunksize] for i in range(0, len(combos), chunksize)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach_history,
+                                     initargs=(block.name, len(net))) as executor:
+                return [summary for chunk in executor.map(_sweep_chunk, chunks) for summary in chunk]
+        finally:
+            block.close()
+            block.unlink()
+
+    @staticmethod
+    def _number(text):
+        """解析单个数值，不合法时抛出ValueError"""
+        try:
+            return float(text)
+        except ValueError:
+            raise ValueError(f'不是数字：{text!r}') from None
@@ -4,6 +4,7 @@
 移动端基金分析系统启动脚本
 """
 
+import importlib.util
 import socket
 import subprocess
 import sys
@@ -37,13 +38,18 @@ def main():
     print("📋 使用说明:")
     print("1. 确保手机和电脑在同一WiFi网络")
     print("2. 在手机浏览器中输入上述手机访问地址")
-    print("3. 按 Ctrl+C 停止服务器")
+    print("3. 按 Ctrl+C 停止服务器（python start_mobile.py --dev 使用开发服务器）")
     print("=" * 60)
     
     try:
-        # 启动Flask应用
-        from APP_mobile import app
-        app.run(host=FLASK_HOST, port=FLASK_PORT, debug=False)
+        if '--dev' in sys.argv or importlib.util.find_spec('waitress') is None:
+            # 开发模式（或未安装waitress）：Flask内置单线程服务器
+            from APP_mobile import create_app
+            create_app().run(host=FLASK_HOST, port=FLASK_PORT, debug=False)
+        else:
+            # 生产模式：多进程/多线程服务，进程数与线程数见 config_mobile.py
+            import serve
+            serve.main(['--app', 'mobile'])
     except KeyboardInterrupt:
         print("\n👋 服务器已停止")
     except Exception as e:
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时统计与一次性初始化
+
+    python startup.py --app mobile    # 在新进程中逐阶段测量导入、初始化和首个请求的耗时
+"""
+
+import argparse
+import sys
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+
+# 已记录的阶段耗时：[(阶段, 秒, 嵌套层级)]
+PHASES = []
+# 当前正在计时的阶段层数
+_depth = 0
+
+_bootstrap_lock = threading.Lock()
+_bootstrapped = False
+
+
+@contextmanager
+def phase(name):
+    """记录一个启动阶段的耗时（阶段内再计时的为嵌套阶段）"""
+    global _depth
+    depth = _depth
+    _depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _depth = depth
+        PHASES.append((name, time.perf_counter() - start, depth))
+
+
+def _width(text):
+    """显示宽度（中文占两格）"""
+    return sum(2 if unicodedata.east_asian_width(c) in 'WF' else 1 for c in text)
+
+
+def report():
+    """启动耗时报告文本（嵌套阶段先于外层阶段列出并缩进，合计只计外层）"""
+    rows = [('  ' * depth + name, seconds) for name, seconds, depth in PHASES]
+    rows.append(('合计', sum(seconds for _, seconds, depth in PHASES if depth == 0)))
+    width = max(_width(name) for name, _ in rows)
+    lines = ['⏱ 启动耗时']
+    lines += [f"  {name}{' ' * (width - _width(name))}  {seconds * 1000:9.1f} ms" for name, seconds in rows]
+    return '\n'.join(lines)
+
+
+def bootstrap():
+    """初始化数据库结构、升级旧数据并确保有默认基金（每个进程只执行一次）"""
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    with _bootstrap_lock:
+        if _bootstrapped:
+            return
+        from models.db import Database
+        from models.fund import Fund
+        from services.fund_service import FundService
+        with phase('初始化数据库结构'):
+            Database.init_db()
+        with phase('升级旧数据'):
+            Fund.migrate()
+        with phase('检查默认基金'):
+            if not FundService.get_fund_list():
+                FundService.create_fund('默认基金')
+        _bootstrapped = True
+
+
+def measure(app_name):
+    """按顺序测量各阶段耗时（各阶段只计入新增的导入/初始化成本）"""
+    with phase('导入 flask'):
+        import flask  # noqa: F401
+    with phase('导入模型与服务'):
+        import models.fund  # noqa: F401
+        import services.fund_service  # noqa: F401
+    with phase('导入应用模块'):
+        module = __import__('APP_mobile' if app_name == 'mobile' else 'APP')
+    with phase('应用工厂 create_app'):
+        app = module.create_app()
+    client = app.test_client()
+    with phase('首个请求（按需导入 pandas/pyecharts 并计算）'):
+        client.get('/')
+    with phase('第二个请求（命中缓存）'):
+        client.get('/')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='测量应用启动耗时')
+    parser.add_argument('--app', choices=['mobile', 'desktop'], default='mobile')
+    args = parser.parse_args(argv)
+    measure(args.app)
+    print(report())
+    return 0
+
+
+if __name__ == '__main__':
+    # 以模块身份重新导入，与应用共用同一份阶段记录
+    import startup
+    sys.exit(startup.main())
@@ -0,0 +1,24 @@
+"""测试公共夹具：项目目录加入导入路径，数据库改用临时文件"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import models.db  # noqa: E402
+from models.db import Database  # noqa: E402
+from services import cache  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """每个测试使用独立的临时数据库（不影响正式数据），并清空各结果缓存"""
+    Database.close_thread_conn()
+    monkeypatch.setattr(models.db, 'DATABASE_PATH', str(tmp_path / 'test.db'))
+    for lru in (cache.result_cache, cache.chart_cache, cache.sweep_cache,
+                cache.analytics_cache, cache.rolling_cache):
+        lru.clear()
+    Database.init_db()
+    yield Database
+    Database.close_thread_conn()
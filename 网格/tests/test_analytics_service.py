@@ -0,0 +1,100 @@
+"""收益分析：XIRR 与逐点二分的结果对照，时间加权收益与买入持有一致"""
+import math
+
+import pandas as pd
+import pytest
+
+from services.analytics_service import AnalyticsService
+from services.calculator import InvestmentCalculator
+
+
+def bisect_irr(cashflows, years):
+    """在 (-0.99, 100) 上二分求 NPV 的零点（NPV 对收益率单调递减时适用）"""
+    def npv(rate):
+        return sum(cf / (1 + rate) ** t for cf, t in zip(cashflows, years))
+    lo, hi = -0.99, 100.0
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        if npv(mid) > 0:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def test_xirr_single_period():
+    assert math.isclose(AnalyticsService.xirr([-1000, 1100], [0, 1]), 0.10, rel_tol=1e-9)
+    assert math.isclose(AnalyticsService.xirr([-1000, 500], [0, 2]), 0.5 ** 0.5 - 1, rel_tol=1e-9)
+
+
+def test_xirr_matches_bisection():
+    # 先投入后取回：NPV 对收益率单调，二分结果即唯一解
+    cases = [
+        ([-1000, -500, 300, 1400], [0, 0.25, 0.8, 1.5]),
+        ([-200, -200, -200, 700], [0, 0.5, 1, 1.2]),
+        ([-1000, 100, 100, 100, 900], [0, 1, 2, 3, 4]),
+    ]
+    for cashflows, years in cases:
+        assert math.isclose(AnalyticsService.xirr(cashflows, years), bisect_irr(cashflows, years), rel_tol=1e-7)
+
+
+def test_xirr_without_sign_change():
+    assert AnalyticsService.xirr([-100, -50], [0, 1]) is None
+    assert AnalyticsService.xirr([100, 50], [0, 1]) is None
+
+
+def test_max_drawdown():
+    drawdown, peak, trough = AnalyticsService.max_drawdown([1, 2, 1.5, 3, 1.2])
+    assert math.isclose(drawdown, -0.6) and (peak, trough) == (3, 4)
+    assert AnalyticsService.max_drawdown([1, 2, 3]) == (0.0, 0, 0)
+    assert AnalyticsService.max_drawdown([]) == (None, None, None)
+
+
+def test_buy_and_hold_twr_equals_xirr():
+    """只在首日买入一次时，时间加权收益年化后与资金加权收益（XIRR）相同"""
+    history = pd.DataFrame({
+        'date': ['2023-01-01', '2023-04-01', '2023-09-01', '2024-01-01'],
+        'net_value': [1.0, 1.1, 0.9, 1.2],
+        'addition': [1000.0, 0.0, 0.0, 0.0],
+        'shares': [0.0, 0.0, 0.0, 0.0],
+    })
+    analytics = AnalyticsService.compute(InvestmentCalculator.calculate(history))
+    assert analytics['天数'] == 365
+    assert analytics['时间加权收益(%)'] == pytest.approx(20.0)
+    assert analytics['年化收益(%)'] == pytest.approx(20.0)
+    assert analytics['XIRR(%)'] == pytest.approx(20.0)
+    assert analytics['最大回撤(%)'] == pytest.approx(-18.1818, abs=1e-4)
+    assert (analytics['回撤峰值日'], analytics['回撤谷底日']) == ('2023-04-01', '2023-09-01')
+
+
+def test_twr_ignores_cash_flow_timing():
+    """时间加权收益只取决于净值序列，加仓时点改变 XIRR 而不改变 TWR"""
+    base = {
+        'date': ['2023-01-01', '2023-07-01', '2024-01-01'],
+        'net_value': [1.0, 0.8, 1.0],
+        'shares': [0.0, 0.0, 0.0],
+    }
+    hold = AnalyticsService.compute(InvestmentCalculator.calculate(
+        pd.DataFrame({**base, 'addition': [1000.0, 0.0, 0.0]})))
+    dip = AnalyticsService.compute(InvestmentCalculator.calculate(
+        pd.DataFrame({**base, 'addition': [1000.0, 1000.0, 0.0]})))
+    assert hold['时间加权收益(%)'] == dip['时间加权收益(%)'] == 0.0
+    assert hold['XIRR(%)'] == pytest.approx(0.0, abs=1e-6)
+    assert dip['XIRR(%)'] > 0
+
+
+def test_volatility_annualized_by_date_span():
+    """同一净值序列按周记录时，每年记录数为按日记录的1/7，年化波动率相应缩小"""
+    net = [1.0, 1.02, 0.99, 1.03, 1.01, 1.05, 1.04, 1.06, 1.02, 1.07]
+    results = {}
+    for step in (1, 7):
+        history = pd.DataFrame({
+            'date': pd.date_range('2023-01-02', periods=len(net), freq=f'{step}D').strftime('%Y-%m-%d'),
+            'net_value': net,
+            'addition': [1000.0] + [0.0] * (len(net) - 1),
+            'shares': [0.0] * len(net),
+        })
+        results[step] = AnalyticsService.compute(InvestmentCalculator.calculate(history))
+    returns = pd.Series(net).pct_change().dropna()
+    assert results[1]['年化波动率(%)'] == pytest.approx(returns.std() * math.sqrt(365) * 100, abs=1e-4)
+    assert results[1]['年化波动率(%)'] / results[7]['年化波动率(%)'] == pytest.approx(math.sqrt(7), rel=1e-4)
@@ -0,0 +1,36 @@
+"""多基金对比：总涨幅方式读取缓存的计算结果，与从头计算一致"""
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_history
+from services.calculator import InvestmentCalculator
+from services.comparison_service import ComparisonService
+from services.fund_service import FundService
+
+
+@pytest.fixture
+def funds(db):
+    created = []
+    for i, rows in enumerate((90, 50)):
+        fund = FundService.create_fund(f'对比{i}')[0]
+        df = generate_history(rows, seed=10 + i)
+        fund.save_data_bulk([tuple(row) for row in df.itertuples(index=False)])
+        created.append(fund)
+    return created
+
+
+def test_gain_uses_cached_results(funds, monkeypatch):
+    expected = {}
+    for fund in funds:
+        result_df = InvestmentCalculator.calculate(fund.get_history_data())
+        expected[fund.fund_name] = pd.Series(result_df['总涨幅(%)'].to_numpy(),
+                                             index=pd.to_datetime(result_df['日期']))
+    monkeypatch.setattr(InvestmentCalculator, 'calculate',
+                        staticmethod(lambda *args: pytest.fail('对比图不应重算历史')))
+    ids = [fund.fund_id for fund in funds]
+    wide = ComparisonService.build(ids, 'ALL', 'gain', max_points=None)
+    assert wide.columns.tolist() == [fund.fund_name for fund in funds]
+    for name, series in expected.items():
+        pd.testing.assert_series_equal(wide[name].loc[series.index], series.round(4),
+                                       check_names=False, check_freq=False)
+    assert ComparisonService.build([999], 'ALL', 'gain').empty
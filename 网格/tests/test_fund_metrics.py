@@ -0,0 +1,132 @@
+"""fund_metrics 增量续算与从头计算的对照"""
+import time
+
+import pandas as pd
+import pytest
+
+import models.fund_metrics as fund_metrics
+from benchmarks.synthetic import generate_history
+from models.db import Database
+from models.fund import Fund
+from models.fund_metrics import FundMetrics
+from services.cache import result_cache
+from services.calculator import InvestmentCalculator, RunningState
+from services.fund_service import FundService
+
+
+def history_rows(rows, seed=0, sell_ratio=0.3):
+    """(date, net_value, addition, shares) 列表，减仓较多以便批次在检查点前后被取完"""
+    df = generate_history(rows, buy_ratio=0.3, sell_ratio=sell_ratio, seed=seed)
+    return [tuple(row) for row in df.itertuples(index=False)]
+
+
+def assert_matches_full(fund):
+    """结果表（读取 fund_metrics）与从头计算一致"""
+    result_cache.clear()
+    _, result_df, _ = FundService.get_fund_result(fund.fund_id)
+    expected = InvestmentCalculator.calculate(fund.get_history_data())
+    pd.testing.assert_frame_equal(result_df, expected)
+
+
+@pytest.fixture
+def fund(db, monkeypatch):
+    # 间隔很小，少量数据即可覆盖定期快照、末行快照和跨快照续算
+    monkeypatch.setattr(fund_metrics, 'STATE_SNAPSHOT_INTERVAL', 4)
+    return FundService.create_fund('增量')[0]
+
+
+def test_appends_match_full_recompute(fund):
+    rows = history_rows(120)
+    fund.save_data_bulk(rows[:80])
+    assert_matches_full(fund)
+    for row in rows[80:]:
+        fund.save_data(*row)
+    assert_matches_full(fund)
+
+
+def test_back_dated_edits_match_full_recompute(fund):
+    rows = history_rows(150, seed=1)
+    fund.save_data_bulk(rows)
+    # 修改中间一行、插入更早的一行、再从中间批量覆盖
+    date, net_value, _, _ = rows[60]
+    fund.save_data(date, net_value * 1.1, -300, 0)
+    assert_matches_full(fund)
+    fund.save_data('1990-01-01', 0.9, 500, 0)
+    assert_matches_full(fund)
+    fund.save_data_bulk([(d, v * 0.97, 100, 0) for d, v, _, _ in rows[100:110]])
+    assert_matches_full(fund)
+
+
+def test_lots_closed_before_checkpoint(fund):
+    """续算段卖出检查点之前买入的批次（批次ID不在本段内），末行为买入时其最新涨幅不受影响"""
+    rows = history_rows(60, seed=2, sell_ratio=0.0)
+    fund.save_data_bulk(rows)
+    year = int(rows[-1][0][:4]) + 1
+    net_value = rows[-1][1]
+    fund.save_data_bulk([(f'{year}-01-01', net_value, -5000, 0), (f'{year}-01-02', net_value * 1.05, 500, 0)])
+    assert_matches_full(fund)
+
+
+def test_resume_matches_calculate():
+    """从任意行的检查点续算，结果与整段计算的对应行一致"""
+    history = generate_history(80, buy_ratio=0.4, sell_ratio=0.3, seed=4)
+    history.loc[len(history) - 1, ['addition', 'shares']] = [800.0, 0.0]  # 末行为买入
+    df = InvestmentCalculator.prepare(history)
+    expected = InvestmentCalculator.calculate(history)
+    for split in (1, 10, 40, 79):
+        head = InvestmentCalculator.replay(df.iloc[:split], RunningState(), snapshot_every=len(df))
+        checkpoint = {key: head[key][-1] for key in ('date', '总份', '总投入', 'sum_pos', 'sum_neg', '到手总增额')}
+        checkpoint.update(lots=head['lots'][-1], rows=split)
+        result_df, _ = InvestmentCalculator.resume(df.iloc[split - 1:].reset_index(drop=True), checkpoint)
+        pd.testing.assert_frame_equal(result_df, expected.iloc[split:].reset_index(drop=True))
+
+
+def test_rebuild_matches_full_recompute(fund):
+    fund.save_data_bulk(history_rows(100, seed=3))
+    FundMetrics.rebuild(fund.fund_id)
+    assert_matches_full(fund)
+
+
+def test_back_dated_save_on_large_fund_is_bounded(db):
+    """大基金修改早期一行：写锁内只续算受影响的行，快照总量随行数线性增长（此前为平方，1万行需十余秒）"""
+    fund = FundService.create_fund('大基金')[0]
+    rows = history_rows(10000, seed=5, sell_ratio=0.1)
+    fund.save_data_bulk(rows)
+    date, net_value, _, _ = rows[10]
+    start = time.perf_counter()
+    fund.save_data(date, net_value, 300, 0)
+    assert time.perf_counter() - start < 3.0
+    conn = Database.get_conn()
+    snapshot_bytes = conn.execute('SELECT TOTAL(LENGTH(open_lots)) FROM fund_state WHERE fund_id=?',
+                                  (fund.fund_id,)).fetchone()[0]
+    conn.close()
+    assert snapshot_bytes < 5e6
+
+
+def test_dates_are_normalized_on_write(fund):
+    fund.save_data('2024/3/1', 1.0, 1000, 0)
+    fund.save_data_bulk([('20240302', 1.1, 0, 0), ('2024-3-4', 1.2, -200, 0)])
+    assert fund.get_history_data()['date'].tolist() == ['2024-03-01', '2024-03-02', '2024-03-04']
+    assert FundMetrics.load(fund.fund_id) is not None
+
+
+def test_migrate_normalizes_legacy_dates(fund, monkeypatch):
+    """旧版本按原样保存的日期启动时规范一次，之后读取直接命中结果表"""
+    rows = history_rows(40, seed=6)
+    fund.save_data_bulk(rows[:20])
+    conn = Database.get_conn()
+    conn.executemany('INSERT INTO fund_data (fund_id, date, net_value, addition, shares) VALUES (?, ?, ?, ?, ?)',
+                     [(fund.fund_id, date.replace('-', '/'), *values) for date, *values in rows[20:]])
+    # 与已有日期重复的旧格式行（保留已有的一行）
+    conn.execute('INSERT INTO fund_data (fund_id, date, net_value, addition, shares) VALUES (?, ?, 9.9, 0, 0)',
+                 (fund.fund_id, rows[5][0].replace('-', '')))
+    conn.commit()
+    conn.close()
+    assert FundMetrics.load(fund.fund_id) is None
+
+    Fund.migrate()
+    history_df = fund.get_history_data()
+    assert history_df['date'].tolist() == [row[0] for row in rows]
+    assert 9.9 not in history_df['net_value'].tolist()
+    monkeypatch.setattr(FundMetrics, 'ensure', staticmethod(lambda *args: pytest.fail('读取路径不应补算')))
+    assert_matches_full(fund)
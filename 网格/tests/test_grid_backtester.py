@@ -0,0 +1,28 @@
+"""网格回测：期末汇总与完整回测一致，非正净值被拒绝"""
+import pytest
+
+from benchmarks.synthetic import generate_history
+from services.grid_backtester import GridBacktester, GridParams
+
+
+def test_summarize_matches_run():
+    history = generate_history(300, seed=8)
+    for params in (GridParams(step_pct=2, amount=500, max_grids=5), GridParams(step_pct=5, max_grids=10)):
+        _, stats = GridBacktester.run(history, params)
+        summary = GridBacktester.summarize(history['net_value'].to_numpy(), params)
+        assert summary == pytest.approx(stats)
+
+
+@pytest.mark.parametrize('bad', [0.0, -1.0, float('nan')])
+def test_rejects_non_positive_net_value(bad):
+    """空白净值保存为0：回测前拒绝，而不是除零"""
+    history = generate_history(50, seed=9)
+    history.loc[20, 'net_value'] = bad
+    params = GridParams(step_pct=2)
+    with pytest.raises(ValueError, match=history.loc[20, 'date']):
+        GridBacktester.run(history, params)
+    with pytest.raises(ValueError, match='第21行'):
+        GridBacktester.summarize(history['net_value'].to_numpy(), params)
+    history.loc[0, 'net_value'] = 0.0  # 首日为0时基准净值也无效
+    with pytest.raises(ValueError):
+        GridBacktester.trades(history, params)
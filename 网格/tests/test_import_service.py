@@ -0,0 +1,48 @@
+"""CSV导入：编码识别、格式错误与逐行校验"""
+import io
+
+import pytest
+
+import APP_mobile
+import manage
+from services.fund_service import FundService
+from services.import_service import ImportService
+
+CSV_TEXT = '日期,净值,加额\n2024-01-02,1.0000,1000\n2024-01-03,1.0100,\n2024-01-04,nan,0\n'
+
+
+@pytest.fixture
+def fund(db):
+    return FundService.create_fund('导入')[0]
+
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'utf-8-sig', 'gbk'])
+def test_import_file_detects_encoding(fund, encoding):
+    success, msg, errors = ImportService.import_file(fund.fund_id, CSV_TEXT.encode(encoding))
+    assert success, msg
+    assert len(fund.get_history_data()) == 2
+    assert errors == ["第4行：net_value 不是有限数值：'nan'"]
+
+
+def test_undecodable_and_malformed_files(fund):
+    success, msg, _ = ImportService.import_file(fund.fund_id, b'\xff\xfe\x00\x81\x30\x81')
+    assert not success and '编码' in msg
+    success, msg, _ = ImportService.import_file(fund.fund_id, b'date,net_value\n' + b'x' * 200000 + b',1\n')
+    assert not success and 'CSV格式错误' in msg
+
+
+def test_upload_gbk_from_mobile_app(fund):
+    client = APP_mobile.app.test_client()
+    response = client.post('/import', data={
+        'fund_id': str(fund.fund_id),
+        'csv_file': (io.BytesIO(CSV_TEXT.encode('gbk')), 'history.csv'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+    assert len(fund.get_history_data()) == 2
+
+
+def test_cli_import_gbk(fund, tmp_path):
+    path = tmp_path / 'history.csv'
+    path.write_bytes(CSV_TEXT.encode('gbk'))
+    assert manage.main(['import-csv', '--fund', str(fund.fund_id), str(path)]) == 0
+    assert len(fund.get_history_data()) == 2
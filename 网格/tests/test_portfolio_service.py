@@ -0,0 +1,64 @@
+"""组合汇总：读取物化结果，与逐只基金从头计算一致"""
+import pytest
+
+import APP
+from benchmarks.synthetic import generate_history
+from models.db import Database
+from models.fund_metrics import FundMetrics
+from services.calculator import InvestmentCalculator
+from services.fund_service import FundService
+from services.portfolio_service import PortfolioService
+
+
+@pytest.fixture
+def funds(db):
+    created = []
+    for i, rows in enumerate((200, 50, 0)):
+        fund = FundService.create_fund(f'组合{i}')[0]
+        if rows:
+            df = generate_history(rows, seed=10 + i)
+            fund.save_data_bulk([tuple(row) for row in df.itertuples(index=False)])
+        created.append(fund)
+    return created
+
+
+def expected_rows(funds):
+    rows = {}
+    for fund in funds:
+        summary = InvestmentCalculator.summarize(fund.get_history_data())
+        if summary is not None:
+            rows[fund.fund_id] = summary
+    return rows
+
+
+def assert_summary_matches(funds):
+    rows, totals = PortfolioService.get_summary()
+    expected = expected_rows(funds)
+    assert {row['基金ID'] for row in rows} == set(expected)
+    for row in rows:
+        for key, value in expected[row['基金ID']].items():
+            assert row[key] == pytest.approx(value), key
+    assert totals['基金数'] == len(expected)
+    assert totals['总额'] == pytest.approx(sum(s['总额'] for s in expected.values()))
+
+
+def test_summary_matches_full_recompute(funds):
+    assert_summary_matches(funds)
+    # 追加一行后读取新的最新行
+    funds[1].save_data('2099-01-01', 1.5, -100, 0)
+    assert_summary_matches(funds)
+
+
+def test_unmaterialized_fund_is_computed_without_writing(funds, monkeypatch):
+    conn = Database.get_conn()
+    conn.execute('DELETE FROM fund_metrics WHERE fund_id=?', (funds[0].fund_id,))
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(FundMetrics, 'ensure', staticmethod(lambda *args: pytest.fail('读取路径不应补算')))
+    assert_summary_matches(funds)
+
+
+def test_portfolio_page(funds):
+    response = APP.app.test_client().get('/portfolio')
+    assert response.status_code == 200
+    assert '合计（2只）' in response.get_data(as_text=True)
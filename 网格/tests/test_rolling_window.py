@@ -0,0 +1,63 @@
+"""滑动窗口统计与逐窗口暴力计算的对照"""
+import math
+import random
+
+from services.rolling_window import RollingWindow
+
+
+def brute_force(values, window):
+    """O(n·w)：每个窗口内从头扫描峰值与回撤"""
+    results = []
+    for end in range(len(values)):
+        if end < window:
+            results.append(None)
+            continue
+        segment = values[end - window:end + 1]
+        peak = segment[0]
+        drawdown = 0.0
+        for value in segment:
+            peak = max(peak, value)
+            drawdown = min(drawdown, value / peak - 1)
+        returns = [b / a - 1 for a, b in zip(segment, segment[1:])]
+        mean = sum(returns) / window
+        variance = sum((r - mean) ** 2 for r in returns) / (window - 1) if window > 1 else 0.0
+        results.append((segment[-1] / segment[0] - 1, drawdown, math.sqrt(variance)))
+    return results
+
+
+def test_drawdown_ignores_peak_outside_window():
+    """峰值滑出窗口后不再计入回撤"""
+    tracker = RollingWindow(2)
+    outputs = [tracker.push(v) for v in [10, 5, 6, 7]]
+    assert all(math.isnan(x) for x in outputs[0] + outputs[1])
+    assert math.isclose(outputs[2][1], -0.5)
+    assert outputs[3][1] == 0.0
+
+
+def test_matches_brute_force():
+    """随机净值序列、不同窗口长度下与暴力计算一致"""
+    rnd = random.Random(7)
+    for _ in range(200):
+        window = rnd.randint(1, 12)
+        values = [round(rnd.uniform(0.5, 2.0), 4) for _ in range(rnd.randint(1, 90))]
+        tracker = RollingWindow(window)
+        for got, expected in zip((tracker.push(v) for v in values), brute_force(values, window)):
+            if expected is None:
+                assert all(math.isnan(x) for x in got)
+            else:
+                for a, b in zip(got, expected):
+                    assert math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def test_service_annualizes_by_window_span():
+    """滚动波动率按各窗口实际的日期跨度年化（每年记录数 = 窗口行数 * 365 / 跨度天数）"""
+    from services.rolling_service import RollingState, rolling_columns
+    state = RollingState([2])
+    state.extend(['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-05', '2024-01-08'],
+                 [1.0, 1.1, 1.0, 1.1, 1.0])
+    column = rolling_columns(2)[2]
+    raw = state.columns[column]
+    volatility = state.frame()[column].tolist()
+    assert all(math.isnan(v) for v in volatility[:2])
+    for row, span in ((2, 2), (3, 3), (4, 5)):
+        assert math.isclose(volatility[row], round(raw[row] * 100 * math.sqrt(2 * 365 / span), 4), abs_tol=1e-9)
@@ -0,0 +1,41 @@
+"""生产启动脚本：工作进程不响应 SIGTERM 时主进程按时强制结束"""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+# 工作进程忽略 SIGTERM 并一直挂起，主进程须在 SHUTDOWN_TIMEOUT 后用 SIGKILL 结束它们
+MASTER_SCRIPT = '''
+import os, signal, sys, time
+import serve
+serve.SHUTDOWN_TIMEOUT = 0.5
+
+def hang(app, sock, threads):
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    while True:
+        time.sleep(1)
+
+serve.run_worker = hang
+serve.run_master(None, None, 2, 1)
+print('stopped', flush=True)
+'''
+
+
+def test_master_kills_hung_workers():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen([sys.executable, '-c', MASTER_SCRIPT], cwd=root,
+                            stdout=subprocess.PIPE, text=True, start_new_session=True)
+    try:
+        time.sleep(1.5)  # 超过启动失败判定时间
+        start = time.perf_counter()
+        proc.send_signal(signal.SIGTERM)
+        out, _ = proc.communicate(timeout=10)
+    finally:
+        # 失败时连同残留的工作进程一起结束
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    assert 'stopped' in out
+    assert time.perf_counter() - start < 5
@@ -0,0 +1,62 @@
+"""列式快照导出后加载，与数据库读取的结果一致"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import generate_history
+from services.fund_service import FundService
+from services.snapshot_service import MANIFEST_NAME, SnapshotService
+
+
+@pytest.fixture
+def funds(db):
+    """两只有数据的基金和一只空基金"""
+    created = []
+    for i, rows in enumerate((120, 40, 0)):
+        fund = FundService.create_fund(f'快照{i}')[0]
+        if rows:
+            df = generate_history(rows, seed=i)
+            fund.save_data_bulk([tuple(row) for row in df.itertuples(index=False)])
+        created.append(fund)
+    return created
+
+
+def test_round_trip(funds, tmp_path):
+    manifest = SnapshotService.export(str(tmp_path))
+    assert manifest['rows'] == 160
+    snapshot = SnapshotService.load(str(tmp_path))
+    # 基金顺序与 Fund.get_all 一致（按修改时间），这里只比较集合
+    assert sorted(f['fund_id'] for f in snapshot.funds) == sorted(f.fund_id for f in funds)
+    for fund in funds:
+        history_df, result_df, _ = FundService.get_fund_result(fund.fund_id)
+        loaded = snapshot.history_df(fund.fund_id)
+        assert loaded['date'].dt.strftime('%Y-%m-%d').tolist() == history_df['date'].tolist()
+        for col in ('net_value', 'addition', 'shares'):
+            np.testing.assert_array_equal(loaded[col].to_numpy(), history_df[col].to_numpy(dtype=float))
+        if len(history_df):
+            pd.testing.assert_frame_equal(snapshot.result_df(fund.fund_id), result_df)
+
+
+def test_subset_and_views_are_memory_mapped(funds, tmp_path):
+    SnapshotService.export(str(tmp_path), [funds[1].fund_id])
+    snapshot = SnapshotService.load(str(tmp_path))
+    assert [f['fund_id'] for f in snapshot.funds] == [funds[1].fund_id]
+    views = snapshot.columns(funds[1].fund_id)
+    assert isinstance(views['net_value'], np.memmap)
+    with pytest.raises(KeyError):
+        snapshot.columns(funds[0].fund_id)
+
+
+def test_rejects_unknown_format(funds, tmp_path):
+    SnapshotService.export(str(tmp_path))
+    manifest_path = os.path.join(str(tmp_path), MANIFEST_NAME)
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest['format'] += 1
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    with pytest.raises(ValueError):
+        SnapshotService.load(str(tmp_path))
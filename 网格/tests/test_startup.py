@@ -0,0 +1,17 @@
+"""启动耗时报告：嵌套阶段缩进列出，合计只计外层阶段"""
+import startup
+
+
+def test_report_total_counts_outer_phases(monkeypatch):
+    monkeypatch.setattr(startup, 'PHASES', [])
+    with startup.phase('外层'):
+        with startup.phase('内层'):
+            pass
+    with startup.phase('其他'):
+        pass
+    (inner, _, inner_depth), (outer, outer_seconds, outer_depth), (_, other_seconds, _) = startup.PHASES
+    assert (inner, inner_depth, outer, outer_depth) == ('内层', 1, '外层', 0)
+    lines = startup.report().splitlines()
+    assert lines[1].startswith('    内层') and lines[2].startswith('  外层')
+    assert lines[-1].startswith('  合计')
+    assert lines[-1].endswith(f'{(outer_seconds + other_seconds) * 1000:9.1f} ms')
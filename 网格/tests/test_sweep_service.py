@@ -0,0 +1,70 @@
+"""网格参数寻优：进程池与单进程结果一致，取值解析与排名"""
+import pytest
+
+import APP_mobile
+import manage
+
+import services.sweep_service as sweep_service
+from benchmarks.synthetic import generate_history
+from services.fund_service import FundService
+from services.sweep_service import SweepService
+
+
+def test_parse_values():
+    assert SweepService.parse_values('3, 1:2:0.5, 1', '') == [1.0, 1.5, 2.0, 3.0]
+    assert SweepService.parse_values('', '5') == [5.0]
+    for text in ('1:2', '2:1:1', '1:2:0', 'a', ','):
+        with pytest.raises(ValueError):
+            SweepService.parse_values(text, '')
+
+
+def test_parallel_matches_serial(monkeypatch):
+    monkeypatch.setattr(sweep_service, 'SWEEP_PARALLEL_THRESHOLD', 1)
+    net = generate_history(400, seed=6)['net_value'].to_numpy(dtype=float)
+    combos = SweepService.combinations([1, 2.5, 5], [500, 1000], [10, 30])
+    serial = SweepService._simulate(net, combos, workers=1)
+    parallel = SweepService._simulate(net, combos, workers=2)
+    assert parallel == serial
+
+
+def test_run_ranks_and_caches(db, monkeypatch):
+    fund = FundService.create_fund('寻优')[0]
+    df = generate_history(300, seed=7)
+    fund.save_data_bulk([tuple(row) for row in df.itertuples(index=False)])
+    table = SweepService.run(fund.fund_id, steps=[2, 4], amounts=[1000], bands=[20], workers=1)
+    assert table['排名'].tolist() == [1, 2]
+    assert table['总涨幅(%)'].is_monotonic_decreasing
+    # 第二次全部命中缓存
+    monkeypatch.setattr(SweepService, '_simulate', staticmethod(lambda *args: pytest.fail('未命中缓存')))
+    cached = SweepService.run(fund.fund_id, steps=[2, 4], amounts=[1000], bands=[20], workers=1)
+    assert cached.equals(table)
+    assert SweepService.run(999, steps=[2]) is None
+
+
+@pytest.fixture
+def zero_fund(db):
+    """历史中有一行净值为0（录入表单把空白净值保存为0）"""
+    fund = FundService.create_fund('零净值')[0]
+    df = generate_history(60, seed=8)
+    df.loc[30, 'net_value'] = 0.0
+    fund.save_data_bulk([tuple(row) for row in df.itertuples(index=False)])
+    return fund, df.loc[30, 'date']
+
+
+def test_zero_net_value_is_rejected(zero_fund):
+    fund, date = zero_fund
+    with pytest.raises(ValueError, match=date):
+        SweepService.run(fund.fund_id, steps=[1, 2], bands=[10], workers=1)
+
+
+def test_api_returns_400_for_zero_net_value(zero_fund):
+    fund, date = zero_fund
+    response = APP_mobile.app.test_client().get(f'/api/funds/{fund.fund_id}/grid_sweep?steps=1,2&bands=10')
+    assert response.status_code == 400
+    assert date in response.get_json()['error']
+
+
+def test_cli_reports_zero_net_value(zero_fund, capsys):
+    fund, date = zero_fund
+    assert manage.main(['grid-sweep', '--fund', str(fund.fund_id), '--steps', '1,2', '--bands', '10']) == 1
+    assert date in capsys.readouterr().out